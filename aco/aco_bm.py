@@ -1,10 +1,9 @@
-import random
 import pygame
-import json
-import os
 import time
 import math
-from heapq import heappush, heappop
+from collections.abc import Mapping
+import numpy as np
+from bench_mark import Graph, DistanceFieldCache, NodePath, DIRECTIONS, OPPOSITE_DIRECTION, STRAIGHT_COST, DIAGONAL_COST
 
 # Hàm tạo màu dựa trên cost (giữ nguyên)
 def get_cost_color(cost, max_cost):
@@ -16,162 +15,81 @@ def get_cost_color(cost, max_cost):
     b = 0
     return (r, g, b)
 
-class Node:
-    def __init__(self, x, y, is_obstacle=False, cost=1):
-        self.x = x
-        self.y = y
-        self.is_obstacle = is_obstacle
-        self.neighbors = []
-        self.cost = float('inf') if is_obstacle else cost
-        self.g_score = float('inf')
-        self.h_score = float('inf')
-        self.f_score = float('inf')
-        self.parent = None
-
-    def add_neighbor(self, neighbor):
-        self.neighbors.append(neighbor)
-
-class Graph:
-    def __init__(self, grid_size, use_random=False, obstacle_ratio=0.3, json_file=None):
-        self.grid_size = grid_size
-        self.nodes = {}
-        self.start = None
-        self.goal = None
-        self.path_log = []
-        self.max_cost = grid_size * 2
-
-        if json_file and os.path.exists(json_file):
-            self.load_from_json(json_file)
-        else:
-            for x in range(grid_size):
-                for y in range(grid_size):
-                    cost = 1
-                    self.nodes[(x, y)] = Node(x, y, is_obstacle=False, cost=cost)
-            self.set_start(0, 0)
-            self.goal = self.get_random_free_cell()
-            while self.goal == self.start:
-                self.goal = self.get_random_free_cell()
-
-        for x in range(grid_size):
-            for y in range(grid_size):
-                current_node = self.nodes[(x, y)]
-                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1),
-                               (-1, -1), (-1, 1), (1, -1), (1, 1)]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < grid_size and 0 <= ny < grid_size:
-                        current_node.add_neighbor(self.nodes[(nx, ny)])
-        if not self.goal:
-            self.goal = self.get_random_free_cell()
-
-    def load_from_json(self, json_file):
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-            maze_data = data.get("data")
-            for x in range(self.grid_size):
-                for y in range(self.grid_size):
-                    is_obstacle = (maze_data[x][y] == 1)
-                    cost = float('inf') if is_obstacle else 1
-                    self.nodes[(x, y)] = Node(x, y, is_obstacle, cost)
-
-    def get_node(self, x, y):
-        return self.nodes.get((x, y))
-
-    def get_random_free_cell(self):
-        while True:
-            x = random.randint(0, self.grid_size - 1)
-            y = random.randint(0, self.grid_size - 1)
-            if not self.nodes[(x, y)].is_obstacle:
-                return self.nodes[(x, y)]
-
-    def set_start(self, x, y):
-        self.start = self.nodes[(x, y)]
-
-    def set_goal(self, x, y):
-        self.goal = self.nodes[(x, y)]
-
-    def a_star(self):
-        # Đây là phiên bản a_star của Graph (như đã có)
-        open_set = [(self.start.f_score, id(self.start), self.start)]
-        closed_set = set()
-        iteration_count = 0
-        self.start.g_score = 0
-        self.start.f_score = abs(self.start.x - self.goal.x) + abs(self.start.y - self.goal.y)
-        log = []
-        frontier_log = []
-
-        while open_set:
-            iteration_count += 1
-            frontier_log.append([(node.x, node.y) for _, _, node in open_set])
-            current_tuple = min(open_set, key=lambda x: (x[0], x[1]))
-            current = current_tuple[2]
-            open_set.remove(current_tuple)
-
-            if current == self.goal:
-                path = []
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
-                total_explored = len(closed_set) + 1
-                final_cost = self.goal.g_score
-                return path[::-1], log, frontier_log, total_explored, final_cost, iteration_count
-
-            closed_set.add(current)
-            log.append((current.x, current.y))
-
-            for neighbor in current.neighbors:
-                if neighbor in closed_set or neighbor.is_obstacle:
-                    continue
-                dx = neighbor.x - current.x
-                dy = neighbor.y - current.y
-                if abs(dx) == 1 and abs(dy) == 1:
-                    node_horizontal = self.get_node(current.x + dx, current.y)
-                    node_vertical = self.get_node(current.x, current.y + dy)
-                    if node_horizontal.is_obstacle or node_vertical.is_obstacle:
-                        continue
-                    move_cost = 1.41
-                else:
-                    move_cost = 1
-                tentative_g_score = current.g_score + move_cost
-
-                if tentative_g_score < neighbor.g_score:
-                    neighbor.parent = current
-                    neighbor.g_score = tentative_g_score
-                    neighbor.f_score = neighbor.g_score + abs(neighbor.x - self.goal.x) + abs(neighbor.y - self.goal.y)
-                    neighbor_in_open = False
-                    for item in open_set:
-                        if item[2] == neighbor:
-                            neighbor_in_open = True
-                            open_set.remove(item)
-                            open_set.append((neighbor.f_score, id(neighbor), neighbor))
-                            break
-                    if not neighbor_in_open:
-                        open_set.append((neighbor.f_score, id(neighbor), neighbor))
-        return [], log, frontier_log, len(closed_set), 0, iteration_count
-
 def save_image(screen, filename):
     pygame.image.save(screen, filename)
 
 
+# Hướng "xuôi" (ô đích có chỉ số lớn hơn ô nguồn). Mỗi cạnh vô hướng chỉ được lưu một lần,
+# ở ô có chỉ số nhỏ hơn, tại slot FORWARD_SLOT[d] của hướng xuôi d
+FORWARD_DIRECTIONS = tuple(d for d, (dx, dy) in enumerate(DIRECTIONS) if (dx, dy) > (0, 0))
+FORWARD_SLOT = {d: slot for slot, d in enumerate(FORWARD_DIRECTIONS)}
+INITIAL_PHEROMONE = 0.1
+ACO_VARIANTS = ("as", "rank", "mmas", "acs")
+
+class PheromoneMap(Mapping):
+    """View dạng dict lên mảng GraphACO.pheromone, key là _edge_key ((x1, y1), (x2, y2)) như bản dict cũ.
+
+    Chỉ các cạnh giữa hai ô trống kề nhau (Graph.adjacent) là key hợp lệ; đọc/ghi đi thẳng vào mảng.
+    """
+    def __init__(self, graph):
+        self.graph = graph
+
+    def _position(self, key):
+        (x1, y1), (x2, y2) = sorted(key)
+        n = self.graph.grid_size
+        try:
+            d = DIRECTIONS.index((x2 - x1, y2 - y1))
+        except ValueError:
+            raise KeyError(key) from None
+        if not (0 <= x1 < n and 0 <= y1 < n and self.graph.adjacent[x1, y1] >> d & 1):
+            raise KeyError(key)
+        return x1 * n + y1, FORWARD_SLOT[d]
+
+    def __getitem__(self, key):
+        return float(self.graph.pheromone[self._position(key)])
+
+    def __setitem__(self, key, value):
+        self.graph.pheromone[self._position(key)] = value
+
+    def __iter__(self):
+        n = self.graph.grid_size
+        for d in FORWARD_DIRECTIONS:
+            dx, dy = DIRECTIONS[d]
+            for index in np.flatnonzero((self.graph.adjacent.reshape(-1) >> d) & 1).tolist():
+                x, y = divmod(index, n)
+                yield (x, y), (x + dx, y + dy)
+
+    def __len__(self):
+        return int(self.graph._forward_edges.sum())
+
+
 # -------------------------
-# Lớp kế thừa Graph để tích hợp ACO
+# Lớp kế thừa Graph (bench_mark.py) để tích hợp ACO
 class GraphACO(Graph):
     def __init__(self, *args, **kwargs):
+        self.pheromone = None
         super().__init__(*args, **kwargs)
-        # Khởi tạo pheromone cho mỗi cạnh
-        self.pheromones = {}
+        # Pheromone dạng mảng (N, 4): một phần tử cho mỗi cạnh vô hướng (xem FORWARD_DIRECTIONS),
+        # self.pheromones là view dạng dict theo _edge_key cho phần vẽ
+        self.pheromone = np.zeros((self.grid_size * self.grid_size, len(FORWARD_DIRECTIONS)))
+        self.pheromones = PheromoneMap(self)
+        self.run_stats = None  # Thống kê lần chạy aco() gần nhất
         self._initialize_pheromones()
         
+    def load_occupancy(self, occupancy):
+        super().load_occupancy(occupancy)
+        # Đổi map thì tập cạnh đổi theo (Graph.__init__ gọi hàm này trước khi có mảng pheromone)
+        if self.pheromone is not None:
+            self._initialize_pheromones()
+
     def _edge_key(self, n1, n2):
         return tuple(sorted(((n1.x, n1.y), (n2.x, n2.y))))
     
     def _initialize_pheromones(self):
-        for node in self.nodes.values():
-            for neighbor in node.neighbors:
-                if neighbor.is_obstacle:
-                    continue
-                key = self._edge_key(node, neighbor)
-                if key not in self.pheromones:
-                    self.pheromones[key] = 0.1
+        bits = np.array(FORWARD_DIRECTIONS, dtype=np.uint8)
+        # _forward_edges[i, slot]: cạnh xuôi tại slot của ô i tồn tại (hai ô trống kề nhau)
+        self._forward_edges = (self.adjacent.reshape(-1, 1) >> bits) & 1 == 1
+        self.pheromone[...] = np.where(self._forward_edges, INITIAL_PHEROMONE, 0.0)
                     
     def allowed_move(self, current, neighbor):
         dx = neighbor.x - current.x
@@ -191,72 +109,225 @@ class GraphACO(Graph):
         return 1
     
     def heuristic(self, node):
+        # Chi phí thật tới goal nếu Graph có distance_cache, ngược lại khoảng cách Manhattan
+        if self.distance_cache is not None:
+            return float(self.distance_cache.get(self, self.goal.index)[node.index])
         return abs(node.x - self.goal.x) + abs(node.y - self.goal.y)
     
+    def _direction_arrays(self):
+        """Các mảng (N, 8) theo DIRECTIONS cho engine vectorized.
+
+        - neighbors: chỉ số ô láng giềng (chính ô đó nếu ra ngoài grid, để luôn index an toàn)
+        - can_move: đi được theo self.moves (không vật cản, không cắt góc)
+        - edge_index: vị trí của cạnh (ô, hướng) trong self.pheromone.reshape(-1); hai chiều của một cạnh
+          trỏ cùng một phần tử nên pheromone đối xứng theo cách lưu (chỉ có nghĩa ở cạnh có thật)
+        """
+        n = self.grid_size
+        cells = np.arange(n * n)
+        bits = np.arange(len(DIRECTIONS), dtype=np.uint8)
+        can_move = (self.moves.reshape(-1, 1) >> bits) & 1 == 1
+        is_edge = (self.adjacent.reshape(-1, 1) >> bits) & 1 == 1
+        offsets = np.array([dx * n + dy for dx, dy in DIRECTIONS])
+        neighbors = np.where(is_edge, cells[:, None] + offsets, cells[:, None])
+        slots = len(FORWARD_DIRECTIONS)
+        edge_index = np.empty_like(neighbors)
+        for d in range(len(DIRECTIONS)):
+            if d in FORWARD_SLOT:
+                edge_index[:, d] = cells * slots + FORWARD_SLOT[d]
+            else:
+                edge_index[:, d] = neighbors[:, d] * slots + FORWARD_SLOT[OPPOSITE_DIRECTION[d]]
+        return neighbors, can_move, edge_index
+
     def aco(self, num_ants=50, num_iterations=100, evaporation_rate=0.1, alpha=1, beta=2,
-            convergence_threshold=1e-3, convergence_iter_limit=10):
+            convergence_threshold=1e-3, convergence_iter_limit=10, seed=None, reset_pheromones=True,
+            keep_paths=True, on_iteration=None, path_log=None, stop_on_convergence=False, time_budget=None,
+            cancel=None, variant="as", rank_size=6, p_best=0.05, restart_after=50, q0=0.9, local_decay=0.1,
+            prune_dead_ends=True, backtrack=False):
+        """
+        ACO với engine NumPy: mọi con kiến của một iteration đi đồng bộ từng bước (lock-step).
+        - Pheromone là mảng self.pheromone (một phần tử mỗi cạnh vô hướng): bay hơi là một phép nhân
+          trên cả mảng, deposit là một np.add.at theo edge_index.
+        - Mỗi kiến có một hàng trong mask visited (num_ants, N); chọn bước bằng roulette trên
+          cumsum của trọng số pheromone^alpha * eta^beta theo từng hàng.
+        - seed: seed cho np.random.default_rng (None: ngẫu nhiên).
+        - reset_pheromones: False thì tiếp tục từ self.pheromone hiện có (dùng cho aco_multi_colony).
+        - keep_paths: False thì không giữ all_paths (trả về list rỗng), bộ nhớ không tăng theo số iteration.
+        - on_iteration: callback nhận dict tóm tắt mỗi iteration (iteration, reached, iteration_best_cost,
+          mean_cost, best_cost).
+        - path_log: tên file hoặc file nhị phân đã mở; đường đi của các kiến tới goal được ghi dạng nén
+          (xem write_path_log) để xem lại bằng read_path_log.
+        - stop_on_convergence: dừng ngay tại convergence_iter thay vì chạy hết num_iterations.
+        - time_budget: giới hạn thời gian (giây); hết giờ giữa một iteration thì bỏ iteration đó.
+        - cancel: đối tượng có is_set() (vd. threading.Event), được kiểm tra như time_budget.
+        - variant: cách cập nhật pheromone (ACO_VARIANTS)
+            "as":   Ant System gốc, mọi kiến tới goal deposit 1/cost.
+            "rank": rank-based elitist AS, rank_size - 1 kiến tốt nhất của iteration deposit (rank_size - r)/cost,
+                    best-so-far deposit rank_size/best_cost.
+            "mmas": Max-Min AS, chỉ kiến tốt nhất iteration deposit; pheromone bị kẹp trong [tau_min, tau_max]
+                    (tau_max = 1/(evaporation_rate * best_cost), tau_min theo p_best); không cải thiện sau
+                    restart_after iteration thì reset pheromone về tau_max.
+            "acs":  Ant Colony System, luật pseudo-random proportional (xác suất q0 chọn bước tốt nhất, áp dụng
+                    từ khi có best đầu tiên), local update tau = (1 - local_decay) * tau + local_decay * tau0 trên
+                    cạnh vừa đi, bay hơi/deposit chỉ trên cạnh của best-so-far; khi có best đầu tiên, mọi cạnh được đặt về
+                    tau0 = 1 / (len(best) * best_cost) (tương tự 1/(n * L_nn) của ACS gốc).
+        - prune_dead_ends: loại các ô không tới được goal (flood fill từ goal, tính một lần mỗi lần chạy)
+          khỏi các bước đi, kiến không bao giờ đi vào vùng cụt.
+        - backtrack: kiến bị kẹt (mọi ô kề đã visited) lùi lại một ô và xóa ô cụt khỏi path thay vì bị bỏ.
+        Luôn trả về best path tới thời điểm dừng; self.run_stats ghi số iteration đã xong, lý do dừng
+        (stop_reason: completed/converged/deadline/cancelled), iteration tìm ra best (best_iteration) và thời gian
+        từng pha (construction, evaporation, deposit), cùng tỉ lệ kiến tới goal (success_ratio) và số bước
+        trung bình mỗi kiến (steps_per_ant, tính cả bước lùi).
+        Trả về: (best_path, best_cost, all_paths, convergence_iter), best_path và các path trong
+        all_paths là NodePath (dãy Node).
+        """
+        if variant not in ACO_VARIANTS:
+            raise ValueError(f"variant phải là một trong {ACO_VARIANTS}, nhận {variant!r}")
         best_path = None
         best_cost = float("inf")
         all_paths = []  # Log đường đi của các ant qua mỗi vòng lặp
         convergence_iter = None  # Vòng lặp hội tụ
         stable_count = 0  # Số vòng lặp liên tiếp mà best_cost không cải thiện đáng kể
         last_best_cost = best_cost
+        started = time.perf_counter()
+        deadline = started + time_budget if time_budget is not None else float("inf")
+        stats = self.run_stats = {"iterations": 0, "stop_reason": "completed", "best_iteration": None,
+                                  "restarts": 0, "ants": 0, "successful_ants": 0, "ant_steps": 0,
+                                  "time_construction": 0.0,
+                                  "time_evaporation": 0.0, "time_deposit": 0.0, "time_total": 0.0}
+        rng = np.random.default_rng(seed)
+        log_file = open(path_log, "wb") if isinstance(path_log, str) else path_log
+        if log_file is not None:
+            write_path_log_header(log_file, self.grid_size)
+        start, goal = self.start.index, self.goal.index
+        num_cells = self.grid_size * self.grid_size
+        neighbors, can_move, edge_index = self._direction_arrays()
+        if prune_dead_ends:
+            can_move = can_move & self._reachable_from(goal, neighbors, can_move)[neighbors]
+        # Mỗi ô được vào tối đa một lần (và lùi ra tối đa một lần khi backtrack)
+        max_steps = 2 * num_cells if backtrack else num_cells
+        step_costs = np.array([DIAGONAL_COST if dx and dy else STRAIGHT_COST for dx, dy in DIRECTIONS])
+
+        # eta^beta theo (ô, hướng); có distance_cache: eta = 1 / (1 + detour), detour = move_cost + h(neighbor) - h(current)
+        # là phần chi phí dư so với đường tối ưu khi đi bước đó; ô có h = inf (không tới được goal) bị loại
+        if self.distance_cache is None:
+            eta_beta = np.broadcast_to((1.0 / (step_costs + 1e-6)) ** beta, can_move.shape)
+        else:
+            field = self.distance_cache.get(self, goal)
+            h_next = field[neighbors]
+            can_move = can_move & np.isfinite(h_next)
+            with np.errstate(invalid='ignore'):
+                eta_beta = np.where(can_move, 1.0 / (1 + step_costs + h_next - field[:, None]), 0.0) ** beta
 
         # Khởi tạo pheromone cho mỗi cạnh
-        for key in self.pheromones:
-            self.pheromones[key] = 0.1
-
+        if reset_pheromones:
+            self._initialize_pheromones()
+        pheromone = self.pheromone.reshape(-1)
+        # MMAS: số lựa chọn trung bình mỗi bước, dùng cho tau_min
+        mean_choices = None
+        if variant == "mmas":
+            # Không ô nào có bước đi hợp lệ (vd. goal bị bao kín khi prune_dead_ends): dùng mức tối thiểu 2,
+            # tránh mean của mảng rỗng (RuntimeWarning)
+            choices = can_move.sum(axis=1)
+            mean_choices = max(choices[choices > 0].mean(), 2) if can_move.any() else 2
+        bounded = False  # MMAS/ACS: pheromone đã được đặt lại theo best đầu tiên
+        tau0 = INITIAL_PHEROMONE  # ACS: giá trị local update kéo về
+
+        num_directions = len(DIRECTIONS)
+        visited = np.zeros(num_ants * num_cells, dtype=bool)  # Hàng thứ a (num_cells ô) là mask của kiến a
         for iteration in range(num_iterations):
+            phase_start = time.perf_counter()
+            if self._should_stop(deadline, cancel, stats):
+                break
+            # Pheromone không đổi trong một iteration nên trọng số (ô, hướng) tính một lần (trừ ACS: local update)
+            if variant != "acs":
+                weights = np.where(can_move, pheromone[edge_index] ** alpha * eta_beta, 0.0)
+            visited[:] = False
+            # Chỉ các kiến còn đang đi (active) được xử lý; kiến tới goal hoặc bị kẹt bị loại khỏi mảng
+            active = np.arange(num_ants) if start != goal else np.arange(0)
+            row_base = active * num_cells
+            visited[row_base + start] = True
+            current = np.full(len(active), start)
+            # Path của kiến a là stack[:depth[a] + 1, a]; stack tăng gấp đôi khi đầy
+            depth = np.zeros(num_ants, dtype=np.intp)
+            stack = np.empty((64, num_ants), dtype=np.intp)
+            stack[0] = start
+            steps = 0
+            while steps < max_steps and len(active):
+                if self._should_stop(deadline, cancel, stats):
+                    break
+                steps += 1
+                stats["ant_steps"] += len(active)
+                if steps >= len(stack):
+                    stack = np.concatenate([stack, np.empty_like(stack)])
+                candidates = neighbors.take(current, axis=0)
+                if variant == "acs":
+                    edges = edge_index.take(current, axis=0)
+                    probs = np.where(can_move.take(current, axis=0),
+                                     pheromone[edges] ** alpha * eta_beta.take(current, axis=0), 0.0)
+                else:
+                    probs = weights.take(current, axis=0)
+                probs[visited.take(row_base[:, None] + candidates)] = 0.0
+                cumulative = probs.cumsum(axis=1)
+                total = cumulative[:, -1]
+                # Roulette: hướng đầu tiên có cumulative >= r, r thuộc (0, total]
+                r = (1.0 - rng.random(len(active))) * total
+                choice = np.minimum((cumulative < r[:, None]).sum(axis=1), num_directions - 1)
+                if variant == "acs" and bounded:
+                    # Pseudo-random proportional: xác suất q0 đi theo cạnh có trọng số lớn nhất (chỉ sau khi đã có
+                    # best; trước đó pheromone đồng đều và eta không hướng về goal nên argmax chỉ làm kiến bị kẹt)
+                    exploit = rng.random(len(active)) < q0
+                    choice = np.where(exploit, probs.argmax(axis=1), choice)
+                rows = np.arange(len(active)) * num_directions + choice
+                current = candidates.take(rows)
+                stuck = total <= 0  # Kiến bị kẹt: không còn ô hợp lệ, bước vừa chọn bị bỏ
+                moving = ~stuck
+                if variant == "acs":
+                    # Local update trên cạnh vừa đi để các kiến sau (bước sau) đa dạng hơn
+                    moved = edges.take(rows[moving])
+                    pheromone[moved] = (1 - local_decay) * pheromone[moved] + local_decay * tau0
+                movers = active[moving]
+                depth[movers] += 1
+                stack[depth[movers], movers] = current[moving]
+                visited[row_base[moving] + current[moving]] = True
+                finished = moving & (current == goal)
+                if stuck.any():
+                    if backtrack:
+                        # Lùi về ô trước trên path: ô cụt bị xóa khỏi path (loop erasure) nhưng vẫn là visited
+                        # nên kiến không vào lại; lùi quá start (depth < 0) là kiến thất bại
+                        back = active[stuck]
+                        depth[back] -= 1
+                        current[stuck] = stack[np.maximum(depth[back], 0), back]
+                        finished |= depth[active] < 0
+                    else:
+                        depth[active[stuck]] = -1
+                        finished |= stuck
+                if finished.any():
+                    keep = ~finished
+                    active, row_base, current = active[keep], row_base[keep], current[keep]
+            if stats["stop_reason"] != "completed":
+                break  # Iteration bị ngắt giữa chừng: bỏ, giữ best path hiện có
+
             iteration_paths = []
-            for ant in range(num_ants):
-                current = self.start
-                path = [current]
-                total_cost = 0
-                visited = set()
-                visited.add((current.x, current.y))
-                max_steps = self.grid_size * self.grid_size
-                steps = 0
-                while current != self.goal and steps < max_steps:
-                    steps += 1
-                    allowed_neighbors = []
-                    for neighbor in current.neighbors:
-                        if neighbor.is_obstacle:
-                            continue
-                        if (neighbor.x, neighbor.y) in visited:
-                            continue
-                        if not self.allowed_move(current, neighbor):
-                            continue
-                        allowed_neighbors.append(neighbor)
-                    if not allowed_neighbors:
-                        break
-                    # Tính xác suất di chuyển dựa trên pheromone và heuristic
-                    probs = []
-                    for neighbor in allowed_neighbors:
-                        key = self._edge_key(current, neighbor)
-                        pheromone = self.pheromones.get(key, 0.1)
-                        eta = 1.0 / (self.move_cost(current, neighbor) + 1e-6)
-                        probs.append((pheromone ** alpha) * (eta ** beta))
-                    total = sum(probs)
-                    probs = [p / total for p in probs]
-                    r = random.random()
-                    cumulative = 0.0
-                    next_node = None
-                    for i, neighbor in enumerate(allowed_neighbors):
-                        cumulative += probs[i]
-                        if r <= cumulative:
-                            next_node = neighbor
-                            break
-                    if next_node is None:
-                        break
-                    path.append(next_node)
-                    visited.add((next_node.x, next_node.y))
-                    total_cost += self.move_cost(current, next_node)
-                    current = next_node
-                if current == self.goal:
-                    iteration_paths.append((path, total_cost))
-                    if total_cost < best_cost:
-                        best_cost = total_cost
+            ended = stack[np.maximum(depth, 0), np.arange(num_ants)]
+            reached = np.flatnonzero((depth >= 0) & (ended == goal))
+            stats["ants"] += num_ants
+            stats["successful_ants"] += len(reached)
+            if len(reached):
+                lengths = depth[reached] + 1
+                paths = stack[:lengths.max(), reached]
+                # Chi phí từ các bước trên path (phần stack sau depth là rác nên bị che)
+                step_sizes = np.abs(np.diff(paths, axis=0))
+                in_path = np.arange(len(paths) - 1)[:, None] < lengths - 1
+                straight = (((step_sizes == 1) | (step_sizes == self.grid_size)) & in_path).sum(axis=0)
+                diagonal = (lengths - 1) - straight
+                costs = straight * STRAIGHT_COST + diagonal * DIAGONAL_COST
+                for column, (length, cost) in enumerate(zip(lengths.tolist(), costs.tolist())):
+                    path = NodePath(self, paths[:length, column].copy())
+                    iteration_paths.append((path, cost))
+                    if cost < best_cost:
+                        best_cost = cost
                         best_path = path
+                        stats["best_iteration"] = iteration + 1
             # Kiểm tra hội tụ: nếu best_cost không cải thiện nhiều
             if abs(last_best_cost - best_cost) < convergence_threshold:
                 stable_count += 1
@@ -266,20 +337,251 @@ class GraphACO(Graph):
             if stable_count >= convergence_iter_limit and convergence_iter is None:
                 convergence_iter = iteration + 1  # (vòng lặp bắt đầu từ 0)
             # Cập nhật pheromone: bay hơi
-            for key in self.pheromones:
-                self.pheromones[key] *= (1 - evaporation_rate)
-            # Cộng pheromone cho các ant đạt goal
-            for path, cost in iteration_paths:
-                if path[-1] == self.goal:
-                    deposit = 1.0 / cost
-                    for i in range(len(path) - 1):
-                        key = self._edge_key(path[i], path[i+1])
-                        self.pheromones[key] += deposit
-            all_paths.append(iteration_paths)
+            phase_end = time.perf_counter()
+            stats["time_construction"] += phase_end - phase_start
+            if variant == "acs":
+                # ACS: bay hơi chỉ trên cạnh của best-so-far (deposit evaporation_rate / best_cost ngay sau)
+                # best_cost = 0 (start == goal): không có cạnh nào, giữ nguyên pheromone
+                if best_path is not None and best_cost > 0 and not bounded:
+                    bounded = True
+                    tau0 = 1.0 / (len(best_path) * best_cost)
+                    self._restart_pheromones(tau0)
+                if best_path is not None:
+                    best_edges = self._path_edges(edge_index, best_path.indices)
+                    pheromone[best_edges] *= (1 - evaporation_rate)
+            else:
+                pheromone *= (1 - evaporation_rate)
+            phase_start, phase_end = phase_end, time.perf_counter()
+            stats["time_evaporation"] += phase_end - phase_start
+            # Cộng pheromone cho các ant đạt goal (cả hai chiều của mỗi cạnh)
+            deposits = self._variant_deposits(variant, iteration_paths, best_path, best_cost,
+                                              evaporation_rate, rank_size)
+            if deposits:
+                self._deposit(edge_index, deposits)
+            if variant == "mmas" and best_path is not None and best_cost > 0:
+                since_best = iteration + 1 - stats["best_iteration"]
+                if not bounded or (since_best and since_best % restart_after == 0):
+                    # Best đầu tiên hoặc trì trệ restart_after iteration: mọi cạnh về tau_max
+                    stats["restarts"] += bounded
+                    bounded = True
+                    self._restart_pheromones(1.0 / (evaporation_rate * best_cost))
+                else:
+                    self._clamp_pheromones(best_cost, len(best_path), evaporation_rate, p_best, mean_choices)
+            stats["time_deposit"] += time.perf_counter() - phase_end
+            stats["iterations"] = iteration + 1
+            if log_file is not None:
+                write_path_log(log_file, iteration, [path.indices for path, _ in iteration_paths], self.grid_size)
+            if on_iteration is not None:
+                iteration_costs = [cost for _, cost in iteration_paths]
+                on_iteration({
+                    "iteration": iteration,
+                    "reached": len(iteration_costs),
+                    "iteration_best_cost": min(iteration_costs, default=float("inf")),
+                    "mean_cost": sum(iteration_costs) / len(iteration_costs) if iteration_costs else float("inf"),
+                    "best_cost": best_cost,
+                })
+            if keep_paths:
+                all_paths.append(iteration_paths)
+            if stop_on_convergence and convergence_iter is not None:
+                if iteration + 1 < num_iterations:
+                    stats["stop_reason"] = "converged"
+                break
+        stats["success_ratio"] = stats["successful_ants"] / stats["ants"] if stats["ants"] else 0.0
+        stats["steps_per_ant"] = stats["ant_steps"] / stats["ants"] if stats["ants"] else 0.0
+        stats["time_total"] = time.perf_counter() - started
+        if isinstance(path_log, str):
+            log_file.close()
         if convergence_iter is None:
-            convergence_iter = num_iterations
+            convergence_iter = stats["iterations"]
         return best_path, best_cost, all_paths, convergence_iter
 
+    def _reachable_from(self, goal, neighbors, can_move):
+        """Mask các ô tới được goal (flood fill theo từng lớp BFS từ goal; các bước đi là đối xứng)."""
+        reachable = np.zeros(len(neighbors), dtype=bool)
+        reachable[goal] = True
+        frontier = np.array([goal])
+        while len(frontier):
+            candidates = neighbors[frontier][can_move[frontier]]
+            frontier = np.unique(candidates[~reachable[candidates]])
+            reachable[frontier] = True
+        return reachable
+
+    def _variant_deposits(self, variant, iteration_paths, best_path, best_cost, evaporation_rate, rank_size):
+        """Danh sách (mảng chỉ số ô, lượng deposit) của một iteration theo variant của aco()."""
+        if variant == "as":
+            # start == goal: path [start] có chi phí 0, không có cạnh nào để deposit
+            return [(path.indices, 1.0 / cost) for path, cost in iteration_paths if cost > 0]
+        # Như "as": bỏ path chi phí 0 (start == goal) ở mọi variant
+        iteration_paths = [(path, cost) for path, cost in iteration_paths if cost > 0]
+        has_best = best_path is not None and best_cost > 0
+        if variant == "rank":
+            ranked = sorted(iteration_paths, key=lambda item: item[1])[:rank_size - 1]
+            deposits = [(path.indices, (rank_size - rank) / cost) for rank, (path, cost) in enumerate(ranked, 1)]
+            if has_best:
+                deposits.append((best_path.indices, rank_size / best_cost))
+            return deposits
+        if variant == "mmas":
+            if not iteration_paths:
+                return []
+            path, cost = min(iteration_paths, key=lambda item: item[1])
+            return [(path.indices, 1.0 / cost)]
+        # acs
+        return [(best_path.indices, evaporation_rate / best_cost)] if has_best else []
+
+    def _path_edges(self, edge_index, indices):
+        """Chỉ số trong self.pheromone (phẳng) của các cạnh trên path (mảng chỉ số ô)."""
+        return edge_index[indices[:-1], step_directions(indices[:-1], indices[1:], self.grid_size)]
+
+    def _restart_pheromones(self, value):
+        self.pheromone[...] = np.where(self._forward_edges, value, 0.0)
+
+    def _clamp_pheromones(self, best_cost, best_length, evaporation_rate, p_best, mean_choices):
+        """MMAS: kẹp pheromone trong [tau_min, tau_max] (tau_min theo công thức p_best của Stützle & Hoos)."""
+        tau_max = 1.0 / (evaporation_rate * best_cost)
+        root = p_best ** (1.0 / max(best_length - 1, 1))
+        tau_min = min(tau_max * (1 - root) / ((mean_choices - 1) * root), tau_max)
+        np.clip(self.pheromone, tau_min, tau_max, out=self.pheromone)
+        self.pheromone[~self._forward_edges] = 0.0
+
+    def _should_stop(self, deadline, cancel, stats):
+        """Kiểm tra deadline/cancel của aco(); ghi lý do dừng vào stats."""
+        if cancel is not None and cancel.is_set():
+            stats["stop_reason"] = "cancelled"
+        elif time.perf_counter() > deadline:
+            stats["stop_reason"] = "deadline"
+        return stats["stop_reason"] != "completed"
+
+    def _deposit(self, edge_index, paths):
+        """Cộng deposit lên các cạnh của từng path (mảng chỉ số ô) trong self.pheromone."""
+        cells = np.concatenate([indices[:-1] for indices, _ in paths])
+        next_cells = np.concatenate([indices[1:] for indices, _ in paths])
+        amounts = np.concatenate([np.full(len(indices) - 1, deposit) for indices, deposit in paths])
+        directions = step_directions(cells, next_cells, self.grid_size)
+        np.add.at(self.pheromone.reshape(-1), edge_index[cells, directions], amounts)
+
+    def aco_multi_colony(self, num_colonies=4, num_iterations=100, migration_interval=10,
+                         migration_weight=0.5, processes=None, seed=0, use_pool=None, **aco_kwargs):
+        """
+        Chạy num_colonies đàn kiến độc lập song song (multiprocessing.Pool), trộn pheromone định kỳ.
+        - Mỗi epoch, mỗi đàn chạy aco() migration_interval vòng lặp trên pheromone riêng của nó; sau đó
+          pheromone của mỗi đàn được kéo về trung bình các đàn: (1 - migration_weight) * riêng + migration_weight * trung bình.
+        - Seed của đàn k ở epoch e là SeedSequence([seed, k, e]) nên kết quả không phụ thuộc số process.
+        - processes: số process (mặc định num_colonies); 1 thì chạy tuần tự trong process hiện tại.
+        - use_pool: None thì dùng Pool khi processes > 1; True thì luôn dùng Pool (kể cả 1 process, vd. để đo
+          cùng một đường chạy khi so sánh số process).
+        - Nếu có self.distance_cache, field của goal được gửi sang các process nên heuristic giống hệt khi
+          chạy trong process hiện tại.
+        - aco_kwargs: tham số còn lại truyền cho aco() (num_ants, evaporation_rate, alpha, beta, ...).
+        Trả về: (best_path, best_cost, colony_best_costs), colony_best_costs[k] là best_cost của đàn k sau mỗi epoch.
+        """
+        processes = num_colonies if processes is None else processes
+        self._initialize_pheromones()
+        pheromones = [self.pheromone.copy() for _ in range(num_colonies)]
+        best_path = None
+        best_cost = float("inf")
+        colony_best_costs = [[] for _ in range(num_colonies)]
+        pool = None
+        if use_pool or (use_pool is None and processes > 1):
+            from multiprocessing import Pool
+            goal_field = None
+            if self.distance_cache is not None:
+                goal_field = self.distance_cache.get(self, self.goal.index)
+            pool = Pool(processes, initializer=_init_colony_worker,
+                        initargs=(self.occupancy, self.start.index, self.goal.index, goal_field))
+        try:
+            done = 0
+            epoch = 0
+            while done < num_iterations:
+                iterations = min(migration_interval, num_iterations - done)
+                tasks = [(pheromones[k], iterations, np.random.SeedSequence([seed, k, epoch]), aco_kwargs)
+                         for k in range(num_colonies)]
+                if pool is not None:
+                    results = pool.map(_colony_worker, tasks)
+                else:
+                    results = [_run_colony(self, *task) for task in tasks]
+                for k, (pheromone, path, cost) in enumerate(results):
+                    pheromones[k] = pheromone
+                    colony_best_costs[k].append(min(cost, colony_best_costs[k][-1]) if colony_best_costs[k] else cost)
+                    if cost < best_cost:
+                        best_cost = cost
+                        best_path = NodePath(self, path)
+                mean = np.mean(pheromones, axis=0)
+                pheromones = [(1 - migration_weight) * pheromone + migration_weight * mean for pheromone in pheromones]
+                done += iterations
+                epoch += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.pheromone[...] = np.mean(pheromones, axis=0)
+        return best_path, best_cost, colony_best_costs
+
+def _run_colony(graph, pheromone, iterations, seed, aco_kwargs):
+    """Chạy một epoch của một đàn trên graph từ pheromone cho trước; trả về pheromone mới và best path (chỉ số ô)."""
+    graph.pheromone[...] = pheromone
+    best_path, best_cost, _, _ = graph.aco(num_iterations=iterations, seed=seed, reset_pheromones=False,
+                                           keep_paths=False, **aco_kwargs)
+    path = best_path.indices if best_path is not None else None
+    return graph.pheromone.copy(), path, best_cost
+
+# GraphACO của mỗi process trong aco_multi_colony, dựng một lần khi khởi tạo Pool
+_colony_graph = None
+
+def _init_colony_worker(occupancy, start, goal, goal_field=None):
+    global _colony_graph
+    n = len(occupancy)
+    _colony_graph = GraphACO(n)
+    _colony_graph.load_occupancy(occupancy)
+    _colony_graph.set_start(*divmod(start, n))
+    _colony_graph.set_goal(*divmod(goal, n))
+    if goal_field is not None:
+        # distance_cache của process cha không được gửi sang: dựng cache chỉ chứa field của goal
+        _colony_graph.distance_cache = DistanceFieldCache(max_entries=1)
+        _colony_graph.distance_cache.put(_colony_graph, goal, goal_field)
+
+def _colony_worker(task):
+    return _run_colony(_colony_graph, *task)
+
+def step_directions(cells, next_cells, grid_size):
+    """Chỉ số hướng trong DIRECTIONS của từng bước cells[i] -> next_cells[i] (chỉ số ô phẳng)."""
+    offsets = np.array([dx * grid_size + dy for dx, dy in DIRECTIONS])
+    order = np.argsort(offsets)
+    return order[np.searchsorted(offsets[order], np.asarray(next_cells) - np.asarray(cells))]
+
+# File log đường đi của aco(path_log=...): header PATH_LOG_MAGIC + grid_size (int32), sau đó mỗi path là
+# (iteration, start, num_steps) int32 + num_steps mã hướng uint8 (chỉ số trong DIRECTIONS)
+PATH_LOG_MAGIC = b"ACOP"
+PATH_LOG_RECORD = np.dtype([("iteration", "<i4"), ("start", "<i4"), ("num_steps", "<i4")])
+
+def write_path_log_header(file, grid_size):
+    file.write(PATH_LOG_MAGIC + np.int32(grid_size).tobytes())
+
+def write_path_log(file, iteration, paths, grid_size):
+    """Ghi các path (mảng chỉ số ô) của một iteration vào file theo dạng nén."""
+    for indices in paths:
+        record = np.array([(iteration, indices[0], len(indices) - 1)], dtype=PATH_LOG_RECORD)
+        file.write(record.tobytes())
+        file.write(step_directions(indices[:-1], indices[1:], grid_size).astype(np.uint8).tobytes())
+
+def read_path_log(filename):
+    """
+    Đọc lại file log của aco(path_log=...); generator trả về (iteration, path) với path là list (x, y),
+    mỗi lần chỉ giữ một path trong bộ nhớ.
+    """
+    with open(filename, "rb") as file:
+        if file.read(len(PATH_LOG_MAGIC)) != PATH_LOG_MAGIC:
+            raise ValueError(f"{filename} không phải file log đường đi ACO")
+        grid_size = int(np.frombuffer(file.read(4), dtype="<i4")[0])
+        offsets = np.array([dx * grid_size + dy for dx, dy in DIRECTIONS])
+        while True:
+            header = file.read(PATH_LOG_RECORD.itemsize)
+            if not header:
+                break
+            iteration, start, num_steps = np.frombuffer(header, dtype=PATH_LOG_RECORD)[0].tolist()
+            codes = np.frombuffer(file.read(num_steps), dtype=np.uint8)
+            indices = np.concatenate(([start], start + np.cumsum(offsets[codes])))
+            yield iteration, [divmod(index, grid_size) for index in indices.tolist()]
+
 def draw_grid(screen, grid_size, cell_size):
     for x in range(grid_size):
         for y in range(grid_size):
@@ -380,6 +682,7 @@ def main():
         print("Best path:", [(node.x, node.y) for node in best_path])
         print("Best cost:", best_cost)
         print("Conv:", conv)
+        print("Iterations:", graph.run_stats["iterations"], f"({graph.run_stats['stop_reason']})")
         # print("Path deviation (radians):", calculate_deviation(best_path))
     else:
         print("No path found by ACO.")
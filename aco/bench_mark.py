@@ -5,6 +5,11 @@ import os
 from heapq import heappush, heappop
 import time
 import math
+import hashlib
+from collections import OrderedDict
+from collections.abc import Sequence
+from array import array
+import numpy as np
 
 # Hàm tạo màu dựa trên cost
 def get_cost_color(cost, max_cost):
@@ -16,50 +21,306 @@ def get_cost_color(cost, max_cost):
     b = 0
     return (r, g, b)
 
+# 8 hướng di chuyển (dx, dy), cùng thứ tự với danh sách neighbors cũ; bit d của mask ứng với DIRECTIONS[d]
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1),
+              (-1, -1), (-1, 1), (1, -1), (1, 1))
+# OPPOSITE_DIRECTION[d]: chỉ số của hướng ngược với DIRECTIONS[d]
+OPPOSITE_DIRECTION = np.array([DIRECTIONS.index((-dx, -dy)) for dx, dy in DIRECTIONS])
+STRAIGHT_COST = 1
+DIAGONAL_COST = 1.41
+
+def move_masks(occupancy):
+    """Mask 8 bit (moves, adjacent) cho mỗi ô của occupancy grid vuông, xem Graph._build_moves."""
+    n = len(occupancy)
+    free = np.asarray(occupancy) == 0
+    padded = np.zeros((n + 2, n + 2), dtype=bool)
+    padded[1:-1, 1:-1] = free
+    moves = np.zeros((n, n), dtype=np.uint8)
+    adjacent = np.zeros((n, n), dtype=np.uint8)
+    for d, (dx, dy) in enumerate(DIRECTIONS):
+        ok = free & padded[1 + dx:n + 1 + dx, 1 + dy:n + 1 + dy]
+        adjacent |= ok.astype(np.uint8) << d
+        if dx and dy:
+            ok &= padded[1 + dx:n + 1 + dx, 1:n + 1] & padded[1:n + 1, 1 + dy:n + 1 + dy]
+        moves |= ok.astype(np.uint8) << d
+    return moves, adjacent
+
 class Node:
-    def __init__(self, x, y, is_obstacle=False, cost=1):
+    """View nhẹ lên ô (x, y) của Graph.
+
+    Dữ liệu thật nằm trong các mảng NumPy của Graph (occupancy, cost) và trong trạng thái
+    của lần tìm kiếm gần nhất (parent, g_score); Node chỉ giữ giao diện cũ để code vẽ vẫn chạy.
+    Hai Node cùng toạ độ trên cùng Graph được coi là bằng nhau.
+    """
+    __slots__ = ('graph', 'x', 'y')
+
+    def __init__(self, graph, x, y):
+        self.graph = graph
         self.x = x
         self.y = y
-        self.is_obstacle = is_obstacle
-        self.neighbors = []
-        self.cost = float('inf') if is_obstacle else cost  # Cost mặc định
-        self.g_score = float('inf')  # Dùng cho A*
-        self.h_score = float('inf')  # heuristic
-        self.f_score = float('inf')  # Dùng cho A*
-        self.parent = None
 
-    def add_neighbor(self, neighbor):
-        self.neighbors.append(neighbor)
+    @property
+    def index(self):
+        return self.x * self.graph.grid_size + self.y
+
+    @property
+    def is_obstacle(self):
+        return bool(self.graph.occupancy[self.x, self.y])
+
+    @property
+    def cost(self):
+        return float(self.graph.cost[self.x, self.y])
+
+    @property
+    def neighbors(self):
+        nodes = (self.graph.get_node(self.x + dx, self.y + dy) for dx, dy in DIRECTIONS)
+        return [node for node in nodes if node is not None]
+
+    @property
+    def g_score(self):
+        return self.graph.search_state.g_score_of(self.index)
+
+    @property
+    def parent(self):
+        parent = self.graph.search_state.parent_of(self.index)
+        return self.graph.node_at(parent) if parent >= 0 else None
+
+    def __eq__(self, other):
+        return (isinstance(other, Node) and self.graph is other.graph
+                and self.x == other.x and self.y == other.y)
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return f"Node({self.x}, {self.y})"
+
+class NodePath(Sequence):
+    """Dãy Node lazy trên mảng chỉ số phẳng của các ô (đường đi), Node chỉ được tạo khi truy cập."""
+    __slots__ = ('graph', 'indices')
+
+    def __init__(self, graph, indices):
+        self.graph = graph
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return NodePath(self.graph, self.indices[i])
+        return self.graph.node_at(int(self.indices[i]))
+
+    def __repr__(self):
+        return f"NodePath({[divmod(int(index), self.graph.grid_size) for index in self.indices]})"
+
+class SearchState:
+    """Scratch của các lần tìm kiếm trên một Graph: g_score, parent và closed theo chỉ số phẳng của ô.
+
+    Mỗi ô mang dấu generation: dữ liệu của ô chỉ hợp lệ khi seen[i] (hoặc closed[i]) bằng generation
+    hiện tại, nên reset() cho truy vấn mới là O(1) thay vì xoá cả mảng. Các thuộc tính là memoryview
+    phẳng (truy cập từng phần tử nhanh trong vòng lặp Python); np.asarray() lên chúng không copy.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.generation = 0
+        self.g_score = memoryview(np.full(size, np.inf, dtype=np.float64))
+        self.parent = memoryview(np.full(size, -1, dtype=np.int64))
+        self.seen = memoryview(np.zeros(size, dtype=np.uint32))    # generation mà g_score/parent của ô hợp lệ
+        self.closed = memoryview(np.zeros(size, dtype=np.uint32))  # generation mà ô đã được mở rộng
+
+    def reset(self):
+        """Bắt đầu truy vấn mới; chỉ xoá thật các mảng khi bộ đếm uint32 bị tràn."""
+        self.generation += 1
+        if self.generation > 0xFFFFFFFF:
+            np.asarray(self.seen)[:] = 0
+            np.asarray(self.closed)[:] = 0
+            self.generation = 1
+        return self.generation
+
+    def visit(self, index, g_score, parent):
+        self.seen[index] = self.generation
+        self.g_score[index] = g_score
+        self.parent[index] = parent
+
+    def g_score_of(self, index):
+        return self.g_score[index] if self.seen[index] == self.generation else float('inf')
+
+    def parent_of(self, index):
+        return self.parent[index] if self.seen[index] == self.generation else -1
+
+class FrontierLog(Sequence):
+    """Frontier (open set, queue, stack hay cây) của một lần tìm kiếm theo từng bước, lưu dạng delta.
+
+    Thuật toán gọi add()/remove() khi ô vào/ra frontier (gọi lặp lại không sao) và step() tại mỗi điểm
+    snapshot. step() chỉ ghi hiệu thật sự so với snapshot trước: ô mới vào (added) và ô đã ra (removed),
+    chỉ số phẳng trong mảng int32, nên bộ nhớ tỉ lệ với số thay đổi thay vì tổng kích thước các snapshot.
+    frontier_log[i] dựng lại danh sách (x, y) của snapshot i bằng cách áp delta tiến/lùi từ vị trí đọc
+    trước đó, nên phát lại tuần tự (draw_map) chỉ tốn phần delta của mỗi bước.
+    """
+    def __init__(self, grid_size, initial=()):
+        self.grid_size = grid_size
+        size = grid_size * grid_size
+        self.added = array('i')
+        self.removed = array('i')
+        # Vị trí kết thúc delta của mỗi bước trong added / removed
+        self.added_end = array('q')
+        self.removed_end = array('q')
+        self._member = bytearray(size)    # Frontier hiện tại của thuật toán
+        self._recorded = bytearray(size)  # Frontier tại snapshot gần nhất
+        self._touched = []
+        self._frontier = set()  # Frontier đang dựng lại tại bước _cursor
+        self._cursor = -1
+        for index in initial:
+            self.add(index)
+
+    def add(self, index):
+        if not self._member[index]:
+            self._member[index] = 1
+            self._touched.append(index)
+
+    def remove(self, index):
+        if self._member[index]:
+            self._member[index] = 0
+            self._touched.append(index)
+
+    def step(self):
+        """Kết thúc một bước: ghi delta của các ô thay đổi kể từ snapshot trước."""
+        member, recorded = self._member, self._recorded
+        for index in self._touched:
+            if member[index] != recorded[index]:
+                recorded[index] = member[index]
+                (self.added if member[index] else self.removed).append(index)
+        self._touched.clear()
+        self.added_end.append(len(self.added))
+        self.removed_end.append(len(self.removed))
+
+    @property
+    def nbytes(self):
+        """Số byte của các mảng delta."""
+        return sum(len(buffer) * buffer.itemsize
+                   for buffer in (self.added, self.removed, self.added_end, self.removed_end))
+
+    def _delta(self, step):
+        added_start = self.added_end[step - 1] if step else 0
+        removed_start = self.removed_end[step - 1] if step else 0
+        return self.added[added_start:self.added_end[step]], self.removed[removed_start:self.removed_end[step]]
+
+    def cells(self, step):
+        """Chỉ số phẳng (tăng dần) các ô trong frontier tại snapshot step."""
+        if step < 0:
+            step += len(self)
+        if not 0 <= step < len(self):
+            raise IndexError(step)
+        frontier = self._frontier
+        while self._cursor < step:
+            self._cursor += 1
+            added, removed = self._delta(self._cursor)
+            frontier.difference_update(removed)
+            frontier.update(added)
+        while self._cursor > step:
+            added, removed = self._delta(self._cursor)
+            frontier.difference_update(added)
+            frontier.update(removed)
+            self._cursor -= 1
+        cells = np.fromiter(frontier, dtype=np.int64, count=len(frontier))
+        cells.sort()
+        return cells
+
+    def __len__(self):
+        return len(self.added_end)
+
+    def __getitem__(self, step):
+        x, y = np.divmod(self.cells(step), self.grid_size)
+        return list(zip(x.tolist(), y.tolist()))
+
+
+class DistanceFieldCache:
+    """Cache các distance field (chi phí thật từ mọi ô tới một goal) theo (map_hash, goal).
+
+    - Trong bộ nhớ: LRU, giữ tối đa max_entries field.
+    - Trên đĩa (nếu có cache_dir): mỗi field là một file <map_hash>_<goal>.npy, giữ tối đa
+      max_disk_entries file, file dùng lâu nhất (theo mtime) bị xoá trước.
+    Gắn vào Graph qua graph.distance_cache để A* dùng field làm heuristic hoàn hảo và ACO dùng làm eta.
+    """
+    def __init__(self, max_entries=16, cache_dir=None, max_disk_entries=256):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self._fields = OrderedDict()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, map_hash, goal):
+        return os.path.join(self.cache_dir, f"{map_hash}_{goal}.npy")
+
+    def get(self, graph, goal):
+        """Trả về distance field (mảng phẳng float64, inf nếu không tới được) của goal trên graph."""
+        key = (graph.map_hash(), goal)
+        field = self._fields.get(key)
+        if field is not None:
+            self._fields.move_to_end(key)
+            return field
+        path = self._path(*key) if self.cache_dir else None
+        if path and os.path.exists(path):
+            field = np.load(path)
+            os.utime(path)  # đánh dấu vừa dùng cho LRU trên đĩa
+        else:
+            field = graph.distance_field(goal)
+            if path:
+                np.save(path, field)
+                self._evict_disk()
+        self._fields[key] = field
+        while len(self._fields) > self.max_entries:
+            self._fields.popitem(last=False)
+        return field
+
+    def put(self, graph, goal, field):
+        """Thêm field đã tính sẵn của goal trên graph (vd. field gửi từ process khác) vào cache trong bộ nhớ."""
+        key = (graph.map_hash(), goal)
+        self._fields[key] = field
+        self._fields.move_to_end(key)
+        while len(self._fields) > self.max_entries:
+            self._fields.popitem(last=False)
+
+    def precompute(self, graph, goals):
+        """Tính trước field cho các goal (x, y), ví dụ tập điểm docking cố định."""
+        for x, y in goals:
+            self.get(graph, x * graph.grid_size + y)
+
+    def _evict_disk(self):
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.npy')]
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_disk_entries]:
+            os.remove(path)
 
 class Graph:
     def __init__(self, grid_size, use_random=False, obstacle_ratio=0.3, json_file=None):
         self.grid_size = grid_size
-        self.nodes = {}
+        # Occupancy grid (1 = vật cản) và cost đi vào ô (inf cho vật cản), chỉ số [x, y]
+        self.occupancy = np.zeros((grid_size, grid_size), dtype=np.uint8)
+        self.cost = np.ones((grid_size, grid_size), dtype=np.float32)
         self.start = None
         self.goal = None
         self.path_log = []
         self.max_cost = grid_size * 2
+        # Trạng thái tìm kiếm dùng lại giữa các truy vấn (tạo khi cần, xem SearchState)
+        self._search_state = None
+        self._backward_state = None  # SearchState của nửa tìm từ goal (bidirectional_bfs / bidirectional_a_star)
+        # DistanceFieldCache (tuỳ chọn): có thì A* dùng chi phí thật tới goal làm heuristic
+        self.distance_cache = None
+        self._map_hash = None
 
         if json_file and os.path.exists(json_file):
             self.load_from_json(json_file)
         else:
-            for x in range(grid_size):
-                for y in range(grid_size):
-                    cost = 1  # Mặc định cost là 1
-                    self.nodes[(x, y)] = Node(x, y, is_obstacle=False, cost=cost)
+            self.load_occupancy(self.occupancy)
             self.set_start(0, 0)
             self.goal = self.get_random_free_cell()
             while self.goal == self.start:
                 self.goal = self.get_random_free_cell()
-
-        for x in range(grid_size):
-            for y in range(grid_size):
-                current_node = self.nodes[(x, y)]
-                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1),
-                               (-1, -1), (-1, 1), (1, -1), (1, 1)]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < grid_size and 0 <= ny < grid_size:
-                        current_node.add_neighbor(self.nodes[(nx, ny)])
         if not self.goal:
             self.goal = self.get_random_free_cell()
 
@@ -67,162 +328,901 @@ class Graph:
         with open(json_file, 'r') as f:
             data = json.load(f)
             maze_data = data.get("data")
-            for x in range(self.grid_size):
-                for y in range(self.grid_size):
-                    is_obstacle = (maze_data[x][y] == 1)
-                    cost = float('inf') if is_obstacle else 1
-                    self.nodes[(x, y)] = Node(x, y, is_obstacle, cost)
+        self.load_occupancy(maze_data)
+
+    def load_occupancy(self, occupancy):
+        """Nạp occupancy grid (ma trận [x][y], 1 = vật cản) rồi tính lại cost và các bước đi hợp lệ."""
+        n = self.grid_size
+        maze = np.asarray(occupancy)[:n, :n]
+        self.occupancy[...] = (maze == 1)
+        self.cost[...] = 1
+        self.cost[self.occupancy == 1] = np.inf
+        self._map_hash = None
+        self._build_moves()
+
+    def set_obstacle(self, x, y, blocked=True):
+        """
+        Đặt (blocked=True) hoặc xóa vật cản cho một ô hoặc một batch ô (x, y là số hoặc mảng cùng độ dài,
+        blocked là bool hoặc mảng bool). Chỉ tính lại mask bước đi trong cửa sổ 3x3 quanh mỗi ô thay đổi.
+        Trả về mảng chỉ số phẳng (tăng dần) các ô có mask moves/adjacent hoặc cost thay đổi.
+        """
+        n = self.grid_size
+        xs, ys = np.atleast_1d(x).astype(np.int64), np.atleast_1d(y).astype(np.int64)
+        blocked = np.broadcast_to(np.asarray(blocked, dtype=bool), xs.shape)
+        changed = self.occupancy[xs, ys] != blocked
+        xs, ys, blocked = xs[changed], ys[changed], blocked[changed]
+        if not len(xs):
+            return np.zeros(0, dtype=np.int64)
+        self.occupancy[xs, ys] = blocked
+        self.cost[xs, ys] = np.where(blocked, np.inf, 1)
+        self._map_hash = None
+        affected = [xs * n + ys]
+        for cx, cy in zip(xs.tolist(), ys.tolist()):
+            # Mask của ô trong cửa sổ 3x3 phụ thuộc các ô kề của nó, nên tính trên vùng 5x5
+            x0, y0 = max(cx - 2, 0), max(cy - 2, 0)
+            block = self.occupancy[x0:cx + 3, y0:cy + 3]
+            size = max(block.shape)
+            padded = np.ones((size, size), dtype=np.uint8)
+            padded[:block.shape[0], :block.shape[1]] = block
+            moves, adjacent = move_masks(padded)
+            wx0, wx1 = max(cx - 1, 0), min(cx + 2, n)
+            wy0, wy1 = max(cy - 1, 0), min(cy + 2, n)
+            new_moves = moves[wx0 - x0:wx1 - x0, wy0 - y0:wy1 - y0]
+            new_adjacent = adjacent[wx0 - x0:wx1 - x0, wy0 - y0:wy1 - y0]
+            diff = (self.moves[wx0:wx1, wy0:wy1] != new_moves) | (self.adjacent[wx0:wx1, wy0:wy1] != new_adjacent)
+            self.moves[wx0:wx1, wy0:wy1] = new_moves
+            self.adjacent[wx0:wx1, wy0:wy1] = new_adjacent
+            dx, dy = np.nonzero(diff)
+            affected.append((dx + wx0) * n + dy + wy0)
+        return np.unique(np.concatenate(affected))
+
+    def map_hash(self):
+        """Hash nội dung map (kích thước + occupancy), dùng làm key cho DistanceFieldCache."""
+        if self._map_hash is None:
+            digest = hashlib.sha1(str(self.grid_size).encode())
+            digest.update(self.occupancy.tobytes())
+            self._map_hash = digest.hexdigest()
+        return self._map_hash
+
+    def _build_moves(self):
+        """Tính mask 8 bit cho mỗi ô: bit d bật nếu đi được theo DIRECTIONS[d].
+
+        - moves: ô đích trống, nằm trong grid và không "cắt góc" vật cản khi đi chéo (A*, ACO, RRT).
+        - adjacent: chỉ cần ô đích trống và nằm trong grid (BFS, DFS).
+        """
+        n = self.grid_size
+        self.moves, self.adjacent = move_masks(self.occupancy)
+        # memoryview phẳng để vòng lặp Python đọc nhanh (trả về int thay vì np.uint8)
+        self._moves_flat = memoryview(self.moves.reshape(-1))
+        self._adjacent_flat = memoryview(self.adjacent.reshape(-1))
+        self._cost_flat = memoryview(self.cost.reshape(-1))
+        self._occupancy_flat = memoryview(self.occupancy.reshape(-1))
+        # Bảng tra: mask -> các (offset chỉ số phẳng, chi phí bước) theo thứ tự DIRECTIONS
+        self._move_table = [
+            tuple((dx * n + dy, DIAGONAL_COST if dx and dy else STRAIGHT_COST)
+                  for d, (dx, dy) in enumerate(DIRECTIONS) if mask >> d & 1)
+            for mask in range(256)
+        ]
 
     def get_node(self, x, y):
-        return self.nodes.get((x, y))
+        if 0 <= x < self.grid_size and 0 <= y < self.grid_size:
+            return Node(self, x, y)
+        return None
+
+    def node_at(self, index):
+        x, y = divmod(index, self.grid_size)
+        return Node(self, x, y)
 
     def get_random_free_cell(self):
         while True:
             x = random.randint(0, self.grid_size - 1)
             y = random.randint(0, self.grid_size - 1)
-            if not self.nodes[(x, y)].is_obstacle:
-                return self.nodes[(x, y)]
+            if not self.occupancy[x, y]:
+                return Node(self, x, y)
 
     def set_start(self, x, y):
-        self.start = self.nodes[(x, y)]
+        self.start = self.get_node(x, y)
 
     def set_goal(self, x, y):
-        self.goal = self.nodes[(x, y)]
+        self.goal = self.get_node(x, y)
+
+    @property
+    def search_state(self):
+        """SearchState của truy vấn gần nhất (Node.parent / Node.g_score đọc từ đây)."""
+        if self._search_state is None:
+            self._search_state = SearchState(self.grid_size * self.grid_size)
+        return self._search_state
+
+    def _new_search(self, start):
+        """Reset O(1) trạng thái tìm kiếm cho truy vấn mới và đặt start với g_score = 0."""
+        state = self.search_state
+        state.reset()
+        state.visit(start, 0, -1)
+        return state
+
+    def _reconstruct_path(self, index):
+        state = self.search_state
+        path = []
+        while index >= 0:
+            path.append(divmod(index, self.grid_size))
+            index = state.parent_of(index)
+        return path[::-1]
 
-    def a_star(self):
-        open_set = [(self.start.f_score, id(self.start), self.start)]
-        closed_set = set()
+    def a_star(self, record_frontier=False):
+        # Open set là binary heap (heapq) với lazy deletion: khi g_score của một ô giảm,
+        # ta push entry mới và bỏ qua entry cũ (stale) khi pop ra, thay vì quét/xoá trong list.
+        # Các ô được đánh chỉ số phẳng x * grid_size + y, láng giềng tính bằng offset.
+        # Entry: (f, h, push_count, ô): khi f bằng nhau ưu tiên ô gần goal hơn (h nhỏ).
+        n = self.grid_size
+        moves = self._moves_flat
+        move_table = self._move_table
+        start, goal = self.start.index, self.goal.index
+        goal_x, goal_y = self.goal.x, self.goal.y
+        # Heuristic: chi phí thật từ distance field nếu có distance_cache, ngược lại Manhattan
+        field = None
+        if self.distance_cache is not None:
+            field = memoryview(self.distance_cache.get(self, goal))
+        state = self._new_search(start)
+        generation = state.generation
+        g_score, parent, seen, closed = state.g_score, state.parent, state.seen, state.closed
+        expanded = 0  # Kích thước closed set
+        push_count = 0
+        start_h = field[start] if field is not None else abs(self.start.x - goal_x) + abs(self.start.y - goal_y)
+        open_set = [(start_h, start_h, push_count, start)]
         iteration_count = 0
-        self.start.g_score = 0
-        self.start.f_score = abs(self.start.x - self.goal.x) + abs(self.start.y - self.goal.y)
-        log = []           # Lưu các node đã mở rộng (closed_set)
-        frontier_log = []  # Lưu trạng thái open_set ở mỗi bước
+        log = []  # Lưu các node đã mở rộng (closed_set)
+        # Trạng thái open_set ở mỗi bước (FrontierLog) chỉ khi record_frontier, ngược lại None
+        frontier_log = FrontierLog(n, (start,)) if record_frontier else None
 
         while open_set:
+            _, _, _, current = heappop(open_set)
+            if closed[current] == generation:
+                continue  # Entry cũ (stale), ô đã được mở rộng với g_score tốt hơn
             iteration_count += 1
-            # Lưu trạng thái của open_set (frontier)
-            frontier_log.append([(node.x, node.y) for _, _, node in open_set])
-            current_tuple = min(open_set, key=lambda x: (x[0], x[1]))
-            current = current_tuple[2]
-            open_set.remove(current_tuple)
-
-            if current == self.goal:
-                path = []
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
-                total_explored = len(closed_set) + 1  # tính cả goal
-                final_cost = self.goal.g_score
-                return path[::-1], log, frontier_log, total_explored, final_cost, iteration_count
-
-            closed_set.add(current)
-            log.append((current.x, current.y))
-
-            for neighbor in current.neighbors:
-                if neighbor in closed_set or neighbor.is_obstacle:
+            if frontier_log is not None:
+                # Snapshot open set trước khi lấy current ra (lưu dạng delta)
+                frontier_log.step()
+                frontier_log.remove(current)
+
+            if current == goal:
+                total_explored = expanded + 1  # tính cả goal
+                final_cost = g_score[goal]
+                return self._reconstruct_path(goal), log, frontier_log, total_explored, final_cost, iteration_count
+
+            closed[current] = generation
+            expanded += 1
+            log.append(divmod(current, n))
+
+            current_g = g_score[current]
+            # moves đã loại vật cản, ô ngoài grid và bước chéo "cutting corners"
+            for offset, move_cost in move_table[moves[current]]:
+                neighbor = current + offset
+                if closed[neighbor] == generation:
                     continue
-                dx = neighbor.x - current.x
-                dy = neighbor.y - current.y
-                # Nếu di chuyển chéo, kiểm tra "cutting corners"
-                if abs(dx) == 1 and abs(dy) == 1:
-                    node_horizontal = self.get_node(current.x + dx, current.y)
-                    node_vertical = self.get_node(current.x, current.y + dy)
-                    if node_horizontal.is_obstacle or node_vertical.is_obstacle:
-                        continue
-                    move_cost = 1.41
-                else:
-                    move_cost = 1
-
-                tentative_g_score = current.g_score + move_cost
-
-                if tentative_g_score < neighbor.g_score:
-                    neighbor.parent = current
-                    neighbor.g_score = tentative_g_score
-                    neighbor.f_score = neighbor.g_score + abs(neighbor.x - self.goal.x) + abs(neighbor.y - self.goal.y)
-                    neighbor_in_open = False
-                    for item in open_set:
-                        if item[2] == neighbor:
-                            neighbor_in_open = True
-                            open_set.remove(item)
-                            open_set.append((neighbor.f_score, id(neighbor), neighbor))
-                            break
-                    if not neighbor_in_open:
-                        open_set.append((neighbor.f_score, id(neighbor), neighbor))
-        return [], log, frontier_log, len(closed_set), 0, iteration_count
+                tentative_g_score = current_g + move_cost
+                if seen[neighbor] != generation or tentative_g_score < g_score[neighbor]:
+                    seen[neighbor] = generation
+                    parent[neighbor] = current
+                    g_score[neighbor] = tentative_g_score
+                    if field is None:
+                        x, y = divmod(neighbor, n)
+                        h = abs(x - goal_x) + abs(y - goal_y)
+                    else:
+                        h = field[neighbor]
+                    push_count += 1
+                    # Làm tròn f để sai số cộng dồn 1.41 không phá thứ tự ưu tiên theo h khi f bằng nhau
+                    heappush(open_set, (round(tentative_g_score + h, 9), h, push_count, neighbor))
+                    if frontier_log is not None:
+                        frontier_log.add(neighbor)
+        return [], log, frontier_log, expanded, 0, iteration_count
     
-    def bfs(self):
+    def bfs(self, max_expansions=None, record_frontier=False):
+        """
+        BFS theo số bước (adjacent, chi phí cộng cost của ô đi vào).
+        Ô được đánh dấu seen (SearchState) ngay khi vào queue nên kiểm tra "đã ở trong queue" là O(1);
+        goal được kiểm tra ngay khi được sinh ra nên dừng sớm một lớp so với kiểm tra lúc lấy ra.
+        max_expansions (tuỳ chọn): dừng và trả về đường rỗng khi đã mở rộng từng đó ô.
+        Trả về: (path, log, frontier_log, total_explored, final_cost, iterations) như a_star.
+        """
         from collections import deque  # Dùng deque làm queue
-        
-        open_set = deque([self.start])  # Queue cho BFS
-        closed_set = set()
-        self.start.g_score = 0  # Chi phí từ start đến node
-        
+
+        n = self.grid_size
+        adjacent = self._adjacent_flat
+        move_table = self._move_table
+        cost = self._cost_flat
+        start, goal = self.start.index, self.goal.index
+        open_set = deque([start])  # Queue cho BFS
+        # Chi phí từ start đến node, parent và seen (đã vào queue) nằm trong SearchState
+        state = self._new_search(start)
+        generation = state.generation
+        g_score, parent, seen = state.g_score, state.parent, state.seen
+        expanded = 0  # Kích thước closed set
+
         log = []  # Lưu log các bước (closed_set)
-        frontier_log = []  # Lưu trạng thái open_set tại mỗi bước
+        # Trạng thái open_set tại mỗi bước (FrontierLog) chỉ khi record_frontier, ngược lại None
+        frontier_log = FrontierLog(n, (start,)) if record_frontier else None
+        if start == goal:
+            return self._reconstruct_path(goal), log, frontier_log, 1, 0, 0
 
-        while open_set:
-            # Lưu trạng thái hiện tại của open_set vào frontier_log
-            frontier_log.append([(node.x, node.y) for node in open_set])
-            
+        while open_set and expanded != max_expansions:
             current = open_set.popleft()  # Lấy node đầu tiên trong queue
+            if frontier_log is not None:
+                # Snapshot open_set trước khi lấy current ra (lưu dạng delta)
+                frontier_log.step()
+                frontier_log.remove(current)
+            expanded += 1
+            log.append(divmod(current, n))
+
+            # adjacent đã loại vật cản và ô ngoài grid
+            current_g = g_score[current]
+            for offset, _ in move_table[adjacent[current]]:
+                neighbor = current + offset
+                # Mỗi ô chỉ vào queue một lần
+                if seen[neighbor] != generation:
+                    seen[neighbor] = generation
+                    parent[neighbor] = current
+                    g_score[neighbor] = current_g + cost[neighbor]
+                    if neighbor == goal:
+                        total_explored = expanded + 1  # +1 để tính cả goal
+                        return self._reconstruct_path(goal), log, frontier_log, total_explored, g_score[goal], expanded
+                    open_set.append(neighbor)
+                    if frontier_log is not None:
+                        frontier_log.add(neighbor)
+
+        return [], log, frontier_log, expanded, 0, expanded  # Không tìm thấy đường
+
+    def dfs(self, max_expansions=None, record_frontier=False):
+        """
+        DFS (adjacent, chi phí cộng cost của ô đi vào), stack với membership O(1) qua seen của SearchState:
+        mỗi ô chỉ được đẩy vào stack một lần và giữ parent lúc được đẩy vào, nên đường đi giống bản quét stack cũ;
+        goal được kiểm tra ngay khi được sinh ra.
+        max_expansions (tuỳ chọn): dừng và trả về đường rỗng khi đã mở rộng từng đó ô.
+        Trả về: (path, log, frontier_log, total_explored, final_cost, iterations) như a_star.
+        """
+        n = self.grid_size
+        adjacent = self._adjacent_flat
+        move_table = self._move_table
+        cost = self._cost_flat
+        start, goal = self.start.index, self.goal.index
+        open_set = [start]  # Stack cho DFS
+        # Chi phí từ start đến node, parent và seen (đã vào stack) nằm trong SearchState
+        state = self._new_search(start)
+        generation = state.generation
+        g_score, parent, seen = state.g_score, state.parent, state.seen
+        expanded = 0  # Kích thước closed set
 
-            if current == self.goal:
-                path = []
-                total_explored = len(closed_set) + 1  # +1 để tính cả goal
-                final_cost = current.g_score  # Chi phí thực tế đến goal
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
-                return path[::-1], log, frontier_log, total_explored, final_cost,100
-
-            if current not in closed_set:
-                closed_set.add(current)
-                log.append((current.x, current.y))
-
-                for neighbor in current.neighbors:
-                    # Chỉ thêm neighbor nếu không phải vật cản và chưa được khám phá
-                    if not neighbor.is_obstacle and neighbor not in closed_set and neighbor not in open_set:
-                        neighbor.parent = current
-                        neighbor.g_score = current.g_score + neighbor.cost
-                        open_set.append(neighbor)
-
-        return [], log, frontier_log, len(closed_set), 0  # Không tìm thấy đường
-    
-    def dfs(self):
-        open_set = [self.start]  # Stack cho DFS
-        closed_set = set()
-        self.start.g_score = 0  # Chi phí từ start đến node
-        
         log = []  # Lưu log các bước (closed_set)
-        frontier_log = []  # Lưu trạng thái open_set tại mỗi bước
+        # Trạng thái open_set tại mỗi bước (FrontierLog) chỉ khi record_frontier, ngược lại None
+        frontier_log = FrontierLog(n, (start,)) if record_frontier else None
+        if start == goal:
+            return self._reconstruct_path(goal), log, frontier_log, 1, 0, 0
 
-        while open_set:
-            # Lưu trạng thái hiện tại của open_set vào frontier_log
-            frontier_log.append([(node.x, node.y) for node in open_set])
-            
+        while open_set and expanded != max_expansions:
             current = open_set.pop()  # Lấy node cuối cùng trong stack
+            if frontier_log is not None:
+                # Snapshot open_set trước khi lấy current ra (lưu dạng delta)
+                frontier_log.step()
+                frontier_log.remove(current)
+            expanded += 1
+            log.append(divmod(current, n))
 
-            if current == self.goal:
-                path = []
-                total_explored = len(closed_set) + 1  # +1 để tính cả goal
-                final_cost = current.g_score  # Chi phí thực tế đến goal
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
-                return path[::-1], log, frontier_log, total_explored, final_cost,100
+            # adjacent đã loại vật cản và ô ngoài grid
+            current_g = g_score[current]
+            for offset, _ in move_table[adjacent[current]]:
+                neighbor = current + offset
+                # Mỗi ô chỉ vào stack một lần
+                if seen[neighbor] != generation:
+                    seen[neighbor] = generation
+                    parent[neighbor] = current
+                    g_score[neighbor] = current_g + cost[neighbor]
+                    if neighbor == goal:
+                        total_explored = expanded + 1  # +1 để tính cả goal
+                        return self._reconstruct_path(goal), log, frontier_log, total_explored, g_score[goal], expanded
+                    open_set.append(neighbor)
+                    if frontier_log is not None:
+                        frontier_log.add(neighbor)
 
-            if current not in closed_set:
-                closed_set.add(current)
-                log.append((current.x, current.y))
+        return [], log, frontier_log, expanded, 0, expanded  # Không tìm thấy đường
 
-                for neighbor in current.neighbors:
-                    # Chỉ thêm neighbor nếu không phải vật cản và chưa được khám phá
-                    if not neighbor.is_obstacle and neighbor not in closed_set and neighbor not in open_set:
-                        neighbor.parent = current
-                        neighbor.g_score = current.g_score + neighbor.cost
-                        open_set.append(neighbor)
+    def _new_backward_search(self, goal):
+        """SearchState riêng cho nửa tìm kiếm từ goal của các biến thể hai chiều, reset O(1) như _new_search."""
+        if self._backward_state is None:
+            self._backward_state = SearchState(self.grid_size * self.grid_size)
+        state = self._backward_state
+        state.reset()
+        state.visit(goal, 0, -1)
+        return state
 
-        return [], log, frontier_log, len(closed_set), 0  # Không tìm thấy đường
+    def _join_paths(self, meet, backward, total_cost):
+        """Nối nửa đường từ start tới meet với nửa từ meet tới goal (theo parent của backward).
+
+        Parent của nửa sau được ghi vào SearchState chính để Node.parent từ goal đi ngược được về start;
+        g của mỗi ô nửa sau là total_cost trừ chi phí còn lại từ ô đó tới goal (g của backward).
+        """
+        state = self.search_state
+        current = meet
+        while current != self.goal.index:
+            following = backward.parent[current]
+            state.visit(following, total_cost - backward.g_score[following], current)
+            current = following
+        return self._reconstruct_path(current)
+
+    def bidirectional_bfs(self, record_frontier=False):
+        """
+        BFS hai chiều: mỗi vòng mở rộng trọn một lớp của phía có queue nhỏ hơn (start hoặc goal),
+        dừng sau lớp đầu tiên mà hai phía gặp nhau (chọn điểm gặp có tổng chi phí nhỏ nhất trong lớp).
+        Cùng luật láng giềng (adjacent) và chi phí như bfs.
+        Trả về: (path, log, frontier_log, total_explored, final_cost, iterations) như a_star;
+        log và frontier_log (hợp queue của hai phía ở mỗi bước) gồm các ô của cả hai chiều.
+        """
+        from collections import deque
+
+        n = self.grid_size
+        adjacent = self._adjacent_flat
+        move_table = self._move_table
+        cost = self._cost_flat
+        start, goal = self.start.index, self.goal.index
+        states = (self._new_search(start), self._new_backward_search(goal))
+        queues = (deque([start]), deque([goal]))
+        log = []
+        frontier_log = FrontierLog(n, (start, goal)) if record_frontier else None
+        expanded = 0
+        if start == goal:
+            return self._reconstruct_path(goal), log, frontier_log, 1, 0, 0
+
+        best_cost, meet = float('inf'), -1
+        while queues[0] and queues[1] and meet < 0:
+            side = 0 if len(queues[0]) <= len(queues[1]) else 1
+            queue, state, other = queues[side], states[side], states[1 - side]
+            g_score, parent, seen = state.g_score, state.parent, state.seen
+            generation, other_seen, other_g = state.generation, other.seen, other.g_score
+            for _ in range(len(queue)):
+                current = queue.popleft()
+                if frontier_log is not None:
+                    frontier_log.step()
+                    frontier_log.remove(current)
+                expanded += 1
+                log.append(divmod(current, n))
+                # Phía start cộng cost của ô đi vào, phía goal cộng cost của ô đang đứng (đi ngược)
+                for offset, _ in move_table[adjacent[current]]:
+                    neighbor = current + offset
+                    if seen[neighbor] != generation:
+                        seen[neighbor] = generation
+                        parent[neighbor] = current
+                        g_score[neighbor] = g_score[current] + (cost[current] if side else cost[neighbor])
+                        queue.append(neighbor)
+                        if frontier_log is not None:
+                            frontier_log.add(neighbor)
+                        if other_seen[neighbor] == other.generation:
+                            total = g_score[neighbor] + other_g[neighbor]
+                            if total < best_cost:
+                                best_cost, meet = total, neighbor
+
+        if meet < 0:
+            return [], log, frontier_log, expanded, 0, expanded
+        return self._join_paths(meet, states[1], best_cost), log, frontier_log, expanded, best_cost, expanded
+
+    def bidirectional_a_star(self, record_frontier=False):
+        """
+        A* hai chiều theo NBA* (Pijls & Post): mỗi bước lấy ô từ phía (start hoặc goal) có open set nhỏ hơn,
+        heuristic octile tới đầu bên kia (consistent). Ô lấy ra bị bỏ qua, không mở rộng, nếu
+        g + h >= chi phí đường tốt nhất L hoặc g + F_kia - h_kia >= L (F_kia: f nhỏ nhất của open set bên kia);
+        ô đã đóng ở một phía không được phía kia thêm vào nữa. Dừng khi một open set rỗng, đường đi là tối ưu.
+        Cùng luật bước đi (moves) và chi phí với a_star.
+        Trả về: (path, log, frontier_log, total_explored, final_cost, iterations) như a_star;
+        log và frontier_log (hợp open set của hai phía ở mỗi bước) gồm các ô của cả hai chiều.
+        """
+        n = self.grid_size
+        moves = self._moves_flat
+        move_table = self._move_table
+        start, goal = self.start.index, self.goal.index
+        states = (self._new_search(start), self._new_backward_search(goal))
+        targets = (divmod(goal, n), divmod(start, n))
+
+        def heuristic(index, side):
+            x, y = divmod(index, n)
+            target_x, target_y = targets[side]
+            dx, dy = abs(x - target_x), abs(y - target_y)
+            return DIAGONAL_COST * min(dx, dy) + STRAIGHT_COST * abs(dx - dy)
+
+        push_count = 0
+        start_h = heuristic(start, 0)
+        open_sets = ([(start_h, start_h, 0, start)], [(start_h, start_h, 0, goal)])
+        open_counts = [1, 1]  # Số ô thực sự nằm trong mỗi open set
+        log = []
+        frontier_log = FrontierLog(n, (start, goal)) if record_frontier else None
+        expanded = 0
+        iteration_count = 0
+        best_cost, meet = (0, start) if start == goal else (float('inf'), -1)
+
+        while open_sets[0] and open_sets[1]:
+            side = 0 if open_counts[0] <= open_counts[1] else 1
+            state, other = states[side], states[1 - side]
+            generation, other_generation = state.generation, other.generation
+            g_score, parent, seen, closed = state.g_score, state.parent, state.seen, state.closed
+            other_seen, other_g, other_closed = other.seen, other.g_score, other.closed
+            f, h, _, current = heappop(open_sets[side])
+            if closed[current] == generation:
+                continue  # Entry cũ (stale)
+            iteration_count += 1
+            if frontier_log is not None:
+                frontier_log.step()
+                # Ô vẫn còn trong open set phía kia thì vẫn thuộc frontier
+                if other_seen[current] != other_generation or other_closed[current] == other_generation:
+                    frontier_log.remove(current)
+            open_counts[side] -= 1
+            closed[current] = generation
+
+            other_open = open_sets[1 - side]
+            while other_open and other_closed[other_open[0][3]] == other_generation:
+                heappop(other_open)
+            other_f = other_open[0][0] if other_open else 0
+            current_g = g_score[current]
+            if f >= best_cost - 1e-9 or current_g + other_f - heuristic(current, 1 - side) >= best_cost - 1e-9:
+                continue  # Không thể nằm trên đường ngắn hơn L
+            expanded += 1
+            log.append(divmod(current, n))
+            for offset, move_cost in move_table[moves[current]]:
+                neighbor = current + offset
+                if closed[neighbor] == generation or other_closed[neighbor] == other_generation:
+                    continue
+                tentative_g_score = current_g + move_cost
+                if seen[neighbor] != generation or tentative_g_score < g_score[neighbor]:
+                    if seen[neighbor] != generation:
+                        open_counts[side] += 1
+                    seen[neighbor] = generation
+                    parent[neighbor] = current
+                    g_score[neighbor] = tentative_g_score
+                    h = heuristic(neighbor, side)
+                    push_count += 1
+                    heappush(open_sets[side], (round(tentative_g_score + h, 9), h, push_count, neighbor))
+                    if frontier_log is not None:
+                        frontier_log.add(neighbor)
+                    if other_seen[neighbor] == other_generation:
+                        total = tentative_g_score + other_g[neighbor]
+                        if total < best_cost:
+                            best_cost, meet = total, neighbor
+
+        if meet < 0:
+            return [], log, frontier_log, expanded, 0, iteration_count
+        return self._join_paths(meet, states[1], best_cost), log, frontier_log, expanded, best_cost, iteration_count
+
+    def goal_tree(self, goal, targets=(), state=None):
+        """Dijkstra từ goal (chi phí 1 / 1.41, cùng luật cutting corners như A*).
+
+        Đồ thị grid đối xứng nên g_score của một ô trong cây cũng là chi phí ngắn nhất từ ô đó tới goal,
+        và parent là bước kế tiếp để đi về goal. Dừng sớm khi mọi ô trong targets đã được chốt
+        (targets rỗng: duyệt hết vùng liên thông). Kết quả nằm trong state (mặc định: SearchState của Graph).
+        """
+        moves = self._moves_flat
+        move_table = self._move_table
+        if state is None:
+            state = self.search_state
+        generation = state.reset()
+        state.visit(goal, 0, -1)
+        g_score, parent, seen, closed = state.g_score, state.parent, state.seen, state.closed
+        remaining = set(targets)
+        open_set = [(0, goal)]
+        while open_set:
+            current_g, current = heappop(open_set)
+            if closed[current] == generation:
+                continue
+            closed[current] = generation
+            remaining.discard(current)
+            if targets and not remaining:
+                break
+            for offset, move_cost in move_table[moves[current]]:
+                neighbor = current + offset
+                if closed[neighbor] == generation:
+                    continue
+                tentative_g_score = current_g + move_cost
+                if seen[neighbor] != generation or tentative_g_score < g_score[neighbor]:
+                    seen[neighbor] = generation
+                    parent[neighbor] = current
+                    g_score[neighbor] = tentative_g_score
+                    heappush(open_set, (tentative_g_score, neighbor))
+        return state
+
+    def distance_field(self, goal):
+        """Chi phí ngắn nhất từ mọi ô tới goal (chỉ số phẳng), inf cho ô không tới được.
+
+        Dùng SearchState riêng nên không ghi đè kết quả truy vấn gần nhất của Graph.
+        """
+        state = self.goal_tree(goal, state=SearchState(self.grid_size * self.grid_size))
+        closed = np.asarray(state.closed) == state.generation
+        return np.where(closed, np.asarray(state.g_score), np.inf)
+
+    def batch_paths(self, starts, goals, return_paths=False, processes=None):
+        """Chi phí đường đi ngắn nhất từ mỗi start tới mỗi goal (many-to-many) trên cùng một map.
+
+        :param starts: danh sách (x, y) của các robot.
+        :param goals: danh sách (x, y) của các điểm đích.
+        :param return_paths: True thì trả thêm paths[i][j] là danh sách (x, y) từ starts[i] tới goals[j]
+                             ([] nếu không tới được).
+        :param processes: > 1 thì chia các goal cho multiprocessing.Pool.
+        :return: costs (mảng len(starts) x len(goals), inf nếu không tới được), hoặc (costs, paths).
+
+        Mỗi goal chỉ chạy một goal_tree dừng khi mọi start đã được chốt, thay vì một A* cho mỗi cặp.
+        """
+        n = self.grid_size
+        start_indices = [x * n + y for x, y in starts]
+        goal_indices = [x * n + y for x, y in goals]
+        if processes and processes > 1 and len(goal_indices) > 1:
+            from multiprocessing import Pool
+            with Pool(processes, initializer=_init_batch_worker, initargs=(self.occupancy,)) as pool:
+                columns = pool.map(_batch_worker, [(goal, start_indices, return_paths) for goal in goal_indices])
+        else:
+            # Một SearchState riêng cho cả batch, reset O(1) giữa các goal
+            state = SearchState(n * n)
+            columns = [self._batch_column(goal, start_indices, return_paths, state) for goal in goal_indices]
+        costs = np.array([column[0] for column in columns], dtype=np.float64).T.reshape(len(starts), len(goals))
+        if not return_paths:
+            return costs
+        paths = [[columns[j][1][i] for j in range(len(goals))] for i in range(len(starts))]
+        return costs, paths
+
+    def _batch_column(self, goal, start_indices, return_paths, state):
+        self.goal_tree(goal, start_indices, state)
+        costs = []
+        paths = []
+        for start in start_indices:
+            reached = state.closed[start] == state.generation
+            costs.append(state.g_score[start] if reached else float('inf'))
+            if not return_paths:
+                continue
+            path = []
+            index = start if reached else -1
+            while index >= 0:
+                path.append(divmod(index, self.grid_size))
+                index = state.parent[index]
+            paths.append(path)
+        return costs, paths
+
+    def line_of_sight(self, a, b):
+        """
+        Đoạn thẳng nối tâm ô a và tâm ô b ((x, y)) có đi qua được không: mọi ô đoạn thẳng chạm vào
+        (supercover) phải trống, và khi đoạn thẳng đi qua đúng góc ô thì cả hai ô cạnh góc cũng phải
+        trống (cùng luật "cutting corners" với bước chéo của A*).
+        """
+        occupancy = self._occupancy_flat
+        n = self.grid_size
+        x, y = a
+        x1, y1 = b
+        dx, dy = abs(x1 - x), abs(y1 - y)
+        sx, sy = (1 if x1 > x else -1), (1 if y1 > y else -1)
+        if occupancy[x * n + y]:
+            return False
+        ix = iy = 0
+        while ix < dx or iy < dy:
+            # So sánh tham số t khi cắt biên dọc tiếp theo ((ix + 0.5)/dx) và biên ngang tiếp theo ((iy + 0.5)/dy)
+            decision = (2 * ix + 1) * dy - (2 * iy + 1) * dx
+            if decision < 0:
+                x += sx
+                ix += 1
+            elif decision > 0:
+                y += sy
+                iy += 1
+            else:
+                # Đi qua đúng góc: hai ô cạnh góc phải trống
+                if occupancy[(x + sx) * n + y] or occupancy[x * n + y + sy]:
+                    return False
+                x += sx
+                y += sy
+                ix += 1
+                iy += 1
+            if occupancy[x * n + y]:
+                return False
+        return True
+
+    def line_of_sight_batch(self, a, b):
+        """
+        line_of_sight vectorized cho nhiều đoạn: a, b là mảng (K, 2) tọa độ ô; trả về mảng bool (K,).
+        Tại biên thứ i mà đoạn thẳng cắt theo trục x (và tương tự trục y), tọa độ còn lại là
+        (2i + 1) * d_other / (2 * d_main) (tính bằng số nguyên); hai ô hai bên biên phải trống, và khi giao
+        điểm rơi đúng góc ô thì cả bốn ô quanh góc phải trống.
+        """
+        a = np.asarray(a, dtype=np.int64).reshape(-1, 2)
+        b = np.asarray(b, dtype=np.int64).reshape(-1, 2)
+        occupancy = self.occupancy.reshape(-1).view(bool)
+        n = self.grid_size
+        delta = b - a
+        sign = np.where(delta < 0, -1, 1)
+        steps = np.abs(delta)
+        blocked = occupancy[a[:, 0] * n + a[:, 1]] | occupancy[b[:, 0] * n + b[:, 1]]
+        for axis in (0, 1):
+            other = 1 - axis
+            d_main, d_other = steps[:, axis:axis + 1], steps[:, other:other + 1]
+            count = int(d_main.max(initial=0))
+            if count == 0:
+                continue
+            i = np.arange(count)
+            valid = i < d_main
+            q, rem = np.divmod((2 * i + 1) * d_other, 2 * np.maximum(d_main, 1))
+            low = q + (rem > d_main)
+            high = np.where(rem == d_main, q + 1, low)  # rem == d_main: đúng góc ô
+            before = a[:, axis:axis + 1] + sign[:, axis:axis + 1] * i
+            for offset in (low, high):
+                across = a[:, other:other + 1] + sign[:, other:other + 1] * offset
+                for main in (before, before + sign[:, axis:axis + 1]):
+                    cells = main * n + across if axis == 0 else across * n + main
+                    blocked |= (occupancy[np.where(valid, cells, 0)] & valid).any(axis=1)
+        return ~blocked
+
+    def smooth_paths(self, paths):
+        """
+        Rút gọn nhiều đường đi cùng lúc bằng line-of-sight shortcutting: từ mỗi waypoint nhảy tới điểm
+        xa nhất trên path còn nhìn thấy được. Mỗi vòng kiểm tra mọi cặp (waypoint hiện tại, điểm phía sau)
+        của mọi path trong một lần gọi line_of_sight_batch.
+        paths: các path dạng list (x, y) (a_star, rrt) hoặc dãy Node (aco); trả về list các path (x, y).
+        """
+        points = [np.array([(p.x, p.y) if isinstance(p, Node) else p for p in path], dtype=np.int64).reshape(-1, 2)
+                  for path in paths]
+        anchors = [0] * len(points)
+        smoothed = [[tuple(map(int, path[0]))] if len(path) else [] for path in points]
+        pending = [i for i, path in enumerate(points) if len(path) > 1]
+        while pending:
+            starts, ends = [], []
+            for i in pending:
+                path, anchor = points[i], anchors[i]
+                candidates = path[anchor + 1:]
+                starts.append(np.broadcast_to(path[anchor], candidates.shape))
+                ends.append(candidates)
+            visible = self.line_of_sight_batch(np.concatenate(starts), np.concatenate(ends))
+            offset = 0
+            for i in pending:
+                count = len(points[i]) - anchors[i] - 1
+                seen = np.flatnonzero(visible[offset:offset + count])
+                # Điểm kề tiếp theo luôn đi được (bước hợp lệ của planner) nên vẫn tiến nếu không thấy gì
+                anchors[i] += int(seen[-1]) + 1 if len(seen) else 1
+                smoothed[i].append(tuple(map(int, points[i][anchors[i]])))
+                offset += count
+            pending = [i for i in pending if anchors[i] < len(points[i]) - 1]
+        return smoothed
+
+    def theta_star(self, record_frontier=False):
+        """
+        Theta* (any-angle A*): như a_star nhưng khi mở neighbor, nếu parent của current nhìn thấy neighbor
+        (line_of_sight) thì nối thẳng neighbor với parent đó, chi phí là khoảng cách Euclid.
+        Heuristic Euclid; cùng kiểu trả về với a_star, path là các waypoint (x, y) (không kề nhau).
+        """
+        n = self.grid_size
+        moves = self._moves_flat
+        move_table = self._move_table
+        start, goal = self.start.index, self.goal.index
+        goal_x, goal_y = self.goal.x, self.goal.y
+        state = self._new_search(start)
+        generation = state.generation
+        g_score, parent, seen, closed = state.g_score, state.parent, state.seen, state.closed
+        expanded = 0
+        push_count = 0
+        start_h = math.hypot(self.start.x - goal_x, self.start.y - goal_y)
+        open_set = [(start_h, start_h, push_count, start)]
+        iteration_count = 0
+        log = []
+        frontier_log = FrontierLog(n, (start,)) if record_frontier else None
+
+        while open_set:
+            _, _, _, current = heappop(open_set)
+            if closed[current] == generation:
+                continue
+            iteration_count += 1
+            if frontier_log is not None:
+                # Snapshot open set trước khi lấy current ra (lưu dạng delta)
+                frontier_log.step()
+                frontier_log.remove(current)
+
+            if current == goal:
+                return self._reconstruct_path(goal), log, frontier_log, expanded + 1, g_score[goal], iteration_count
+
+            closed[current] = generation
+            expanded += 1
+            log.append(divmod(current, n))
+
+            current_xy = divmod(current, n)
+            grand = parent[current]
+            grand_xy = divmod(grand, n) if grand >= 0 else None
+            for offset, move_cost in move_table[moves[current]]:
+                neighbor = current + offset
+                if closed[neighbor] == generation:
+                    continue
+                x, y = divmod(neighbor, n)
+                # Path 2: nối thẳng từ parent của current nếu nhìn thấy
+                if grand_xy is not None and self.line_of_sight(grand_xy, (x, y)):
+                    source = grand
+                    tentative_g_score = g_score[grand] + math.hypot(x - grand_xy[0], y - grand_xy[1])
+                else:
+                    source = current
+                    tentative_g_score = g_score[current] + math.hypot(x - current_xy[0], y - current_xy[1])
+                if seen[neighbor] != generation or tentative_g_score < g_score[neighbor]:
+                    seen[neighbor] = generation
+                    parent[neighbor] = source
+                    g_score[neighbor] = tentative_g_score
+                    h = math.hypot(x - goal_x, y - goal_y)
+                    push_count += 1
+                    heappush(open_set, (round(tentative_g_score + h, 9), h, push_count, neighbor))
+                    if frontier_log is not None:
+                        frontier_log.add(neighbor)
+        return [], log, frontier_log, expanded, 0, iteration_count
+
+    def jps(self, record_frontier=False):
+        """
+        Jump Point Search trên grid 8 hướng chi phí đều, cùng luật "cutting corners" với a_star (bước chéo
+        cần cả hai ô kề theo trục trống). Chỉ các jump point được đưa vào open set; heuristic octile
+        (hoặc distance field nếu có distance_cache).
+        Cùng kiểu trả về với a_star; path được nội suy lại thành từng ô, log/frontier_log chứa jump point.
+        """
+        n = self.grid_size
+        occupancy = self._occupancy_flat
+        moves = self._moves_flat
+        # int(): start/goal có thể được đặt bằng số nguyên numpy, phép trừ bool trong pruned_directions cần int
+        start, goal = int(self.start.index), int(self.goal.index)
+        goal_x, goal_y = divmod(goal, n)
+        field = None
+        if self.distance_cache is not None:
+            field = memoryview(self.distance_cache.get(self, goal))
+
+        def walkable(x, y):
+            return 0 <= x < n and 0 <= y < n and not occupancy[x * n + y]
+
+        def heuristic(x, y):
+            if field is not None:
+                return field[x * n + y]
+            dx, dy = abs(x - goal_x), abs(y - goal_y)
+            return DIAGONAL_COST * min(dx, dy) + STRAIGHT_COST * abs(dx - dy)
+
+        def jump_straight(x, y, dx, dy):
+            # Đi thẳng tới khi gặp vật cản (None), goal hoặc ô có forced neighbor
+            while walkable(x, y):
+                if x == goal_x and y == goal_y:
+                    return x, y
+                if dx:
+                    if (walkable(x, y - 1) and not walkable(x - dx, y - 1)) or \
+                            (walkable(x, y + 1) and not walkable(x - dx, y + 1)):
+                        return x, y
+                elif (walkable(x - 1, y) and not walkable(x - 1, y - dy)) or \
+                        (walkable(x + 1, y) and not walkable(x + 1, y - dy)):
+                    return x, y
+                x += dx
+                y += dy
+            return None
+
+        def jump_diagonal(x, y, dx, dy):
+            # Mỗi ô trên đường chéo: là jump point nếu nhánh thẳng theo x hoặc y tìm được jump point
+            while walkable(x, y):
+                if (x == goal_x and y == goal_y) or jump_straight(x + dx, y, dx, 0) or \
+                        jump_straight(x, y + dy, 0, dy):
+                    return x, y
+                if not (walkable(x + dx, y) and walkable(x, y + dy)):
+                    return None
+                x += dx
+                y += dy
+            return None
+
+        def pruned_directions(x, y, px, py):
+            # Các hướng cần xét từ (x, y) khi tới từ jump point (px, py)
+            dx = (x > px) - (x < px)
+            dy = (y > py) - (y < py)
+            directions = []
+            if dx and dy:
+                vertical, horizontal = walkable(x, y + dy), walkable(x + dx, y)
+                if vertical:
+                    directions.append((0, dy))
+                if horizontal:
+                    directions.append((dx, 0))
+                if vertical and horizontal:
+                    directions.append((dx, dy))
+            elif dx:
+                ahead, up, down = walkable(x + dx, y), walkable(x, y + 1), walkable(x, y - 1)
+                if ahead:
+                    directions.append((dx, 0))
+                    if up:
+                        directions.append((dx, 1))
+                    if down:
+                        directions.append((dx, -1))
+                if up:
+                    directions.append((0, 1))
+                if down:
+                    directions.append((0, -1))
+            else:
+                ahead, right, left = walkable(x, y + dy), walkable(x + 1, y), walkable(x - 1, y)
+                if ahead:
+                    directions.append((0, dy))
+                    if right:
+                        directions.append((1, dy))
+                    if left:
+                        directions.append((-1, dy))
+                if right:
+                    directions.append((1, 0))
+                if left:
+                    directions.append((-1, 0))
+            return directions
+
+        state = self._new_search(start)
+        generation = state.generation
+        g_score, parent, seen, closed = state.g_score, state.parent, state.seen, state.closed
+        expanded = 0
+        push_count = 0
+        start_h = heuristic(*divmod(start, n))
+        open_set = [(start_h, start_h, push_count, start)]
+        iteration_count = 0
+        log = []
+        frontier_log = FrontierLog(n, (start,)) if record_frontier else None
+
+        while open_set:
+            _, _, _, current = heappop(open_set)
+            if closed[current] == generation:
+                continue
+            iteration_count += 1
+            if frontier_log is not None:
+                # Snapshot open set trước khi lấy current ra (lưu dạng delta)
+                frontier_log.step()
+                frontier_log.remove(current)
+
+            if current == goal:
+                return self._expand_jump_path(goal), log, frontier_log, expanded + 1, g_score[goal], iteration_count
+
+            closed[current] = generation
+            expanded += 1
+            x, y = divmod(current, n)
+            log.append((x, y))
+
+            if parent[current] < 0:
+                # Start: mọi bước hợp lệ theo moves
+                directions = [DIRECTIONS[d] for d in range(len(DIRECTIONS)) if moves[current] >> d & 1]
+            else:
+                directions = pruned_directions(x, y, *divmod(parent[current], n))
+            current_g = g_score[current]
+            for dx, dy in directions:
+                if dx and dy:
+                    point = jump_diagonal(x + dx, y + dy, dx, dy)
+                else:
+                    point = jump_straight(x + dx, y + dy, dx, dy)
+                if point is None:
+                    continue
+                jx, jy = point
+                neighbor = jx * n + jy
+                if closed[neighbor] == generation:
+                    continue
+                # Đoạn giữa hai jump point là thẳng hoặc chéo hoàn toàn
+                distance = max(abs(jx - x), abs(jy - y))
+                tentative_g_score = current_g + distance * (DIAGONAL_COST if dx and dy else STRAIGHT_COST)
+                if seen[neighbor] != generation or tentative_g_score < g_score[neighbor]:
+                    seen[neighbor] = generation
+                    parent[neighbor] = current
+                    g_score[neighbor] = tentative_g_score
+                    h = heuristic(jx, jy)
+                    push_count += 1
+                    heappush(open_set, (round(tentative_g_score + h, 9), h, push_count, neighbor))
+                    if frontier_log is not None:
+                        frontier_log.add(neighbor)
+        return [], log, frontier_log, expanded, 0, iteration_count
+
+    def _expand_jump_path(self, index):
+        """Path qua các jump point (theo parent) được nội suy thành dãy ô kề nhau."""
+        points = self._reconstruct_path(index)
+        path = points[:1]
+        for x1, y1 in points[1:]:
+            x, y = path[-1]
+            dx = (x1 > x) - (x1 < x)
+            dy = (y1 > y) - (y1 < y)
+            while (x, y) != (x1, y1):
+                x += dx
+                y += dy
+                path.append((x, y))
+        return path
+
+# Graph của mỗi process trong Graph.batch_paths, dựng một lần khi khởi tạo Pool
+_batch_graph = None
+
+def _init_batch_worker(occupancy):
+    global _batch_graph
+    _batch_graph = Graph(len(occupancy))
+    _batch_graph.load_occupancy(occupancy)
+
+def _batch_worker(args):
+    goal, start_indices, return_paths = args
+    state = _batch_graph.search_state
+    return _batch_graph._batch_column(goal, start_indices, return_paths, state)
 
 def calculate_deviation(path):
     """Tính tổng góc chuyển hướng (radians) của đường đi."""
@@ -245,6 +1245,20 @@ def calculate_deviation(path):
         total_deviation += angle_diff
     return total_deviation
 
+def path_length(path):
+    """Tổng độ dài Euclid của đường đi (danh sách (x, y) hoặc Node)."""
+    points = np.array([(p.x, p.y) if isinstance(p, Node) else p for p in path], dtype=float).reshape(-1, 2)
+    return float(np.hypot(*np.diff(points, axis=0).T).sum())
+
+def smoothing_report(before, after):
+    """So sánh đường đi trước/sau khi làm mượt: số waypoint, độ dài Euclid, tổng góc chuyển hướng."""
+    before = [(p.x, p.y) if isinstance(p, Node) else tuple(p) for p in before]
+    return {
+        "waypoints": (len(before), len(after)),
+        "length": (path_length(before), path_length(after)),
+        "deviation": (calculate_deviation(before), calculate_deviation(after)),
+    }
+
 def draw_map(graph, grid_size, screen, timestep=-1, frontier_log=None):
     cell_size = 600 // grid_size
     screen.fill((255, 255, 255))
@@ -297,7 +1311,7 @@ def main():
     graph.set_goal(1, 23)
 
     start_time = time.time()
-    path, log, frontier_log, total_explored, final_cost, iterations = graph.a_star()
+    path, log, frontier_log, total_explored, final_cost, iterations = graph.a_star(record_frontier=True)
     end_time = time.time()
     computation_time = end_time - start_time
     graph.path_log = log
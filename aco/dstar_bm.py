@@ -0,0 +1,216 @@
+import time
+from heapq import heappush, heappop
+import numpy as np
+from bench_mark import Graph, FrontierLog, STRAIGHT_COST, DIAGONAL_COST
+
+# D* Lite (Koenig & Likhachev): tìm ngược từ goal về start, giữ g/rhs của mọi ô giữa các lần gọi.
+# Khi vật cản thay đổi (set_obstacle) chỉ các ô có bước đi thay đổi (cửa sổ 3x3 quanh ô đổi) được
+# cập nhật lại rhs, lần d_star_lite() kế tiếp chỉ sửa phần cây bị ảnh hưởng thay vì tìm lại từ đầu.
+# Start có thể di chuyển giữa các lần gọi (robot đi theo đường): key được bù bằng km.
+# Bước đi dùng mask moves của Graph nên cùng luật bước chéo / "cutting corners" với A*.
+
+
+class DStarLiteState:
+    """Trạng thái D* Lite giữ lại giữa các lần replan của cùng một goal."""
+
+    def __init__(self, size, goal, start):
+        self.goal = goal
+        self.last_start = start
+        self.km = 0.0
+        self._g = np.full(size, np.inf)
+        self._rhs = np.full(size, np.inf)
+        # memoryview để vòng lặp Python đọc/ghi float nhanh
+        self.g = memoryview(self._g)
+        self.rhs = memoryview(self._rhs)
+        self.rhs[goal] = 0.0
+        self.queue = []  # Heap (k1, k2, ô), lazy deletion: entry hợp lệ khi khớp keys[ô]
+        self.keys = {}   # Ô đang nằm trong queue -> key hiện tại
+
+
+class GraphDStar(Graph):
+    def __init__(self, *args, **kwargs):
+        self._dstar = None
+        self._frontier_log = None  # FrontierLog của lần d_star_lite đang chạy (record_frontier)
+        super().__init__(*args, **kwargs)
+
+    def load_occupancy(self, occupancy):
+        super().load_occupancy(occupancy)
+        self._dstar = None
+
+    def set_obstacle(self, x, y, blocked=True):
+        """Graph.set_obstacle, đồng thời cập nhật rhs của các ô bị ảnh hưởng để replan tăng dần."""
+        affected = super().set_obstacle(x, y, blocked)
+        state = self._dstar
+        if state is not None and len(affected):
+            self._sync_start(state)
+            for index in affected.tolist():
+                self._update_vertex(state, index)
+        return affected
+
+    def reset_dstar(self):
+        """Bỏ trạng thái D* Lite, lần d_star_lite() kế tiếp tìm lại từ đầu."""
+        self._dstar = None
+
+    def _heuristic(self, a, b):
+        """Khoảng cách octile giữa hai ô (chỉ số phẳng), admissible và consistent với STRAIGHT/DIAGONAL_COST."""
+        ax, ay = divmod(a, self.grid_size)
+        bx, by = divmod(b, self.grid_size)
+        dx, dy = abs(ax - bx), abs(ay - by)
+        return DIAGONAL_COST * min(dx, dy) + STRAIGHT_COST * abs(dx - dy)
+
+    def _key(self, state, index):
+        g_min = min(state.g[index], state.rhs[index])
+        # Làm tròn như A* để sai số cộng dồn 1.41 không phá so sánh key
+        return round(g_min + self._heuristic(self.start.index, index) + state.km, 9), round(g_min, 9)
+
+    def _sync_start(self, state):
+        """Start đã di chuyển kể từ lần replan trước: tăng km thay vì tính lại key của cả queue."""
+        start = self.start.index
+        if start != state.last_start:
+            state.km += self._heuristic(state.last_start, start)
+            state.last_start = start
+
+    def _update_vertex(self, state, index):
+        g, rhs = state.g, state.rhs
+        if index != state.goal:
+            best = float('inf')
+            for offset, move_cost in self._move_table[self._moves_flat[index]]:
+                value = move_cost + g[index + offset]
+                if value < best:
+                    best = value
+            rhs[index] = best
+        self._queue_vertex(state, index)
+
+    def _queue_vertex(self, state, index):
+        """Đưa index vào queue nếu g != rhs (locally inconsistent), ngược lại bỏ khỏi queue."""
+        frontier_log = self._frontier_log
+        if state.g[index] != state.rhs[index]:
+            key = self._key(state, index)
+            state.keys[index] = key
+            heappush(state.queue, (key[0], key[1], index))
+            if frontier_log is not None:
+                frontier_log.add(index)
+        else:
+            state.keys.pop(index, None)
+            if frontier_log is not None:
+                frontier_log.remove(index)
+
+    def _compute_shortest_path(self, state, log, frontier_log=None):
+        """Mở rộng queue tới khi start locally consistent. Trả về số ô đã mở rộng."""
+        n = self.grid_size
+        moves = self._moves_flat
+        move_table = self._move_table
+        g, rhs, queue, keys = state.g, state.rhs, state.queue, state.keys
+        start = self.start.index
+        expanded = 0
+        while queue:
+            k1, k2, index = queue[0]
+            key = (k1, k2)
+            if keys.get(index) != key:
+                heappop(queue)  # Entry cũ (stale)
+                continue
+            if key >= self._key(state, start) and rhs[start] == g[start]:
+                break
+            heappop(queue)
+            new_key = self._key(state, index)
+            if key < new_key:
+                # Key cũ tính với km/start trước đó: đưa lại vào queue với key mới
+                keys[index] = new_key
+                heappush(queue, (new_key[0], new_key[1], index))
+                continue
+            del keys[index]
+            if frontier_log is not None:
+                # Snapshot queue (frontier) trước khi lấy index ra (lưu dạng delta)
+                frontier_log.step()
+                frontier_log.remove(index)
+            expanded += 1
+            log.append(divmod(index, n))
+            if g[index] > rhs[index]:
+                # Overconsistent: chốt g, rhs của ô kề chỉ có thể giảm qua index
+                g[index] = rhs[index]
+                value = g[index]
+                for offset, move_cost in move_table[moves[index]]:
+                    neighbor = index + offset
+                    if neighbor != state.goal and move_cost + value < rhs[neighbor]:
+                        rhs[neighbor] = move_cost + value
+                        self._queue_vertex(state, neighbor)
+            else:
+                # Underconsistent: bỏ g, tính lại rhs của index và các ô kề
+                g[index] = float('inf')
+                self._update_vertex(state, index)
+                for offset, _ in move_table[moves[index]]:
+                    self._update_vertex(state, index + offset)
+        return expanded
+
+    def d_star_lite(self, record_frontier=False):
+        """
+        D* Lite: lần đầu (hoặc khi goal đổi) tìm từ đầu, các lần sau chỉ sửa phần bị ảnh hưởng bởi
+        set_obstacle / start di chuyển.
+        Trả về: (path, log, frontier_log, total_explored, final_cost, iterations) như a_star,
+        với log/total_explored/iterations chỉ tính các ô mở rộng trong lần gọi này; frontier_log (FrontierLog,
+        bắt đầu từ queue còn lại của lần trước) chỉ ghi khi record_frontier, ngược lại là None.
+        """
+        n = self.grid_size
+        start, goal = self.start.index, self.goal.index
+        state = self._dstar
+        if state is None or state.goal != goal:
+            state = self._dstar = DStarLiteState(n * n, goal, start)
+            key = self._key(state, goal)
+            state.keys[goal] = key
+            heappush(state.queue, (key[0], key[1], goal))
+        else:
+            self._sync_start(state)
+        log = []
+        frontier_log = FrontierLog(n, state.keys) if record_frontier else None
+        self._frontier_log = frontier_log
+        try:
+            expanded = self._compute_shortest_path(state, log, frontier_log)
+        finally:
+            self._frontier_log = None
+        g = state.g
+        if g[start] == float('inf'):
+            return [], log, frontier_log, expanded, 0, expanded
+
+        # Đi theo ô kề có chi phí bước + g nhỏ nhất; lưu parent vào SearchState để Node.parent dùng được
+        moves = self._moves_flat
+        search = self._new_search(start)
+        current = start
+        while current != goal:
+            best, best_value, best_cost = -1, float('inf'), 0
+            for offset, move_cost in self._move_table[moves[current]]:
+                value = move_cost + g[current + offset]
+                if value < best_value:
+                    best, best_value, best_cost = current + offset, value, move_cost
+            search.visit(best, search.g_score[current] + best_cost, current)
+            current = best
+        return self._reconstruct_path(goal), log, frontier_log, expanded, search.g_score[goal], expanded
+
+
+def main():
+    grid_size = 25
+    graph = GraphDStar(grid_size, json_file="map/aStar.json")
+    graph.set_start(5, 8)
+    graph.set_goal(1, 23)
+
+    start_time = time.time()
+    path, log, frontier_log, total_explored, final_cost, iterations = graph.d_star_lite()
+    print("D* Lite Results:")
+    print("Path:", path)
+    print("Total nodes expanded:", total_explored)
+    print("Final cost:", final_cost)
+    print("Computation time (s):", time.time() - start_time)
+
+    # Chặn vài ô giữa đường đi rồi replan tăng dần
+    blocked = path[len(path) // 2 - 1:len(path) // 2 + 2]
+    graph.set_obstacle([x for x, _ in blocked], [y for _, y in blocked], True)
+    start_time = time.time()
+    path, log, frontier_log, total_explored, final_cost, iterations = graph.d_star_lite()
+    print("Replan after blocking", blocked)
+    print("Path:", path)
+    print("Total nodes expanded:", total_explored)
+    print("Final cost:", final_cost)
+    print("Computation time (s):", time.time() - start_time)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import os
+import time
+from heapq import heappush, heappop
+import numpy as np
+from bench_mark import Graph, FrontierLog, DIRECTIONS, STRAIGHT_COST, DIAGONAL_COST, move_masks
+
+# HPA* (Hierarchical Path-Finding A*): chia grid thành các cluster cluster_size x cluster_size,
+# nút trừu tượng là các ô entrance trên biên giữa hai cluster kề nhau. Cạnh trừu tượng gồm
+# bước thẳng qua biên (chi phí 1) và đường ngắn nhất giữa hai entrance trong cùng một cluster
+# (tính trước một lần cho mỗi map, có thể lưu ra đĩa). Truy vấn tìm trên đồ thị trừu tượng rồi
+# chỉ tinh chỉnh (refine) các đoạn trong cluster mà đường đi trừu tượng đi qua.
+# Mọi đoạn trong cluster dùng Graph cục bộ nên cùng luật bước chéo / "cutting corners" với A*.
+
+# Đoạn biên trống dài từ ngưỡng này có hai entrance (hai đầu), ngắn hơn có một (ở giữa)
+ENTRANCE_SPLIT_LENGTH = 6
+
+
+class GraphHPA(Graph):
+    def __init__(self, *args, cluster_size=10, cache_dir=None, **kwargs):
+        self.cluster_size = cluster_size
+        self.cache_dir = cache_dir  # Thư mục lưu abstraction (.npz theo map_hash), None: không lưu đĩa
+        self._abstraction = None
+        self._local = None
+        super().__init__(*args, **kwargs)
+
+    def load_occupancy(self, occupancy):
+        super().load_occupancy(occupancy)
+        self._abstraction = None
+
+    def set_obstacle(self, x, y, blocked=True):
+        """Graph.set_obstacle, đồng thời bỏ abstraction cũ khi có ô thay đổi (cache .npz theo map_hash() mới)."""
+        affected = super().set_obstacle(x, y, blocked)
+        if len(affected):
+            self._abstraction = None
+            self._local = None
+        return affected
+
+    # ---------- Cluster ----------
+    def _cluster_of(self, index):
+        x, y = divmod(index, self.grid_size)
+        return x // self.cluster_size, y // self.cluster_size
+
+    def _cluster_origin(self, cluster):
+        return cluster[0] * self.cluster_size, cluster[1] * self.cluster_size
+
+    def _cluster_occupancy(self, cluster):
+        """Occupancy cluster_size x cluster_size của một cluster (phần ngoài grid là vật cản)."""
+        c = self.cluster_size
+        x0, y0 = self._cluster_origin(cluster)
+        sub = np.ones((c, c), dtype=np.uint8)
+        block = self.occupancy[x0:x0 + c, y0:y0 + c]
+        sub[:block.shape[0], :block.shape[1]] = block
+        return sub
+
+    def _local_graph(self, cluster):
+        """Graph của một cluster, dùng lại (nạp lại occupancy) giữa các cluster."""
+        if self._local is None:
+            self._local = Graph(self.cluster_size)
+        self._local.load_occupancy(self._cluster_occupancy(cluster))
+        return self._local
+
+    def _group_by_cluster(self, cells):
+        """Chia mảng ô (chỉ số phẳng) theo cluster: {cluster: mảng ô}."""
+        x, y = np.divmod(cells, self.grid_size)
+        keys = np.stack([x // self.cluster_size, y // self.cluster_size], axis=1)
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        keys, cells = keys[order], cells[order]
+        boundaries = np.flatnonzero(np.any(np.diff(keys, axis=0), axis=1)) + 1
+        return {tuple(group[0].tolist()): part
+                for group, part in zip(np.split(keys, boundaries), np.split(cells, boundaries)) if len(part)}
+
+    def _to_local(self, index, cluster):
+        x, y = divmod(index, self.grid_size)
+        x0, y0 = self._cluster_origin(cluster)
+        return (x - x0) * self.cluster_size + (y - y0)
+
+    def _to_global(self, local_index, cluster):
+        lx, ly = divmod(local_index, self.cluster_size)
+        x0, y0 = self._cluster_origin(cluster)
+        return (x0 + lx) * self.grid_size + (y0 + ly)
+
+    def _cluster_distances(self, cluster, sources):
+        """
+        Ma trận (len(sources), c*c) chi phí ngắn nhất trong cluster từ mỗi ô nguồn (chỉ số cục bộ).
+        Dùng scipy.sparse.csgraph.dijkstra nếu có scipy, ngược lại Graph.distance_field của Graph cục bộ.
+        """
+        try:
+            from scipy.sparse.csgraph import dijkstra
+        except ImportError:
+            local = self._local_graph(cluster)
+            return np.array([local.distance_field(source) for source in sources]).reshape(len(sources), -1)
+        return dijkstra(self._cluster_matrix(cluster), directed=True, indices=np.asarray(sources))
+
+    def _cluster_matrix(self, cluster):
+        """Ma trận kề thưa (scipy csr) của cluster theo các bước hợp lệ (mask moves), trọng số 1 / 1.41."""
+        from scipy.sparse import csr_matrix
+        c = self.cluster_size
+        moves = move_masks(self._cluster_occupancy(cluster))[0].reshape(-1)
+        rows, cols, costs = [], [], []
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            cells = np.flatnonzero(moves >> d & 1)
+            rows.append(cells)
+            cols.append(cells + dx * c + dy)
+            costs.append(np.full(len(cells), DIAGONAL_COST if dx and dy else STRAIGHT_COST))
+        return csr_matrix((np.concatenate(costs), (np.concatenate(rows), np.concatenate(cols))), shape=(c * c, c * c))
+
+    # ---------- Abstraction ----------
+    def _find_entrances(self):
+        """Các cặp (ô, ô kề bên cluster bên cạnh) là entrance, theo chỉ số phẳng của grid."""
+        n, c = self.grid_size, self.cluster_size
+        free = self.occupancy == 0
+        pairs = []
+        for axis in (0, 1):
+            for border in range(c, n, c):
+                # Hai hàng/cột ô hai bên biên
+                if axis == 0:
+                    both = free[border - 1, :] & free[border, :]
+                else:
+                    both = free[:, border - 1] & free[:, border]
+                for segment_start in range(0, n, c):
+                    segment = both[segment_start:segment_start + c].astype(np.int8)
+                    # Các đoạn liên tiếp trống ở cả hai bên biên
+                    edges = np.diff(np.concatenate(([0], segment, [0])))
+                    for run_start, run_end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+                        if run_end - run_start >= ENTRANCE_SPLIT_LENGTH:
+                            offsets = (run_start, run_end - 1)
+                        else:
+                            offsets = ((run_start + run_end - 1) // 2,)
+                        for offset in offsets:
+                            along = segment_start + int(offset)
+                            if axis == 0:
+                                pairs.append(((border - 1) * n + along, border * n + along))
+                            else:
+                                pairs.append((along * n + border - 1, along * n + border))
+        return pairs
+
+    def _abstraction_path(self):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"{self.map_hash()}_hpa{self.cluster_size}.npz")
+
+    def build_abstraction(self, processes=None):
+        """
+        Dựng (hoặc đọc từ cache_dir) đồ thị trừu tượng: các cạnh (src, dst, cost) giữa các ô entrance,
+        lưu dạng CSR theo src. Trả về dict: nodes (ô entrance, tăng dần), position {ô: vị trí trong nodes},
+        indptr/dst/cost (cạnh của nodes[i] là dst[indptr[i]:indptr[i+1]]) và cluster_nodes {cluster: mảng ô}.
+        processes > 1: chia các cluster cho multiprocessing.Pool (giống Graph.batch_paths).
+        """
+        path = self._abstraction_path()
+        if path is not None and os.path.exists(path):
+            data = np.load(path)
+            src, dst, cost = data["src"], data["dst"], data["cost"]
+        else:
+            pairs = np.array(self._find_entrances(), dtype=np.int64).reshape(-1, 2)
+            src_parts, dst_parts = [pairs[:, 0], pairs[:, 1]], [pairs[:, 1], pairs[:, 0]]
+            cost_parts = [np.full(2 * len(pairs), STRAIGHT_COST, dtype=float)]
+            # Đường ngắn nhất giữa mọi cặp entrance trong cùng cluster
+            clusters = [(cluster, nodes) for cluster, nodes in self._group_by_cluster(np.unique(pairs)).items()
+                        if len(nodes) > 1]
+            if processes and processes > 1:
+                from multiprocessing import Pool
+                chunks = [clusters[i::processes] for i in range(processes)]
+                with Pool(processes, initializer=_init_hpa_worker,
+                          initargs=(self.occupancy, self.cluster_size)) as pool:
+                    results = pool.map(_hpa_worker, chunks)
+            else:
+                results = [self._intra_edges(clusters)]
+            for part_src, part_dst, part_cost in results:
+                src_parts += part_src
+                dst_parts += part_dst
+                cost_parts += part_cost
+            src, dst, cost = np.concatenate(src_parts), np.concatenate(dst_parts), np.concatenate(cost_parts)
+            if path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(path, src=src, dst=dst, cost=cost)
+        order = np.argsort(src, kind="stable")
+        src, dst, cost = src[order], dst[order], cost[order]
+        nodes, first = np.unique(src, return_index=True)
+        self._abstraction = {
+            "nodes": nodes,
+            "position": dict(zip(nodes.tolist(), range(len(nodes)))),
+            "indptr": np.append(first, len(src)).tolist(),
+            "dst": dst,
+            "cost": cost,
+            "cluster_nodes": self._group_by_cluster(nodes),
+        }
+        return self._abstraction
+
+    def _intra_edges(self, clusters):
+        """Cạnh trong cluster (src, dst, cost: các list mảng) cho danh sách (cluster, mảng ô entrance)."""
+        src, dst, cost = [], [], []
+        for cluster, nodes in clusters:
+            local_nodes = self._to_local(nodes, cluster)
+            distances = self._cluster_distances(cluster, local_nodes)[:, local_nodes]
+            np.fill_diagonal(distances, np.inf)
+            i, j = np.nonzero(np.isfinite(distances))
+            src.append(nodes[i])
+            dst.append(nodes[j])
+            cost.append(distances[i, j])
+        return src, dst, cost
+
+    @property
+    def abstraction(self):
+        if self._abstraction is None:
+            self.build_abstraction()
+        return self._abstraction
+
+    # ---------- Truy vấn ----------
+    def _connect(self, index):
+        """Chi phí từ ô index tới các entrance trong cluster của nó (dict), và mảng khoảng cách cục bộ."""
+        cluster = self._cluster_of(index)
+        distances = self._cluster_distances(cluster, [self._to_local(index, cluster)])[0]
+        nodes = self.abstraction["cluster_nodes"].get(cluster, np.zeros(0, dtype=np.int64))
+        node_distances = distances[self._to_local(nodes, cluster)]
+        reachable = np.isfinite(node_distances)
+        return dict(zip(nodes[reachable].tolist(), node_distances[reachable].tolist())), distances
+
+    def _refine(self, a, b):
+        """Đoạn đường ngắn nhất a -> b trong cùng cluster (không gồm a), chỉ số phẳng."""
+        cluster = self._cluster_of(a)
+        local_a, local_b = self._to_local(a, cluster), self._to_local(b, cluster)
+        try:
+            from scipy.sparse.csgraph import dijkstra
+        except ImportError:
+            # Cây Dijkstra từ b: parent của một ô là bước kế tiếp đi về b
+            state = self._local_graph(cluster).goal_tree(local_b, [local_a])
+            parent = state.parent
+        else:
+            # Đồ thị đối xứng: predecessor trong cây Dijkstra từ b cũng là bước kế tiếp đi về b
+            _, parent = dijkstra(self._cluster_matrix(cluster), directed=True, indices=local_b,
+                                 return_predecessors=True)
+        segment = []
+        index = parent[local_a]
+        while index >= 0:
+            segment.append(self._to_global(int(index), cluster))
+            index = parent[index]
+        return segment
+
+    def hpa_star(self, record_frontier=False):
+        """
+        HPA*: nối start/goal vào các entrance trong cluster của chúng, A* (heuristic octile) trên đồ thị
+        trừu tượng, rồi refine từng đoạn trong cluster. Start và goal cùng cluster thì so thêm với
+        đường đi trực tiếp trong cluster.
+        Cùng kiểu trả về với a_star: (path, log, frontier_log, total_explored, final_cost, iterations),
+        log/frontier_log là các nút trừu tượng (x, y); frontier_log (FrontierLog) chỉ ghi khi record_frontier,
+        ngược lại là None.
+        """
+        n = self.grid_size
+        abstraction = self.abstraction
+        position, indptr = abstraction["position"], abstraction["indptr"]
+        abstract_dst, abstract_cost = abstraction["dst"], abstraction["cost"]
+        start, goal = self.start.index, self.goal.index
+        goal_x, goal_y = self.goal.x, self.goal.y
+        if start == goal:
+            return [(self.start.x, self.start.y)], [], FrontierLog(n) if record_frontier else None, 1, 0, 0
+
+        def heuristic(index):
+            dx, dy = abs(index // n - goal_x), abs(index % n - goal_y)
+            return DIAGONAL_COST * min(dx, dy) + STRAIGHT_COST * abs(dx - dy)
+
+        start_links, start_distances = self._connect(start)
+        goal_links, _ = self._connect(goal)
+        direct = float("inf")
+        if self._cluster_of(start) == self._cluster_of(goal):
+            direct = float(start_distances[self._to_local(goal, self._cluster_of(goal))])
+
+        g_score = {start: 0}
+        parent = {start: None}
+        closed = set()
+        push_count = 0
+        open_set = [(heuristic(start), heuristic(start), push_count, start)]
+        log = []
+        frontier_log = FrontierLog(n, (start,)) if record_frontier else None
+        iteration_count = 0
+        while open_set:
+            f, _, _, current = heappop(open_set)
+            if current in closed:
+                continue
+            if f >= direct:
+                break  # Đường trong cluster đã tốt hơn mọi đường qua entrance còn lại
+            iteration_count += 1
+            if frontier_log is not None:
+                frontier_log.step()
+                frontier_log.remove(current)
+            if current == goal:
+                break
+            closed.add(current)
+            log.append(divmod(current, n))
+            links = []
+            if current in position:
+                i = position[current]
+                links = list(zip(abstract_dst[indptr[i]:indptr[i + 1]].tolist(),
+                                 abstract_cost[indptr[i]:indptr[i + 1]].tolist()))
+            if current == start:
+                links = links + list(start_links.items())
+            if current in goal_links:
+                links = links + [(goal, goal_links[current])]
+            for neighbor, edge_cost in links:
+                if neighbor in closed:
+                    continue
+                tentative_g_score = g_score[current] + edge_cost
+                if tentative_g_score < g_score.get(neighbor, float("inf")):
+                    g_score[neighbor] = tentative_g_score
+                    parent[neighbor] = current
+                    h = heuristic(neighbor)
+                    push_count += 1
+                    heappush(open_set, (round(tentative_g_score + h, 9), h, push_count, neighbor))
+                    if frontier_log is not None:
+                        frontier_log.add(neighbor)
+
+        path_cost = g_score.get(goal, float("inf"))
+        if direct <= path_cost and np.isfinite(direct):
+            path = [start] + self._refine(start, goal)
+            final_cost = direct
+        elif np.isfinite(path_cost):
+            nodes = []
+            index = goal
+            while index is not None:
+                nodes.append(index)
+                index = parent[index]
+            nodes.reverse()
+            path = [start]
+            for a, b in zip(nodes, nodes[1:]):
+                if self._cluster_of(a) == self._cluster_of(b):
+                    path.extend(self._refine(a, b))
+                else:
+                    path.append(b)  # Bước thẳng qua biên cluster
+            final_cost = path_cost
+        else:
+            return [], log, frontier_log, len(closed), 0, iteration_count
+        return [divmod(index, n) for index in path], log, frontier_log, len(closed) + 1, final_cost, iteration_count
+
+
+# GraphHPA của mỗi process trong GraphHPA.build_abstraction, dựng một lần khi khởi tạo Pool
+_hpa_graph = None
+
+def _init_hpa_worker(occupancy, cluster_size):
+    global _hpa_graph
+    _hpa_graph = GraphHPA(len(occupancy), cluster_size=cluster_size)
+    _hpa_graph.load_occupancy(occupancy)
+
+def _hpa_worker(clusters):
+    return _hpa_graph._intra_edges(clusters)
+
+
+def main():
+    grid_size = 25
+    graph = GraphHPA(grid_size, cluster_size=5, json_file="map/aStar.json")
+    graph.set_start(5, 8)
+    graph.set_goal(1, 23)
+
+    start_time = time.time()
+    graph.build_abstraction()
+    build_time = time.time() - start_time
+    start_time = time.time()
+    path, log, frontier_log, total_explored, final_cost, iterations = graph.hpa_star()
+    comp_time = time.time() - start_time
+
+    print("HPA* Results:")
+    print("Path:", path)
+    print("Abstract nodes:", len(graph.abstraction["nodes"]))
+    print("Abstract nodes expanded:", total_explored)
+    print("Final cost:", final_cost, "(A*:", graph.a_star()[4], ")")
+    print("Abstraction build time (s):", build_time)
+    print("Computation time (s):", comp_time)
+
+
+if __name__ == "__main__":
+    main()
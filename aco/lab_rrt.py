@@ -1,8 +1,266 @@
+import json
+import math
 import numpy as np
 import matplotlib.pyplot as plt
 
+# Số nút tối đa mà nearest() quét toàn bộ bằng numpy thay vì tìm theo vòng ô của lưới băm
+NEAREST_SCAN_MAX = 512
+
+
+class ObstacleMap:
+    """
+    Vật cản trong không gian liên tục cho RRTStar: occupancy grid (ô (i, j) là hình vuông
+    [i*cell_size, (i+1)*cell_size] x [j*cell_size, (j+1)*cell_size], cùng quy ước [x][y] với map/*.json),
+    hình tròn (x, y, r) và đa giác (danh sách đỉnh).
+    Hình tròn / đa giác được băm vào lưới đều theo AABB của chúng nên mỗi lần kiểm tra chỉ xét các vật cản
+    có AABB chạm ô lưới mà đoạn thẳng (hay cả lô đoạn thẳng) đi qua. Occupancy grid được duyệt trực tiếp
+    theo các ô đoạn thẳng cắt qua.
+    """
+
+    def __init__(self, occupancy=None, cell_size=1.0, circles=(), polygons=(), index_cell_size=None):
+        """
+        :param occupancy: Ma trận [x][y] (1 = vật cản) hoặc None.
+        :param cell_size: Cạnh mỗi ô của occupancy trong không gian liên tục.
+        :param circles: Danh sách (x, y, r).
+        :param polygons: Danh sách đa giác, mỗi đa giác là danh sách đỉnh (x, y) (tự khép kín).
+        :param index_cell_size: Cạnh ô của lưới băm; mặc định là kích thước AABB trung bình của các vật cản.
+        """
+        self.occupancy = None if occupancy is None else np.asarray(occupancy, dtype=bool)
+        self.cell_size = float(cell_size)
+        if self.occupancy is not None:
+            # memoryview phẳng (chỉ số x*height+y) để segment_free đọc từng ô nhanh trong vòng lặp Python
+            self._occupancy_flat = memoryview(self.occupancy.astype(np.uint8).reshape(-1))
+        circles = np.asarray(circles, dtype=np.float64).reshape(-1, 3)
+        self.circle_centers = circles[:, :2]
+        self.circle_radii = circles[:, 2]
+        self.polygons = [np.asarray(polygon, dtype=np.float64).reshape(-1, 2) for polygon in polygons]
+        # Bản tuple của vật cản cho đường kiểm tra một đoạn (segment_free) bằng Python thuần
+        self._circle_list = circles.tolist()
+        self._polygon_edges = [list(zip(p.tolist(), np.roll(p, -1, axis=0).tolist())) for p in self.polygons]
+        # Cạnh của mọi đa giác nối liền nhau: cạnh của đa giác p là
+        # edge_start/edge_end[edge_offsets[p]:edge_offsets[p+1]]
+        self.edge_start = np.concatenate(self.polygons or [np.empty((0, 2))])
+        self.edge_end = np.concatenate([np.roll(p, -1, axis=0) for p in self.polygons] or [np.empty((0, 2))])
+        self.edge_offsets = np.cumsum([0] + [len(p) for p in self.polygons])
+
+        # AABB của từng vật cản: hình tròn trước (id 0..C-1), đa giác sau (id C..C+P-1)
+        boxes = [np.hstack([self.circle_centers - self.circle_radii[:, None],
+                            self.circle_centers + self.circle_radii[:, None]])]
+        boxes += [np.hstack([p.min(axis=0), p.max(axis=0)])[None] for p in self.polygons]
+        boxes = np.vstack(boxes)
+        self._buckets = {}
+        if len(boxes) == 0:
+            self._index_cell_size = 1.0
+            return
+        if index_cell_size is None:
+            index_cell_size = float(np.mean(np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])))
+        self._index_cell_size = max(float(index_cell_size), 1e-9)
+        cells = np.floor(boxes / self._index_cell_size).astype(np.int64)
+        for shape, (x0, y0, x1, y1) in enumerate(cells.tolist()):
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    self._buckets.setdefault((x, y), []).append(shape)
+
+    @classmethod
+    def from_json(cls, json_file, cell_size=1.0, index_cell_size=None):
+        """
+        Đọc map theo định dạng aco/map: "data" là occupancy [x][y]; thêm khoá tuỳ chọn "circles"
+        ([[x, y, r], ...]) và "polygons" ([[[x, y], ...], ...]) theo toạ độ liên tục.
+        """
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+        return cls(data.get("data"), cell_size, data.get("circles", ()), data.get("polygons", ()), index_cell_size)
+
+    def _candidates(self, x0, y0, x1, y1):
+        """Id các hình tròn và đa giác có AABB chung ô lưới băm với hộp [x0, x1] x [y0, y1]."""
+        if not self._buckets:
+            return [], []
+        cell = self._index_cell_size
+        x0, y0 = math.floor(x0 / cell), math.floor(y0 / cell)
+        x1, y1 = math.floor(x1 / cell), math.floor(y1 / cell)
+        buckets = self._buckets
+        if x0 == x1 and y0 == y1:
+            shapes = buckets.get((x0, y0), [])
+        else:
+            shapes = set()
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > len(buckets):
+                # Hộp phủ nhiều ô hơn số ô có vật cản: duyệt các ô có vật cản
+                for (x, y), bucket in buckets.items():
+                    if x0 <= x <= x1 and y0 <= y <= y1:
+                        shapes.update(bucket)
+            else:
+                for x in range(x0, x1 + 1):
+                    for y in range(y0, y1 + 1):
+                        bucket = buckets.get((x, y))
+                        if bucket:
+                            shapes.update(bucket)
+            shapes = sorted(shapes)
+        num_circles = len(self._circle_list)
+        circles = [shape for shape in shapes if shape < num_circles]
+        return circles, [shape - num_circles for shape in shapes if shape >= num_circles]
+
+    def _hits_circles(self, a, b, circles):
+        """Va chạm của K đoạn a->b với các hình tròn circles: mảng bool (K,)."""
+        centers = self.circle_centers[circles]       # (C, 2)
+        radii = self.circle_radii[circles]
+        d = b - a                                   # (K, 2)
+        length2 = np.maximum(d[:, 0] ** 2 + d[:, 1] ** 2, 1e-300)
+        to_center = centers[None, :, :] - a[:, None, :]  # (K, C, 2)
+        t = np.clip((to_center[..., 0] * d[:, None, 0] + to_center[..., 1] * d[:, None, 1]) / length2[:, None],
+                    0.0, 1.0)
+        closest_x = to_center[..., 0] - t * d[:, None, 0]
+        closest_y = to_center[..., 1] - t * d[:, None, 1]
+        return (closest_x ** 2 + closest_y ** 2 <= radii ** 2).any(axis=1)
+
+    def _hits_polygons(self, a, b, polygons):
+        """Va chạm của K đoạn a->b với các đa giác polygons (cắt một cạnh hoặc nằm hẳn bên trong): bool (K,)."""
+        offsets = self.edge_offsets
+        edges = np.concatenate([np.arange(offsets[p], offsets[p + 1]) for p in polygons])
+        e0, e1 = self.edge_start[edges], self.edge_end[edges]  # (E, 2)
+
+        def cross(ux, uy, vx, vy):
+            return ux * vy - uy * vx
+
+        d = b - a
+        e = e1 - e0
+        ax, ay = a[:, None, 0], a[:, None, 1]
+        bx, by = b[:, None, 0], b[:, None, 1]
+        d1 = cross(d[:, None, 0], d[:, None, 1], e0[:, 0] - ax, e0[:, 1] - ay)
+        d2 = cross(d[:, None, 0], d[:, None, 1], e1[:, 0] - ax, e1[:, 1] - ay)
+        d3 = cross(e[:, 0], e[:, 1], ax - e0[:, 0], ay - e0[:, 1])
+        d4 = cross(e[:, 0], e[:, 1], bx - e0[:, 0], by - e0[:, 1])
+        # Điều kiện AABB giao nhau loại trường hợp thẳng hàng nhưng rời nhau (d1..d4 đều bằng 0)
+        overlap = ((np.minimum(ax, bx) <= np.maximum(e0[:, 0], e1[:, 0]))
+                   & (np.minimum(e0[:, 0], e1[:, 0]) <= np.maximum(ax, bx))
+                   & (np.minimum(ay, by) <= np.maximum(e0[:, 1], e1[:, 1]))
+                   & (np.minimum(e0[:, 1], e1[:, 1]) <= np.maximum(ay, by)))
+        hits = ((d1 * d2 <= 0) & (d3 * d4 <= 0) & overlap).any(axis=1)
+
+        # Đoạn không cắt cạnh nào thì hoặc nằm hẳn trong đa giác hoặc hẳn ngoài: kiểm tra điểm a
+        # bằng số lần tia ngang từ a cắt cạnh (chẵn lẻ) của từng đa giác
+        with np.errstate(divide='ignore', invalid='ignore'):
+            straddle = (e0[:, 1] > ay) != (e1[:, 1] > ay)
+            x_cross = e0[:, 0] + (ay - e0[:, 1]) * e[:, 0] / e[:, 1]
+            crossings = (straddle & (ax < x_cross)).astype(np.int64)
+        starts = np.cumsum([0] + [offsets[p + 1] - offsets[p] for p in polygons])[:-1]
+        inside = (np.add.reduceat(crossings, starts, axis=1) % 2 == 1).any(axis=1)
+        return hits | inside
+
+    def _hits_grid(self, a, b):
+        """Va chạm của K đoạn a->b với occupancy grid: đoạn chạm ô vật cản nào (kể cả ô chứa đầu mút)."""
+        occupancy = self.occupancy
+        p, q = a / self.cell_size, b / self.cell_size
+        d = q - p
+        lo = np.floor(np.minimum(p, q)).astype(np.int64)
+        hi = np.floor(np.maximum(p, q)).astype(np.int64)
+        crossings = hi - lo  # Số biên ô theo x và theo y mà mỗi đoạn cắt qua
+        # Tham số t của các biên ô trên mỗi đoạn (đệm bằng 1 cho đủ cột), sắp xếp lại rồi lấy trung điểm
+        # các khoảng liên tiếp: mỗi trung điểm nằm trong đúng một ô đoạn thẳng đi qua. Hai khoảng rỗng
+        # [0, 0] và [1, 1] luôn có để ô chứa hai đầu mút luôn được xét (kể cả khi đầu mút nằm trên biên ô)
+        columns = [np.zeros((len(p), 2)), np.ones((len(p), 2))]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for axis in (0, 1):
+                steps = np.arange(1, crossings[:, axis].max(initial=0) + 1)
+                if len(steps):
+                    t = (lo[:, axis, None] + steps - p[:, axis, None]) / d[:, axis, None]
+                    columns.append(np.where(steps <= crossings[:, axis, None], t, 1.0))
+        t = np.sort(np.hstack(columns), axis=1)
+        mid = (t[:, :-1] + t[:, 1:]) / 2
+        cells_x = np.clip(np.floor(p[:, 0, None] + mid * d[:, 0, None]).astype(np.int64), 0, occupancy.shape[0] - 1)
+        cells_y = np.clip(np.floor(p[:, 1, None] + mid * d[:, 1, None]).astype(np.int64), 0, occupancy.shape[1] - 1)
+        return occupancy[cells_x, cells_y].any(axis=1)
+
+    def segments_free(self, a, b):
+        """
+        Kiểm tra K đoạn thẳng a[k] -> b[k] cùng lúc (a, b: mảng (K, 2), hoặc một điểm (2,) dùng chung).
+        Trả về mảng bool (K,), True nếu đoạn không chạm vật cản nào.
+        """
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        a, b = np.broadcast_arrays(a.reshape(-1, 2), b.reshape(-1, 2))
+        hits = np.zeros(len(a), dtype=bool)
+        if len(a) == 0:
+            return ~hits
+        if self.occupancy is not None:
+            hits |= self._hits_grid(a, b)
+        (x0, y0), (x1, y1) = np.minimum(a, b).min(axis=0).tolist(), np.maximum(a, b).max(axis=0).tolist()
+        circles, polygons = self._candidates(x0, y0, x1, y1)
+        if circles:
+            hits |= self._hits_circles(a, b, circles)
+        if polygons:
+            hits |= self._hits_polygons(a, b, polygons)
+        return ~hits
+
+    def _grid_hit(self, x1, x2):
+        """_hits_grid cho một đoạn x1 -> x2 bằng Python thuần (cùng công thức nên cùng kết quả)."""
+        size = self.cell_size
+        width, height = self.occupancy.shape
+        occupancy = self._occupancy_flat
+        px, py, qx, qy = x1[0] / size, x1[1] / size, x2[0] / size, x2[1] / size
+        dx, dy = qx - px, qy - py
+        t = [0.0, 0.0, 1.0, 1.0]
+        if dx:
+            t += [(k - px) / dx for k in range(math.floor(min(px, qx)) + 1, math.floor(max(px, qx)) + 1)]
+        if dy:
+            t += [(k - py) / dy for k in range(math.floor(min(py, qy)) + 1, math.floor(max(py, qy)) + 1)]
+        t.sort()
+        for t0, t1 in zip(t, t[1:]):
+            mid = (t0 + t1) / 2
+            cx = min(max(math.floor(px + mid * dx), 0), width - 1)
+            cy = min(max(math.floor(py + mid * dy), 0), height - 1)
+            if occupancy[cx * height + cy]:
+                return True
+        return False
+
+    def segment_free(self, x1, x2):
+        """
+        Đoạn thẳng x1 -> x2 có không chạm vật cản nào không. Cùng kết quả với segments_free nhưng bằng
+        Python thuần, nhanh hơn khi chỉ có một đoạn.
+        """
+        if self.occupancy is not None and self._grid_hit(x1, x2):
+            return False
+        ax, ay = x1[0], x1[1]
+        bx, by = x2[0], x2[1]
+        circles, polygons = self._candidates(min(ax, bx), min(ay, by), max(ax, bx), max(ay, by))
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        for shape in circles:
+            x, y, r = self._circle_list[shape]
+            t = min(max(((x - ax) * dx + (y - ay) * dy) / length2, 0.0), 1.0) if length2 else 0.0
+            if (x - ax - t * dx) ** 2 + (y - ay - t * dy) ** 2 <= r * r:
+                return False
+        for polygon in polygons:
+            inside = False
+            for (ex0, ey0), (ex1, ey1) in self._polygon_edges[polygon]:
+                ex, ey = ex1 - ex0, ey1 - ey0
+                d1 = dx * (ey0 - ay) - dy * (ex0 - ax)
+                d2 = dx * (ey1 - ay) - dy * (ex1 - ax)
+                d3 = ex * (ay - ey0) - ey * (ax - ex0)
+                d4 = ex * (by - ey0) - ey * (bx - ex0)
+                if (d1 * d2 <= 0 and d3 * d4 <= 0 and min(ax, bx) <= max(ex0, ex1) and min(ex0, ex1) <= max(ax, bx)
+                        and min(ay, by) <= max(ey0, ey1) and min(ey0, ey1) <= max(ay, by)):
+                    return False
+                if (ey0 > ay) != (ey1 > ay) and ax < ex0 + (ay - ey0) * ex / ey:
+                    inside = not inside
+            if inside:
+                return False
+        return True
+
+    def draw(self, ax):
+        """Vẽ các vật cản lên matplotlib Axes ax."""
+        if self.occupancy is not None:
+            width, height = self.occupancy.shape
+            ax.imshow(self.occupancy.T, origin="lower", cmap="Greys", vmin=0, vmax=1,
+                      extent=(0, width * self.cell_size, 0, height * self.cell_size))
+        for (x, y), r in zip(self.circle_centers.tolist(), self.circle_radii.tolist()):
+            ax.add_patch(plt.Circle((x, y), r, color="k"))
+        for polygon in self.polygons:
+            ax.add_patch(plt.Polygon(polygon, color="k"))
+
+
 class RRTStar:
-    def __init__(self, start, goal, search_space, n_iter=500, step_size=5.0, radius=10.0):
+    def __init__(self, start, goal, search_space, n_iter=500, step_size=5.0, radius=10.0, obstacles=None,
+                 gamma=None):
         """
         Khởi tạo thuật toán RRT*.
         :param start: Điểm bắt đầu (x, y).
@@ -10,7 +268,11 @@ class RRTStar:
         :param search_space: Không gian tìm kiếm dưới dạng [xmin, xmax, ymin, ymax].
         :param n_iter: Số vòng lặp tối đa.
         :param step_size: Khoảng cách mở rộng mỗi bước.
-        :param radius: Bán kính tìm kiếm các nút lân cận để thực hiện bước “rewiring”.
+        :param radius: Bán kính tìm kiếm các nút lân cận để thực hiện bước “rewiring” lớn nhất.
+        :param obstacles: ObstacleMap dùng để kiểm tra va chạm, None nếu không có vật cản.
+        :param gamma: Hệ số của bán kính lân cận min(gamma * (log n / n)^(1/2), radius) với n nút; mặc định là
+            cận dưới 2 * (1 + 1/2)^(1/2) * (diện tích / pi)^(1/2) của RRT* (Karaman & Frazzoli) với diện tích
+            search_space. gamma=0 giữ bán kính cố định bằng radius.
         """
         self.start = start
         self.goal = goal
@@ -18,13 +280,119 @@ class RRTStar:
         self.n_iter = n_iter
         self.step_size = step_size
         self.radius = radius
-        
-        # Danh sách các nút hiện có trong cây.
-        self.nodes = [start]
-        # Dictionary chứa thông tin cha của mỗi nút.
-        self.parent = {start: None}
-        # Dictionary lưu chi phí từ điểm bắt đầu đến mỗi nút.
-        self.cost = {start: 0}
+        self.obstacles = obstacles
+        if gamma is None:
+            area = (search_space[1] - search_space[0]) * (search_space[3] - search_space[2])
+            gamma = 2 * np.sqrt(1.5) * np.sqrt(area / np.pi)
+        self.gamma = gamma
+
+        # Các nút của cây được đánh số theo thứ tự thêm vào: toạ độ, chi phí từ start và chỉ số nút cha
+        # (-1 cho gốc) nằm trong mảng numpy cấp phát trước, tăng gấp đôi khi đầy.
+        self._size = 0
+        self._points = np.empty((1024, 2), dtype=np.float64)
+        self._cost = np.empty(1024, dtype=np.float64)
+        self._parent = np.empty(1024, dtype=np.int64)
+        # Danh sách nút con của mỗi nút, để rewire cập nhật chi phí của cả cây con
+        self._children = []
+        # Lưới băm: ô vuông cạnh bằng bán kính lân cận -> danh sách chỉ số nút nằm trong ô. Các nút cách
+        # nhau < bán kính luôn nằm trong hai ô kề nhau nên near() chỉ xét 3x3 ô.
+        self._rebuild_grid(radius)
+        self.goal_index = -1  # Chỉ số nút của goal sau khi đã nối được vào cây
+        self._add_node(start, -1, 0.0)
+
+    @property
+    def nodes(self):
+        """Toạ độ các nút hiện có trong cây, mảng (n, 2) theo thứ tự thêm vào."""
+        return self._points[:self._size]
+
+    @property
+    def parent(self):
+        """Chỉ số nút cha của mỗi nút (-1 cho start)."""
+        return self._parent[:self._size]
+
+    @property
+    def cost(self):
+        """Chi phí từ điểm bắt đầu đến mỗi nút."""
+        return self._cost[:self._size]
+
+    def near_radius(self):
+        """Bán kính lân cận cho nút kế tiếp: min(gamma * (log n / n)^(1/2), radius), n tính cả nút đó."""
+        n = self._size + 1
+        if not self.gamma or n < 2:
+            return self.radius
+        return min(self.gamma * np.sqrt(np.log(n) / n), self.radius)
+
+    def _rebuild_grid(self, cell_size):
+        """Dựng lại lưới băm với cạnh ô cell_size và băm lại mọi nút hiện có."""
+        self._cell_size = float(cell_size)
+        self._grid_width = int(np.ceil((self.search_space[1] - self.search_space[0]) / self._cell_size)) + 1
+        self._grid_height = int(np.ceil((self.search_space[3] - self.search_space[2]) / self._cell_size)) + 1
+        points = self._points[:self._size]
+        cx = np.clip((points[:, 0] - self.search_space[0]) // self._cell_size, 0, self._grid_width - 1)
+        cy = np.clip((points[:, 1] - self.search_space[2]) // self._cell_size, 0, self._grid_height - 1)
+        cells = (cx * self._grid_height + cy).astype(np.int64)
+        # Sắp các nút theo ô (giữ thứ tự thêm vào trong mỗi ô) rồi cắt thành từng danh sách
+        order = np.argsort(cells, kind='stable')
+        keys, starts = np.unique(cells[order], return_index=True)
+        groups = np.split(order, starts[1:]) if len(order) else []
+        self._buckets = {key: group.tolist() for key, group in zip(keys.tolist(), groups)}
+
+    def _cell_of(self, point):
+        """Toạ độ ô của lưới băm chứa point, kẹp vào trong lưới."""
+        cx = int((point[0] - self.search_space[0]) // self._cell_size)
+        cy = int((point[1] - self.search_space[2]) // self._cell_size)
+        return min(max(cx, 0), self._grid_width - 1), min(max(cy, 0), self._grid_height - 1)
+
+    def _add_node(self, point, parent, cost):
+        """Thêm nút vào cây và lưới băm, trả về chỉ số của nút."""
+        index = self._size
+        if index == len(self._points):
+            capacity = 2 * index
+            self._points = np.resize(self._points, (capacity, 2))
+            self._cost = np.resize(self._cost, capacity)
+            self._parent = np.resize(self._parent, capacity)
+        self._points[index] = point
+        self._cost[index] = cost
+        self._parent[index] = parent
+        self._size += 1
+        self._children.append([])
+        if parent >= 0:
+            self._children[parent].append(index)
+        cx, cy = self._cell_of(point)
+        self._buckets.setdefault(cx * self._grid_height + cy, []).append(index)
+        return index
+
+    def _gather(self, cx, cy, reach):
+        """Chỉ số các nút nằm trong các ô cách ô (cx, cy) không quá reach ô."""
+        indices = []
+        buckets, height = self._buckets, self._grid_height
+        y_range = range(max(cy - reach, 0), min(cy + reach + 1, height))
+        for x in range(max(cx - reach, 0), min(cx + reach + 1, self._grid_width)):
+            for y in y_range:
+                bucket = buckets.get(x * height + y)
+                if bucket:
+                    indices.extend(bucket)
+        return indices
+
+    def _ring(self, cx, cy, reach):
+        """Chỉ số các nút nằm trong các ô trên viền hình vuông bán kính reach ô quanh ô (cx, cy)."""
+        if reach == 0:
+            return self._gather(cx, cy, 0)
+        indices = []
+        buckets, height, width = self._buckets, self._grid_height, self._grid_width
+        cells = []
+        for x in range(cx - reach, cx + reach + 1):
+            cells.append((x, cy - reach))
+            cells.append((x, cy + reach))
+        for y in range(cy - reach + 1, cy + reach):
+            cells.append((cx - reach, y))
+            cells.append((cx + reach, y))
+        for x, y in cells:
+            if 0 <= x < width and 0 <= y < height:
+                bucket = buckets.get(x * height + y)
+                if bucket:
+                    indices.extend(bucket)
+        return indices
 
     def sample_point(self):
         """ Sinh ra điểm ngẫu nhiên trong không gian tìm kiếm. """
@@ -36,15 +404,41 @@ class RRTStar:
             x_rand = np.random.uniform(self.search_space[0], self.search_space[1])
             y_rand = np.random.uniform(self.search_space[2], self.search_space[3])
         return (x_rand, y_rand)
-    
+
     def nearest(self, x_rand):
-        """ Tìm nút gần với điểm x_rand nhất trong cây. """
-        nodes_array = np.array(self.nodes)
-        diff = nodes_array - np.array(x_rand)
-        dists = np.linalg.norm(diff, axis=1)
-        idx = np.argmin(dists)
-        return self.nodes[idx]
-    
+        """
+        Tìm nút gần với điểm x_rand nhất trong cây, trả về chỉ số nút.
+        Duyệt các vòng ô của lưới băm từ ô chứa x_rand ra ngoài, dừng khi vòng kế tiếp chắc chắn xa hơn
+        nút tốt nhất đã thấy. Cây nhỏ hoặc x_rand ở xa cây (quá nhiều ô rỗng) thì quét numpy toàn bộ.
+        """
+        size = self._size
+        if size > NEAREST_SCAN_MAX:
+            cx, cy = self._cell_of(x_rand)
+            max_reach = max(self._grid_width, self._grid_height)
+            best, best_dist = -1, np.inf
+            # Vòng đầu lấy luôn 3x3 ô: đủ khi nút gần nhất cách x_rand không quá một cạnh ô
+            reach = 1
+            candidates = self._gather(cx, cy, 1)
+            while True:
+                if candidates:
+                    diff = self._points[candidates] - x_rand
+                    dists = diff[:, 0] ** 2 + diff[:, 1] ** 2
+                    i = int(dists.argmin())
+                    if dists[i] < best_dist:
+                        best, best_dist = candidates[i], dists[i]
+                # Mọi nút ngoài vòng reach cách x_rand ít nhất reach * cell_size
+                if best >= 0 and best_dist <= (reach * self._cell_size) ** 2:
+                    return best
+                reach += 1
+                if reach > max_reach:
+                    return best
+                # Số ô đã xét (2*reach+1)^2 vượt quá số nút / 32 thì quét toàn bộ rẻ hơn
+                if (2 * reach + 1) ** 2 * 32 > size:
+                    break
+                candidates = self._ring(cx, cy, reach)
+        diff = self._points[:size] - x_rand
+        return int((diff[:, 0] ** 2 + diff[:, 1] ** 2).argmin())
+
     def steer(self, x_nearest, x_rand):
         """
         Tạo nút mới theo hướng từ x_nearest tới x_rand, với bước tối đa là step_size.
@@ -53,47 +447,113 @@ class RRTStar:
         vec = np.array(x_rand) - np.array(x_nearest)
         dist = np.linalg.norm(vec)
         if dist < self.step_size:
-            return x_rand
+            return tuple(x_rand)
         else:
             vec = vec / dist * self.step_size
             new_point = (x_nearest[0] + vec[0], x_nearest[1] + vec[1])
             return new_point
-    
-    def near(self, x_new):
+
+    def near(self, x_new, radius=None):
         """
-        Tìm các nút trong cây có khoảng cách đến x_new < radius.
+        Tìm các nút trong cây có khoảng cách đến x_new < radius (mặc định near_radius()).
         Đây là tập hợp các nút lân cận dùng để lựa chọn cha tối ưu và thực hiện rewire.
+        Trả về (chỉ số các nút, khoảng cách tương ứng) dạng mảng numpy.
         """
-        near_nodes = []
-        for node in self.nodes:
-            if np.linalg.norm(np.array(node) - np.array(x_new)) < self.radius:
-                near_nodes.append(node)
-        return near_nodes
-    
+        radius = self.near_radius() if radius is None else radius
+        cx, cy = self._cell_of(x_new)
+        candidates = np.array(self._gather(cx, cy, int(np.ceil(radius / self._cell_size))), dtype=np.int64)
+        diff = self._points[candidates] - x_new
+        dists = np.sqrt(diff[:, 0] ** 2 + diff[:, 1] ** 2)
+        inside = dists < radius
+        return candidates[inside], dists[inside]
+
     def collision_free(self, x1, x2):
         """
-        Kiểm tra xem đoạn nối từ x1 đến x2 có va chạm hay không.
-        Trong ví dụ này, giả sử không có vật cản nào (có thể bổ sung bằng cách kiểm tra occupancy grid hay các yếu tố hình học).
+        Kiểm tra xem đoạn nối từ x1 đến x2 có va chạm hay không (True nếu không va chạm).
         """
-        return True
-    
+        return self.obstacles is None or self.obstacles.segment_free(x1, x2)
+
+    def collision_free_batch(self, points, x):
+        """Như collision_free cho các đoạn nối từng điểm trong points (mảng (K, 2)) tới x, trả về mảng bool (K,)."""
+        if self.obstacles is None:
+            return np.ones(len(points), dtype=bool)
+        return self.obstacles.segments_free(points, x)
+
+    def _set_parent(self, node, parent, cost):
+        """Đổi cha của node thành parent với chi phí mới cost, cập nhật chi phí cả cây con của node."""
+        old_parent = self._parent[node]
+        if old_parent >= 0:
+            self._children[old_parent].remove(node)
+        self._children[parent].append(node)
+        self._parent[node] = parent
+        delta = cost - self._cost[node]
+        # Mọi nút trong cây con đi qua node nên chi phí thay đổi đúng bằng delta
+        subtree = [node]
+        children = self._children
+        for descendant in subtree:
+            subtree.extend(children[descendant])
+        self._cost[subtree] += delta
+
     def retrieve_path(self):
         """
         Truy xuất chuỗi đường đi từ start đến goal dựa theo thông tin cha của mỗi nút.
         Trả về danh sách các điểm theo thứ tự từ điểm bắt đầu tới đích.
         """
         path = []
-        node = self.goal
-        while node is not None:
-            path.append(node)
-            node = self.parent.get(node)
+        node = self.goal_index
+        while node >= 0:
+            path.append(tuple(self._points[node].tolist()))
+            node = self._parent[node]
         path.reverse()
         return path
 
-    def run(self, animate=True):
+    def extend(self, x_rand):
+        """
+        Một bước RRT*: nearest, steer, chọn cha tối ưu trong các nút lân cận rồi rewire.
+        Trả về chỉ số nút mới, hoặc -1 nếu không thêm được nút (va chạm hoặc trùng nút đã có).
+        """
+        i_nearest = self.nearest(x_rand)
+        x_nearest = tuple(self._points[i_nearest].tolist())
+        x_new = self.steer(x_nearest, x_rand)
+        # x_rand trùng một nút đã có (thường là goal khi lấy mẫu goal): không thêm nút trùng vào cây
+        if x_new == x_nearest or not self.collision_free(x_nearest, x_new):
+            return -1
+
+        radius = self.near_radius()
+        if radius < self._cell_size / 2:
+            # Bán kính đã co còn dưới nửa cạnh ô: thu nhỏ lưới băm để near() không gom quá nhiều nút thừa
+            # (chỉ xảy ra khi số nút tăng khoảng 4 lần nên chi phí băm lại được chia đều)
+            self._rebuild_grid(radius)
+        near_nodes, near_dists = self.near(x_new, radius)
+        # Kiểm tra va chạm một lần theo lô cho mọi đoạn nối x_new với nút lân cận, dùng cho cả chọn cha
+        # và rewire; các nút bị chắn bị loại khỏi cả hai bước
+        free = self.collision_free_batch(self._points[near_nodes], x_new)
+        near_nodes, near_dists = near_nodes[free], near_dists[free]
+
+        # Chọn cha: nút lân cận cho chi phí tới x_new nhỏ nhất, mặc định là x_nearest (đã biết không va chạm)
+        x_min = i_nearest
+        c_min = self._cost[i_nearest] + np.hypot(x_new[0] - x_nearest[0], x_new[1] - x_nearest[1])
+        near_costs = self._cost[near_nodes] + near_dists
+        if len(near_costs):
+            i = int(near_costs.argmin())
+            if near_costs[i] < c_min:
+                x_min, c_min = int(near_nodes[i]), near_costs[i]
+        new_index = self._add_node(x_new, x_min, c_min)
+
+        # Rewire: các nút lân cận đi qua x_new rẻ hơn thì đổi cha sang x_new. Chi phí chỉ giảm khi rewire nên
+        # chỉ cần xét các nút rẻ hơn lúc đầu, kiểm tra lại vì một nút có thể đã giảm theo cây con của nút trước
+        new_costs = c_min + near_dists
+        improved = new_costs < self._cost[near_nodes]
+        for x_near, c_new in zip(near_nodes[improved].tolist(), new_costs[improved].tolist()):
+            if c_new < self._cost[x_near]:
+                self._set_parent(x_near, new_index, c_new)
+        return new_index
+
+    def run(self, animate=True, stop_at_goal=True):
         """
         Chạy thuật toán RRT* với số vòng lặp nhất định.
         Nếu animate=True thì trực quan hoá quá trình mở rộng cây.
+        Nếu stop_at_goal=False thì chạy đủ n_iter vòng, tiếp tục cải thiện đường đi sau khi đã tới goal.
         Trả về đường đi từ start đến goal nếu tìm được.
         """
         path = None
@@ -103,66 +563,44 @@ class RRTStar:
             fig, ax = plt.subplots()
             ax.set_xlim(self.search_space[0], self.search_space[1])
             ax.set_ylim(self.search_space[2], self.search_space[3])
+            if self.obstacles is not None:
+                self.obstacles.draw(ax)
             # Vẽ điểm bắt đầu và đích
             ax.plot(self.start[0], self.start[1], "ro", markersize=5)
             ax.plot(self.goal[0], self.goal[1], "go", markersize=5)
-        
+
         for i in range(self.n_iter):
-            # Bước 1: Lấy điểm mẫu ngẫu nhiên
-            x_rand = self.sample_point()
-            # Bước 2: Tìm nút gần nhất trong cây
-            x_nearest = self.nearest(x_rand)
-            # Bước 3: Tạo nút mới theo hướng từ x_nearest tới x_rand
-            x_new = self.steer(x_nearest, x_rand)
-            if not self.collision_free(x_nearest, x_new):
+            # Lấy điểm mẫu ngẫu nhiên và mở rộng cây về phía nó
+            new_index = self.extend(self.sample_point())
+            if new_index < 0:
                 continue
+            x_new = tuple(self._points[new_index].tolist())
 
-            # Bước 4: Tìm các nút lân cận trong bán kính radius
-            X_near = self.near(x_new)
-            
-            # Khởi tạo chi phí từ start đến x_new qua x_nearest
-            c_min = self.cost[x_nearest] + np.linalg.norm(np.array(x_nearest) - np.array(x_new))
-            x_min = x_nearest
-            
-            # Chọn cha tối ưu cho x_new từ tập các nút lân cận
-            for x_near in X_near:
-                if self.collision_free(x_near, x_new):
-                    c_temp = self.cost[x_near] + np.linalg.norm(np.array(x_near) - np.array(x_new))
-                    if c_temp < c_min:
-                        x_min = x_near
-                        c_min = c_temp
-
-            # Thêm x_new vào cây với cha là x_min
-            self.nodes.append(x_new)
-            self.parent[x_new] = x_min
-            self.cost[x_new] = c_min
-            
-            # Rewire: với mỗi x_near trong X_near, nếu nối từ x_new có chi phí thấp hơn thì cập nhật lại cha và chi phí.
-            for x_near in X_near:
-                if self.collision_free(x_new, x_near):
-                    if self.cost[x_new] + np.linalg.norm(np.array(x_new) - np.array(x_near)) < self.cost[x_near]:
-                        self.parent[x_near] = x_new
-                        self.cost[x_near] = self.cost[x_new] + np.linalg.norm(np.array(x_new) - np.array(x_near))
-            
             if animate:
                 # Vẽ cạnh nối giữa x_new và cha của nó
-                parent = self.parent[x_new]
+                parent = self._points[self._parent[new_index]]
                 ax.plot([parent[0], x_new[0]], [parent[1], x_new[1]], "b-")
                 ax.plot(x_new[0], x_new[1], "ro", markersize=3)
                 plt.pause(0.01)
-            
+
             # Kiểm tra nếu x_new đủ gần goal (ví dụ trong khoảng bước di chuyển)
-            if np.linalg.norm(np.array(x_new) - np.array(self.goal)) < self.step_size:
-                # Gán cha của đích là x_new và truy xuất path
-                self.parent[self.goal] = x_new
-                self.cost[self.goal] = self.cost[x_new] + np.linalg.norm(np.array(x_new)-np.array(self.goal))
+            dist_to_goal = np.hypot(x_new[0] - self.goal[0], x_new[1] - self.goal[1])
+            if dist_to_goal < self.step_size and self.collision_free(x_new, tuple(self.goal)):
+                goal_cost = self._cost[new_index] + dist_to_goal
+                if self.goal_index < 0:
+                    # Goal thành một nút của cây để các lần rewire sau có thể cải thiện nó
+                    self.goal_index = self._add_node(self.goal, new_index, goal_cost)
+                    print("Found path in iteration", i)
+                elif goal_cost < self._cost[self.goal_index]:
+                    self._set_parent(self.goal_index, new_index, goal_cost)
                 # Vẽ cạnh nối giữa x_new và goal
                 if animate:
                     ax.plot([x_new[0], self.goal[0]], [x_new[1], self.goal[1]], "b-", linewidth=2)
-                path = self.retrieve_path()
-                print("Found path in iteration", i)
-                break
-        
+                if stop_at_goal:
+                    break
+
+        if self.goal_index >= 0:
+            path = self.retrieve_path()
         if animate:
             plt.ioff()
             plt.show()
@@ -173,9 +611,11 @@ def main():
     start = (10, 10)
     goal = (90, 90)
     search_space = [0, 100, 0, 100]
-    
-    # Khởi tạo RRT* với số vòng lặp tối đa là 500, bước di chuyển 2.0 và bán kính lân cận 10.0
-    rrt_star = RRTStar(start, goal, search_space, n_iter=1000, step_size=2.0, radius=10.0)
+    # Map 25x25 của aco/map, mỗi ô rộng 4 để phủ không gian 100x100
+    obstacles = ObstacleMap.from_json("map/basic.json", cell_size=4.0)
+
+    # Khởi tạo RRT* với số vòng lặp tối đa là 3000, bước di chuyển 2.0 và bán kính lân cận 10.0
+    rrt_star = RRTStar(start, goal, search_space, n_iter=3000, step_size=2.0, radius=10.0, obstacles=obstacles)
     path = rrt_star.run(animate=True)
     
     if path is not None:
@@ -0,0 +1,780 @@
+import glob
+import math
+import time
+import numpy as np
+
+from bench_mark import Graph, DistanceFieldCache, smoothing_report
+
+# Benchmark hiệu năng các planner trên grid (không dùng pygame, chỉ in kết quả ra console).
+# Chạy: python perf_bm.py (từ thư mục aco)
+
+
+def make_random_graph(grid_size, obstacle_ratio=0.2, seed=0):
+    """Tạo Graph grid_size x grid_size với vật cản ngẫu nhiên, start (0,0), goal ở góc đối diện."""
+    rng = np.random.default_rng(seed)
+    occupancy = (rng.random((grid_size, grid_size)) < obstacle_ratio).astype(np.uint8)
+    occupancy[0, 0] = occupancy[-1, -1] = 0
+    graph = Graph(grid_size)
+    graph.load_occupancy(occupancy)
+    graph.set_start(0, 0)
+    graph.set_goal(grid_size - 1, grid_size - 1)
+    return graph
+
+
+def make_maze(grid_size, seed=0, loop_ratio=0.0):
+    """
+    Mê cung grid_size x grid_size (DFS ngẫu nhiên trên các ô lẻ, tường 1 ô), start (1,1), goal ở góc đối diện.
+    loop_ratio: tỉ lệ tường được đục thêm để tạo vòng (0: mê cung hoàn hảo, một đường duy nhất).
+    """
+    rng = np.random.default_rng(seed)
+    rooms = (grid_size - 1) // 2
+    occupancy = np.ones((grid_size, grid_size), dtype=np.uint8)
+    visited = np.zeros((rooms, rooms), dtype=bool)
+    steps = ((1, 0), (-1, 0), (0, 1), (0, -1))
+    stack = [(0, 0)]
+    visited[0, 0] = True
+    occupancy[1, 1] = 0
+    while stack:
+        x, y = stack[-1]
+        options = [(dx, dy) for dx, dy in steps
+                   if 0 <= x + dx < rooms and 0 <= y + dy < rooms and not visited[x + dx, y + dy]]
+        if not options:
+            stack.pop()
+            continue
+        dx, dy = options[rng.integers(len(options))]
+        visited[x + dx, y + dy] = True
+        occupancy[2 * x + 1 + dx, 2 * y + 1 + dy] = 0
+        occupancy[2 * (x + dx) + 1, 2 * (y + dy) + 1] = 0
+        stack.append((x + dx, y + dy))
+    if loop_ratio:
+        inner = occupancy[1:-1, 1:-1]
+        inner[(inner == 1) & (rng.random(inner.shape) < loop_ratio)] = 0
+    graph = Graph(grid_size)
+    graph.load_occupancy(occupancy)
+    graph.set_start(1, 1)
+    graph.set_goal(2 * rooms - 1, 2 * rooms - 1)
+    return graph
+
+
+def bench_a_star(grid_sizes=(25, 50, 100, 200, 500), obstacle_ratio=0.2, seed=0):
+    """Đo số node mở rộng/giây của Graph.a_star theo kích thước grid."""
+    print("A* expansions/sec vs grid size")
+    print(f"{'grid':>8} {'found':>6} {'expanded':>10} {'time (s)':>10} {'exp/s':>12}")
+    for grid_size in grid_sizes:
+        graph = make_random_graph(grid_size, obstacle_ratio, seed)
+        start_time = time.perf_counter()
+        path, log, frontier_log, total_explored, final_cost, iterations = graph.a_star()
+        elapsed = time.perf_counter() - start_time
+        print(f"{grid_size:>8} {str(bool(path)):>6} {iterations:>10} {elapsed:>10.4f} {iterations / elapsed:>12.0f}")
+
+
+def bench_bfs_dfs(grid_sizes=(100, 300, 1000, 2000), seed=0):
+    """
+    Thời gian BFS/DFS theo kích thước mê cung: membership O(1) và không ghi frontier_log nên thời gian
+    mỗi ô mở rộng gần như không đổi khi grid lớn lên.
+    """
+    print("BFS / DFS on mazes")
+    print(f"{'grid':>6} {'planner':>8} {'expanded':>10} {'time (s)':>9} {'us/node':>8}")
+    for grid_size in grid_sizes:
+        graph = make_maze(grid_size, seed)
+        for planner, search in (("BFS", graph.bfs), ("DFS", graph.dfs)):
+            start_time = time.perf_counter()
+            total_explored = search()[3]
+            elapsed = time.perf_counter() - start_time
+            print(f"{grid_size:>6} {planner:>8} {total_explored:>10} {elapsed:>9.3f} "
+                  f"{elapsed / total_explored * 1e6:>8.2f}")
+
+
+def bench_frontier_log(grid_sizes=(100, 300, 1000), num_replay=100, obstacle_ratio=0.2, seed=0):
+    """
+    Chi phí ghi frontier_log của A* và BFS: thời gian khi tắt / bật record_frontier, số ô lưu dạng delta
+    (FrontierLog) so với tổng số ô nếu lưu snapshot đầy đủ mỗi bước, và thời gian dựng lại num_replay
+    snapshot cách đều nhau (phát lại tuần tự như draw_map).
+    """
+    print("Frontier recording")
+    print(f"{'grid':>6} {'planner':>8} {'off (s)':>8} {'on (s)':>8} {'delta cells':>12} {'snapshot cells':>15} "
+          f"{'KiB':>8} {'replay (s)':>11}")
+    for grid_size in grid_sizes:
+        graph = make_random_graph(grid_size, obstacle_ratio, seed)
+        for planner, search in (("A*", graph.a_star), ("BFS", graph.bfs)):
+            start_time = time.perf_counter()
+            search()
+            off_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            frontier_log = search(record_frontier=True)[2]
+            on_time = time.perf_counter() - start_time
+            added = np.diff(np.asarray(frontier_log.added_end), prepend=0)
+            removed = np.diff(np.asarray(frontier_log.removed_end), prepend=0)
+            snapshot_cells = int(np.cumsum(added - removed).sum())
+            start_time = time.perf_counter()
+            for step in np.linspace(0, len(frontier_log) - 1, num_replay).astype(int).tolist():
+                frontier_log[step]
+            replay_time = time.perf_counter() - start_time
+            print(f"{grid_size:>6} {planner:>8} {off_time:>8.3f} {on_time:>8.3f} "
+                  f"{len(frontier_log.added) + len(frontier_log.removed):>12} {snapshot_cells:>15} "
+                  f"{frontier_log.nbytes / 1024:>8.0f} {replay_time:>11.3f}")
+
+
+def bench_graph_build(grid_sizes=(500, 1000, 2000, 4000), obstacle_ratio=0.2, seed=0):
+    """Đo thời gian dựng Graph (occupancy + cost + mask bước đi) và bộ nhớ các mảng theo kích thước grid."""
+    print("Graph construction vs grid size")
+    print(f"{'grid':>8} {'cells':>12} {'time (s)':>10} {'MB':>8}")
+    for grid_size in grid_sizes:
+        start_time = time.perf_counter()
+        graph = make_random_graph(grid_size, obstacle_ratio, seed)
+        elapsed = time.perf_counter() - start_time
+        nbytes = graph.occupancy.nbytes + graph.cost.nbytes + graph.moves.nbytes + graph.adjacent.nbytes
+        print(f"{grid_size:>8} {grid_size * grid_size:>12} {elapsed:>10.4f} {nbytes / 2**20:>8.1f}")
+
+
+def bench_repeated_queries(grid_size=200, num_queries=1000, obstacle_ratio=0.2, seed=0):
+    """Đo số truy vấn A*/giây với nhiều cặp start/goal ngẫu nhiên trên cùng một Graph (không dựng lại)."""
+    graph = make_random_graph(grid_size, obstacle_ratio, seed)
+    rng = np.random.default_rng(seed)
+    free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+    pairs = rng.choice(free, size=(num_queries, 2))
+    found = 0
+    start_time = time.perf_counter()
+    for start, goal in pairs.tolist():
+        graph.set_start(*divmod(start, grid_size))
+        graph.set_goal(*divmod(goal, grid_size))
+        found += bool(graph.a_star()[0])
+    elapsed = time.perf_counter() - start_time
+    print(f"Repeated A* on one {grid_size}x{grid_size} graph: {num_queries} queries, {found} found, "
+          f"{elapsed:.3f} s, {num_queries / elapsed:.0f} queries/s")
+
+
+def bench_batch_paths(grid_size=200, num_starts=20, num_goals=10, obstacle_ratio=0.2, seed=0, processes=4):
+    """So sánh Graph.batch_paths (một cây Dijkstra/goal, có/không Pool) với một A* cho mỗi cặp start-goal."""
+    graph = make_random_graph(grid_size, obstacle_ratio, seed)
+    rng = np.random.default_rng(seed)
+    free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+    cells = [divmod(index, grid_size) for index in rng.choice(free, size=num_starts + num_goals, replace=False).tolist()]
+    starts, goals = cells[:num_starts], cells[num_starts:]
+    print(f"Batch {num_starts}x{num_goals} paths on {grid_size}x{grid_size}")
+
+    start_time = time.perf_counter()
+    for start in starts:
+        for goal in goals:
+            graph.set_start(*start)
+            graph.set_goal(*goal)
+            graph.a_star()
+    print(f"  A* per pair:             {time.perf_counter() - start_time:.3f} s")
+
+    start_time = time.perf_counter()
+    costs = graph.batch_paths(starts, goals)
+    print(f"  batch_paths:             {time.perf_counter() - start_time:.3f} s "
+          f"({np.isfinite(costs).sum()} reachable pairs)")
+
+    start_time = time.perf_counter()
+    graph.batch_paths(starts, goals, return_paths=True, processes=processes)
+    print(f"  batch_paths ({processes} procs, paths): {time.perf_counter() - start_time:.3f} s")
+
+
+def bench_distance_cache(grid_size=300, num_goals=4, queries_per_goal=25, obstacle_ratio=0.2, seed=0):
+    """So sánh A* heuristic Manhattan với A* dùng distance field đã cache cho một tập goal cố định."""
+    graph = make_random_graph(grid_size, obstacle_ratio, seed)
+    rng = np.random.default_rng(seed)
+    free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+    goals = [divmod(index, grid_size) for index in rng.choice(free, size=num_goals, replace=False).tolist()]
+    starts = [divmod(index, grid_size) for index in rng.choice(free, size=queries_per_goal).tolist()]
+    cache = DistanceFieldCache(max_entries=num_goals)
+    start_time = time.perf_counter()
+    cache.precompute(graph, goals)
+    print(f"Distance fields for {num_goals} goals on {grid_size}x{grid_size}: {time.perf_counter() - start_time:.3f} s")
+    for label, distance_cache in (("Manhattan", None), ("cached field", cache)):
+        graph.distance_cache = distance_cache
+        expanded = 0
+        start_time = time.perf_counter()
+        for goal in goals:
+            graph.set_goal(*goal)
+            for start in starts:
+                graph.set_start(*start)
+                expanded += graph.a_star()[3]
+        elapsed = time.perf_counter() - start_time
+        print(f"  A* {label:<13} {elapsed:.3f} s, {expanded} nodes expanded")
+    graph.distance_cache = None
+
+
+def bench_aco(map_files=None, grid_size=25, num_ants=100, num_iterations=200, evaporation_rate=0.4,
+              alpha=1, beta=3, seed=0):
+    """Đo thời gian GraphACO.aco (cấu hình như aco_bm.main) trên các map trong thư mục map."""
+    from aco_bm import GraphACO
+    print(f"ACO {num_ants} ants x {num_iterations} iterations")
+    print(f"{'map':<22} {'best cost':>10} {'conv':>6} {'time (s)':>10}")
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        graph = GraphACO(grid_size, json_file=map_file)
+        free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+        graph.set_start(*divmod(int(free[0]), grid_size))
+        graph.set_goal(*divmod(int(free[-1]), grid_size))
+        start_time = time.perf_counter()
+        best_path, best_cost, all_paths, conv = graph.aco(num_ants=num_ants, num_iterations=num_iterations,
+                                                          evaporation_rate=evaporation_rate, alpha=alpha,
+                                                          beta=beta, seed=seed)
+        elapsed = time.perf_counter() - start_time
+        print(f"{map_file:<22} {best_cost:>10.2f} {conv:>6} {elapsed:>10.3f}")
+
+
+def bench_pheromone_evaporation(grid_size=1000, dict_grid_size=300, evaporation_rate=0.1, repeats=10):
+    """Thời gian một lần bay hơi pheromone: mảng GraphACO.pheromone so với dict theo _edge_key (kiểu cũ)."""
+    from aco_bm import GraphACO
+    graph = GraphACO(grid_size)
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        graph.pheromone *= (1 - evaporation_rate)
+    elapsed = (time.perf_counter() - start_time) / repeats
+    print(f"Evaporation on {grid_size}x{grid_size} ({len(graph.pheromones)} edges): array {elapsed * 1000:.2f} ms")
+    pheromones = dict.fromkeys(GraphACO(dict_grid_size).pheromones, 0.1)
+    start_time = time.perf_counter()
+    for key in pheromones:
+        pheromones[key] *= (1 - evaporation_rate)
+    elapsed = time.perf_counter() - start_time
+    print(f"Evaporation on {dict_grid_size}x{dict_grid_size} ({len(pheromones)} edges): dict {elapsed * 1000:.2f} ms")
+
+
+def bench_aco_variants(map_files=None, grid_size=25, num_ants=100, num_iterations=200, evaporation_rate=0.4,
+                       alpha=1, beta=3, seed=0):
+    """So sánh các variant của GraphACO.aco (AS, rank, MMAS, ACS): best cost, iteration tìm ra best và thời gian."""
+    from aco_bm import GraphACO, ACO_VARIANTS
+    print(f"ACO variants, {num_ants} ants x {num_iterations} iterations")
+    print(f"{'map':<22} {'variant':>8} {'A* cost':>8} {'best cost':>10} {'best iter':>10} {'time (s)':>10}")
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        graph = GraphACO(grid_size, json_file=map_file)
+        free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+        graph.set_start(*divmod(int(free[0]), grid_size))
+        graph.set_goal(*divmod(int(free[-1]), grid_size))
+        optimal = graph.a_star()[4]
+        for variant in ACO_VARIANTS:
+            start_time = time.perf_counter()
+            best_path, best_cost, all_paths, conv = graph.aco(num_ants=num_ants, num_iterations=num_iterations,
+                                                              evaporation_rate=evaporation_rate, alpha=alpha,
+                                                              beta=beta, seed=seed, keep_paths=False, variant=variant)
+            elapsed = time.perf_counter() - start_time
+            print(f"{map_file:<22} {variant:>8} {optimal:>8.2f} {best_cost:>10.2f} "
+                  f"{str(graph.run_stats['best_iteration']):>10} {elapsed:>10.3f}")
+
+
+def bench_aco_construction(map_files=None, grid_size=25, num_ants=100, num_iterations=100, seed=0):
+    """So sánh cách dựng đường của kiến: không/có loại vùng cụt, có backtrack (tỉ lệ kiến tới goal, số bước/kiến)."""
+    from aco_bm import GraphACO
+    options = {"plain": dict(prune_dead_ends=False), "pruned": dict(), "backtrack": dict(backtrack=True)}
+    print(f"ACO construction, {num_ants} ants x {num_iterations} iterations")
+    print(f"{'map':<22} {'mode':>10} {'best cost':>10} {'success':>8} {'steps/ant':>10} {'time (s)':>10}")
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        graph = GraphACO(grid_size, json_file=map_file)
+        free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+        graph.set_start(*divmod(int(free[0]), grid_size))
+        graph.set_goal(*divmod(int(free[-1]), grid_size))
+        for mode, kwargs in options.items():
+            start_time = time.perf_counter()
+            best_path, best_cost, all_paths, conv = graph.aco(num_ants=num_ants, num_iterations=num_iterations,
+                                                              evaporation_rate=0.4, alpha=1, beta=3, seed=seed,
+                                                              keep_paths=False, **kwargs)
+            elapsed = time.perf_counter() - start_time
+            stats = graph.run_stats
+            print(f"{map_file:<22} {mode:>10} {best_cost:>10.2f} {stats['success_ratio']:>8.3f} "
+                  f"{stats['steps_per_ant']:>10.1f} {elapsed:>10.3f}")
+
+
+def bench_smoothing(map_files=None, grid_size=25, seed=0):
+    """
+    Làm mượt (Graph.smooth_paths, một batch cho cả ba path) đường đi của A*, ACO, RRT trên mỗi map:
+    số waypoint, độ dài Euclid, tổng góc chuyển hướng trước -> sau; so với Theta* (any-angle).
+    """
+    import random
+    from aco_bm import GraphACO
+    from rrt_bm import GraphRRT
+    print("Path smoothing (waypoints, length, deviation: before -> after)")
+    print(f"{'map':<22} {'planner':>8} {'waypoints':>10} {'length':>16} {'deviation':>14}")
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        graph = GraphACO(grid_size, json_file=map_file)
+        rrt_graph = GraphRRT(grid_size, json_file=map_file)
+        free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+        for g in (graph, rrt_graph):
+            g.set_start(*divmod(int(free[0]), grid_size))
+            g.set_goal(*divmod(int(free[-1]), grid_size))
+        random.seed(seed)
+        paths = {
+            "A*": graph.a_star()[0],
+            "ACO": graph.aco(num_ants=100, num_iterations=100, evaporation_rate=0.4, beta=3, seed=seed,
+                             keep_paths=False)[0],
+            "RRT": rrt_graph.rrt(max_iterations=5000)[0],
+        }
+        paths = {planner: path for planner, path in paths.items() if path}
+        start_time = time.perf_counter()
+        smoothed = graph.smooth_paths(list(paths.values()))
+        elapsed = time.perf_counter() - start_time
+        for (planner, path), after in zip(paths.items(), smoothed):
+            report = smoothing_report(path, after)
+            (w0, w1), (l0, l1), (d0, d1) = report["waypoints"], report["length"], report["deviation"]
+            print(f"{map_file:<22} {planner:>8} {w0:>4} -> {w1:<4} {l0:>7.2f} -> {l1:<7.2f} {d0:>5.2f} -> {d1:<5.2f}")
+        start_time = time.perf_counter()
+        path, _, _, _, cost, _ = graph.theta_star()
+        theta_time = time.perf_counter() - start_time
+        print(f"{map_file:<22} {'Theta*':>8} {len(path):>12} {cost:>16.2f}   "
+              f"(smooth {elapsed * 1000:.1f} ms, Theta* {theta_time * 1000:.1f} ms)")
+
+
+def bench_jps(map_files=None, grid_size=25, maze_size=1000, open_size=1000, seed=0):
+    """
+    So sánh Graph.jps với Graph.a_star: số node mở rộng, thời gian, chi phí trên các map, mê cung lớn,
+    mê cung có vòng và grid ngẫu nhiên.
+    """
+    print("JPS vs A*")
+    print(f"{'map':<28} {'planner':>7} {'cost':>10} {'expanded':>10} {'time (s)':>10}")
+    cases = []
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        graph = Graph(grid_size, json_file=map_file)
+        free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+        graph.set_start(*divmod(int(free[0]), grid_size))
+        graph.set_goal(*divmod(int(free[-1]), grid_size))
+        cases.append((map_file, graph))
+    cases.append((f"maze {maze_size}", make_maze(maze_size, seed)))
+    cases.append((f"maze {open_size} (10% loops)", make_maze(open_size, seed, loop_ratio=0.1)))
+    cases.append((f"random {open_size}", make_random_graph(open_size, 0.2, seed)))
+    for name, graph in cases:
+        for planner, search in (("A*", graph.a_star), ("JPS", graph.jps)):
+            start_time = time.perf_counter()
+            path, log, frontier_log, total_explored, final_cost, iterations = search()
+            elapsed = time.perf_counter() - start_time
+            print(f"{name:<28} {planner:>7} {final_cost:>10.2f} {total_explored:>10} {elapsed:>10.3f}")
+
+
+def bench_bidirectional(map_files=None, grid_size=25, maze_size=1000, open_size=500, seed=0):
+    """
+    Số node mở rộng và thời gian của BFS/A* hai chiều so với một chiều trên các map có sẵn, mê cung
+    (hành lang dài) và grid ngẫu nhiên.
+    """
+    print("Bidirectional vs unidirectional search")
+    print(f"{'map':<22} {'planner':>10} {'cost':>8} {'expanded':>9} {'time (s)':>9}")
+    cases = []
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        graph = Graph(grid_size, json_file=map_file)
+        free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+        graph.set_start(*divmod(int(free[0]), grid_size))
+        graph.set_goal(*divmod(int(free[-1]), grid_size))
+        cases.append((map_file, graph))
+    cases.append((f"maze {maze_size}", make_maze(maze_size, seed)))
+    cases.append((f"random {open_size}", make_random_graph(open_size, 0.2, seed)))
+    for name, graph in cases:
+        for planner, search in (("BFS", graph.bfs), ("bi-BFS", graph.bidirectional_bfs),
+                                ("A*", graph.a_star), ("bi-A*", graph.bidirectional_a_star)):
+            start_time = time.perf_counter()
+            path, log, frontier_log, total_explored, final_cost = search()[:5]
+            elapsed = time.perf_counter() - start_time
+            print(f"{name:<22} {planner:>10} {final_cost:>8.2f} {total_explored:>9} {elapsed:>9.3f}")
+
+
+def bench_hpa(grid_sizes=(500, 1000, 2000), cluster_size=50, num_queries=10, a_star_max_size=1000,
+              obstacle_ratio=0.2, seed=0, processes=4):
+    """
+    GraphHPA: thời gian dựng abstraction (lần đầu và đọc lại từ cache đĩa) và thời gian/chi phí trung bình
+    mỗi truy vấn so với A* (A* chỉ chạy tới a_star_max_size) trên grid ngẫu nhiên.
+    """
+    import tempfile
+    from hpa_bm import GraphHPA
+    cache_dir = tempfile.mkdtemp()
+    print(f"HPA* (cluster {cluster_size}, {num_queries} random queries)")
+    print(f"{'grid':>6} {'nodes':>8} {'build (s)':>10} {'cached (s)':>11} {'HPA* (ms)':>10} {'A* (ms)':>9} "
+          f"{'cost ratio':>11}")
+    for grid_size in grid_sizes:
+        occupancy = make_random_graph(grid_size, obstacle_ratio, seed).occupancy
+        graph = GraphHPA(grid_size, cluster_size=cluster_size, cache_dir=cache_dir)
+        graph.load_occupancy(occupancy)
+        start_time = time.perf_counter()
+        graph.build_abstraction(processes=processes)
+        build_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        abstraction = graph.build_abstraction()
+        cached_time = time.perf_counter() - start_time
+        rng = np.random.default_rng(seed)
+        free = np.flatnonzero(occupancy.reshape(-1) == 0)
+        hpa_time = a_star_time = 0.0
+        ratios = []
+        for start, goal in rng.choice(free, size=(num_queries, 2)).tolist():
+            graph.set_start(*divmod(start, grid_size))
+            graph.set_goal(*divmod(goal, grid_size))
+            start_time = time.perf_counter()
+            hpa_cost = graph.hpa_star()[4]
+            hpa_time += time.perf_counter() - start_time
+            if grid_size <= a_star_max_size:
+                start_time = time.perf_counter()
+                a_star_cost = graph.a_star()[4]
+                a_star_time += time.perf_counter() - start_time
+                if a_star_cost:
+                    ratios.append(hpa_cost / a_star_cost)
+        a_star_ms = f"{a_star_time / num_queries * 1000:>9.1f}" if grid_size <= a_star_max_size else f"{'-':>9}"
+        ratio = f"{np.mean(ratios):>11.3f}" if ratios else f"{'-':>11}"
+        print(f"{grid_size:>6} {len(abstraction['nodes']):>8} {build_time:>10.2f} {cached_time:>11.2f} "
+              f"{hpa_time / num_queries * 1000:>10.1f} {a_star_ms} {ratio}")
+
+
+def bench_replan(map_files=None, grid_size=25, scale=8, change_sizes=(1, 5, 20), trials=10, seed=0):
+    """
+    GraphDStar: thời gian replan tăng dần (D* Lite giữ trạng thái) so với tìm lại từ đầu (D* Lite reset
+    và A*) khi chặn change_size ô trên đường đi hiện tại. Map có sẵn được phóng to scale lần (mỗi ô
+    thành khối scale x scale). Sau mỗi lần đo các ô được mở lại để map trở về ban đầu.
+    """
+    from dstar_bm import GraphDStar
+    rng = np.random.default_rng(seed)
+    size = grid_size * scale
+    print(f"D* Lite replan ({size}x{size}, {trials} trials)")
+    print(f"{'map':<22} {'changes':>8} {'replan (ms)':>12} {'expanded':>9} {'full (ms)':>10} {'expanded':>9} "
+          f"{'A* (ms)':>8}")
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        occupancy = np.kron(Graph(grid_size, json_file=map_file).occupancy, np.ones((scale, scale), dtype=np.uint8))
+        graphs = []
+        for _ in range(2):
+            graph = GraphDStar(size)
+            graph.load_occupancy(occupancy)
+            free = np.flatnonzero(occupancy.reshape(-1) == 0)
+            graph.set_start(*divmod(int(free[0]), size))
+            graph.set_goal(*divmod(int(free[-1]), size))
+            graphs.append(graph)
+        incremental, full = graphs
+        path = incremental.d_star_lite()[0]
+        for change_size in change_sizes:
+            replan_time = full_time = a_star_time = 0.0
+            replan_expanded = full_expanded = 0
+            for _ in range(trials):
+                if len(path) < change_size + 2:
+                    break
+                cells = np.array(path[1:-1])[rng.choice(len(path) - 2, change_size, replace=False)]
+                for graph in graphs:
+                    graph.set_obstacle(cells[:, 0], cells[:, 1], True)
+                start_time = time.perf_counter()
+                replan_expanded += incremental.d_star_lite()[3]
+                replan_time += time.perf_counter() - start_time
+                full.reset_dstar()
+                start_time = time.perf_counter()
+                full_expanded += full.d_star_lite()[3]
+                full_time += time.perf_counter() - start_time
+                start_time = time.perf_counter()
+                full.a_star()
+                a_star_time += time.perf_counter() - start_time
+                for graph in graphs:
+                    graph.set_obstacle(cells[:, 0], cells[:, 1], False)
+                path = incremental.d_star_lite()[0]
+            else:
+                print(f"{map_file:<22} {change_size:>8} {replan_time / trials * 1000:>12.2f} "
+                      f"{replan_expanded // trials:>9} {full_time / trials * 1000:>10.2f} "
+                      f"{full_expanded // trials:>9} {a_star_time / trials * 1000:>8.2f}")
+
+
+def bench_rrt(grid_size=1000, num_iterations=100000, tree_sizes=(1000, 10000, 100000), num_queries=2000,
+              obstacle_ratio=0.02, seed=0):
+    """
+    GraphRRT.rrt num_iterations vòng trên grid lớn (start ở giữa, goal ở góc), rồi so sánh cách tìm nút
+    gần nhất trên các nút của cây vừa dựng: NearestTree (cKDTree + quét phần mới), quét numpy toàn bộ
+    (khi không có scipy) và min() Python trên list như bản cũ.
+    """
+    import random
+    from rrt_bm import GraphRRT, NearestTree
+    graph = GraphRRT(grid_size)
+    graph.load_occupancy(make_random_graph(grid_size, obstacle_ratio, seed).occupancy)
+    graph.occupancy[grid_size // 2, grid_size // 2] = 0
+    graph.load_occupancy(graph.occupancy)
+    graph.set_start(grid_size // 2, grid_size // 2)
+    graph.set_goal(grid_size - 1, grid_size - 1)
+    random.seed(seed)
+    start_time = time.perf_counter()
+    path, log, frontier_log, total_explored, final_cost, iterations = graph.rrt(max_iterations=num_iterations)
+    elapsed = time.perf_counter() - start_time
+    print(f"RRT {grid_size}x{grid_size}: {iterations} iterations, {total_explored} nodes, {elapsed:.2f} s "
+          f"({elapsed / iterations * 1e6:.1f} us/iteration)")
+
+    rng = np.random.default_rng(seed)
+    queries = rng.integers(0, grid_size, size=(num_queries, 2)).tolist()
+    print(f"{'nodes':>8} {'kd (us)':>9} {'numpy (us)':>11} {'python (us)':>12}")
+    for tree_size in tree_sizes:
+        points = log[:tree_size]
+        timings = []
+        for use_kdtree in (True, False):
+            nearest_tree = NearestTree()
+            if not use_kdtree:
+                nearest_tree._kdtree_class = None
+            for x, y in points:
+                nearest_tree.add(x, y)
+            start_time = time.perf_counter()
+            for x, y in queries:
+                nearest_tree.nearest(x, y)
+            timings.append((time.perf_counter() - start_time) / num_queries * 1e6)
+        start_time = time.perf_counter()
+        for x, y in queries[:max(1, num_queries // 20)]:
+            min(points, key=lambda p: math.sqrt((p[0] - x) ** 2 + (p[1] - y) ** 2))
+        timings.append((time.perf_counter() - start_time) / max(1, num_queries // 20) * 1e6)
+        print(f"{len(points):>8} {timings[0]:>9.1f} {timings[1]:>11.1f} {timings[2]:>12.1f}")
+
+
+def bench_rrt_variants(map_files=None, grid_size=25, num_seeds=20, max_iterations=5000, goal_bias=0.1,
+                       step_size=3):
+    """
+    GraphRRT trên các map có sẵn qua num_seeds seed: tỉ lệ thành công, số iteration tới lời giải đầu tiên,
+    số node và chi phí của RRT thường, RRT có goal bias, RRT-Connect, và informed RRT (chạy hết
+    max_iterations sau lời giải đầu, in chi phí đầu tiên -> cuối cùng); thêm RRT, informed RRT và
+    RRT-Connect với bước dài step_size để kiểm tra bước nhiều ô vẫn tìm được đường qua các hành lang hẹp
+    (và hai cây của RRT-Connect vẫn nối được với nhau).
+    """
+    import random
+    from rrt_bm import GraphRRT
+    variants = (("RRT", {}), (f"RRT bias {goal_bias}", {"goal_bias": goal_bias}),
+                ("RRT-Connect", {"connect": True}),
+                (f"Connect bias {goal_bias}", {"connect": True, "goal_bias": goal_bias}),
+                ("Informed", {"goal_bias": goal_bias, "informed": True}),
+                (f"RRT step {step_size}", {"step_size": step_size}),
+                (f"Informed step {step_size}", {"goal_bias": goal_bias, "informed": True, "step_size": step_size}),
+                (f"Connect step {step_size}", {"connect": True, "step_size": step_size}))
+    print(f"RRT variants ({num_seeds} seeds, max {max_iterations} iterations)")
+    print(f"{'map':<22} {'variant':>18} {'success':>8} {'iter':>8} {'nodes':>8} {'cost':>16}")
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        graph = GraphRRT(grid_size, json_file=map_file)
+        free = np.flatnonzero(graph.occupancy.reshape(-1) == 0)
+        graph.set_start(*divmod(int(free[0]), grid_size))
+        graph.set_goal(*divmod(int(free[-1]), grid_size))
+        for name, kwargs in variants:
+            first_iterations, nodes, first_costs, costs = [], [], [], []
+            for seed in range(num_seeds):
+                random.seed(seed)
+                path, log, frontier_log, total_explored, final_cost, iterations = graph.rrt(
+                    max_iterations=max_iterations, **kwargs)
+                if path:
+                    first_iterations.append(graph.run_stats["first_solution"])
+                    first_costs.append(graph.run_stats["first_cost"])
+                    nodes.append(total_explored)
+                    costs.append(final_cost)
+            if not costs:
+                print(f"{map_file:<22} {name:>18} {0:>8.0%} {'-':>8} {'-':>8} {'-':>16}")
+                continue
+            cost = f"{np.mean(costs):.2f}"
+            if kwargs.get("informed"):
+                cost = f"{np.mean(first_costs):.2f} -> {cost}"
+            print(f"{map_file:<22} {name:>18} {len(costs) / num_seeds:>8.0%} {np.mean(first_iterations):>8.0f} "
+                  f"{np.mean(nodes):>8.0f} {cost:>16}")
+
+
+def bench_collision_checks(grid_size=1000, lengths=(1, 5, 20, 100), num_segments=20000, obstacle_ratio=0.02,
+                           seed=0):
+    """
+    Số lần kiểm tra va chạm đoạn thẳng mỗi giây theo độ dài đoạn: Graph.line_of_sight (một đoạn mỗi lần,
+    dừng ở ô vật cản đầu tiên, dùng trong GraphRRT._steer) và Graph.line_of_sight_batch (mọi đoạn một lần).
+    """
+    graph = make_random_graph(grid_size, obstacle_ratio, seed)
+    rng = np.random.default_rng(seed)
+    print(f"Segment collision checks ({grid_size}x{grid_size}, {obstacle_ratio:.0%} obstacles)")
+    print(f"{'length':>7} {'blocked':>8} {'scalar (checks/s)':>18} {'batch (checks/s)':>17}")
+    for length in lengths:
+        a = rng.integers(0, grid_size, size=(num_segments, 2))
+        angle = rng.random(num_segments) * 2 * np.pi
+        offset = np.round(length * np.stack([np.cos(angle), np.sin(angle)], axis=1)).astype(np.int64)
+        b = np.clip(a + offset, 0, grid_size - 1)
+        segments = list(zip(map(tuple, a.tolist()), map(tuple, b.tolist())))
+        start_time = time.perf_counter()
+        visible = [graph.line_of_sight(p, q) for p, q in segments]
+        scalar_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        graph.line_of_sight_batch(a, b)
+        batch_time = time.perf_counter() - start_time
+        print(f"{length:>7} {1 - np.mean(visible):>8.1%} {num_segments / scalar_time:>18,.0f} "
+              f"{num_segments / batch_time:>17,.0f}")
+
+
+def bench_rrt_step_size(grid_size=500, step_sizes=(1, 3, 10, 30), num_seeds=5, max_iterations=20000,
+                        goal_bias=0.05, obstacle_ratio=0.02, seed=0):
+    """
+    GraphRRT trên grid lớn gần trống với các step_size: tỉ lệ thành công, số iteration, số node, chi phí
+    và thời gian tới lời giải đầu tiên.
+    """
+    import random
+    from rrt_bm import GraphRRT
+    graph = GraphRRT(grid_size)
+    graph.load_occupancy(make_random_graph(grid_size, obstacle_ratio, seed).occupancy)
+    graph.set_start(0, 0)
+    graph.set_goal(grid_size - 1, grid_size - 1)
+    print(f"RRT step size ({grid_size}x{grid_size}, {num_seeds} seeds, goal bias {goal_bias})")
+    print(f"{'step':>5} {'success':>8} {'iter':>8} {'nodes':>8} {'cost':>9} {'time (s)':>9}")
+    for step_size in step_sizes:
+        results = []
+        for run in range(num_seeds):
+            random.seed(run)
+            start_time = time.perf_counter()
+            path, log, frontier_log, total_explored, final_cost, iterations = graph.rrt(
+                max_iterations=max_iterations, step_size=step_size, goal_bias=goal_bias)
+            if path:
+                results.append((iterations, total_explored, final_cost, time.perf_counter() - start_time))
+        if not results:
+            print(f"{step_size:>5} {0:>8.0%}")
+            continue
+        iterations, nodes, costs, times = np.mean(results, axis=0)
+        print(f"{step_size:>5} {len(results) / num_seeds:>8.0%} {iterations:>8.0f} {nodes:>8.0f} {costs:>9.1f} "
+              f"{times:>9.3f}")
+
+
+def bench_rrt_star(space_size=1000, checkpoints=(10000, 30000, 100000), step_size=5.0, radius=10.0, seed=0):
+    """
+    RRTStar (lab_rrt.py) chạy tới các mốc số iteration trên không gian [0, space_size]^2: số nút, thời gian
+    mỗi iteration của đoạn vừa chạy và chi phí tới goal.
+    """
+    from lab_rrt import RRTStar
+    np.random.seed(seed)
+    rrt_star = RRTStar((0.01 * space_size, 0.01 * space_size), (0.99 * space_size, 0.99 * space_size),
+                       [0, space_size, 0, space_size], step_size=step_size, radius=radius)
+    print(f"RRT* ({space_size}x{space_size}, step {step_size}, radius {radius})")
+    print(f"{'iter':>8} {'nodes':>8} {'total (s)':>10} {'us/iter':>8} {'goal cost':>10}")
+    done, total_time = 0, 0.0
+    for checkpoint in checkpoints:
+        rrt_star.n_iter = checkpoint - done
+        start_time = time.perf_counter()
+        rrt_star.run(animate=False, stop_at_goal=False)
+        elapsed = time.perf_counter() - start_time
+        total_time += elapsed
+        goal_cost = rrt_star.cost[rrt_star.goal_index] if rrt_star.goal_index >= 0 else float('inf')
+        print(f"{checkpoint:>8} {len(rrt_star.nodes):>8} {total_time:>10.2f} "
+              f"{elapsed / (checkpoint - done) * 1e6:>8.1f} {goal_cost:>10.1f}")
+        done = checkpoint
+
+
+def bench_rrt_star_radius(space_size=100, checkpoints=(10000, 30000, 100000), step_size=2.0, radius=10.0, seed=0):
+    """
+    RRTStar với bán kính lân cận cố định (gamma=0) và co dần gamma * (log n / n)^(1/2): thời gian mỗi
+    iteration, bán kính hiện tại, chi phí tới goal và sai lệch lớn nhất giữa cost của một nút và
+    cost của cha cộng độ dài cạnh (0 khi chi phí được cập nhật đúng sau rewire).
+    """
+    from lab_rrt import RRTStar
+    print(f"RRT* radius schedule ({space_size}x{space_size}, step {step_size}, max radius {radius})")
+    print(f"{'radius':<8} {'iter':>8} {'nodes':>8} {'us/iter':>8} {'r':>6} {'goal cost':>10} {'cost error':>11}")
+    for name, gamma in (("fixed", 0), ("shrink", None)):
+        np.random.seed(seed)
+        rrt_star = RRTStar((0.1 * space_size, 0.1 * space_size), (0.9 * space_size, 0.9 * space_size),
+                           [0, space_size, 0, space_size], step_size=step_size, radius=radius, gamma=gamma)
+        done = 0
+        for checkpoint in checkpoints:
+            rrt_star.n_iter = checkpoint - done
+            start_time = time.perf_counter()
+            rrt_star.run(animate=False, stop_at_goal=False)
+            elapsed = time.perf_counter() - start_time
+            nodes, parent, cost = rrt_star.nodes, rrt_star.parent, rrt_star.cost
+            edges = np.hypot(*(nodes[1:] - nodes[parent[1:]]).T)
+            error = np.abs(cost[1:] - cost[parent[1:]] - edges).max()
+            goal_cost = cost[rrt_star.goal_index] if rrt_star.goal_index >= 0 else float('inf')
+            print(f"{name:<8} {checkpoint:>8} {len(nodes):>8} {elapsed / (checkpoint - done) * 1e6:>8.1f} "
+                  f"{rrt_star.near_radius():>6.2f} {goal_cost:>10.2f} {error:>11.1e}")
+            done = checkpoint
+
+
+def bench_obstacle_checks(space_size=1000, num_shapes=2000, num_segments=2000, batch_size=30, segment_length=10.0,
+                          seed=0):
+    """
+    ObstacleMap (lab_rrt.py) với num_shapes hình tròn / đa giác ngẫu nhiên: thời gian mỗi đoạn khi kiểm tra
+    từng đoạn (segment_free) và theo lô batch_size đoạn chung một đầu mút như bước chọn cha / rewire
+    (segments_free), có lưới băm và khi mọi vật cản nằm chung một ô (không có chỉ mục).
+    """
+    from lab_rrt import ObstacleMap
+    rng = np.random.default_rng(seed)
+    circles = np.column_stack([rng.uniform(0, space_size, (num_shapes // 2, 2)),
+                               rng.uniform(2, 8, num_shapes // 2)])
+    polygons = []
+    for _ in range(num_shapes - num_shapes // 2):
+        center, k = rng.uniform(0, space_size, 2), rng.integers(3, 7)
+        angles, radii = np.sort(rng.uniform(0, 2 * np.pi, k)), rng.uniform(2, 8, k)
+        polygons.append(np.column_stack([center[0] + radii * np.cos(angles), center[1] + radii * np.sin(angles)]))
+    ends = rng.uniform(0, space_size, (num_segments, 2))
+    starts = ends + rng.uniform(-segment_length, segment_length, (num_segments, 2))
+    print(f"Obstacle checks ({num_shapes} shapes in {space_size}x{space_size}, segment length <= {segment_length})")
+    print(f"{'index':<8} {'single (us/seg)':>16} {'batch (us/seg)':>15} {'free':>6}")
+    for name, index_cell_size in (("grid", None), ("none", 10 * space_size)):
+        obstacles = ObstacleMap(None, circles=circles, polygons=polygons, index_cell_size=index_cell_size)
+        start_time = time.perf_counter()
+        free = [obstacles.segment_free(a, b) for a, b in zip(starts.tolist(), ends.tolist())]
+        single_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for i in range(0, num_segments, batch_size):
+            obstacles.segments_free(starts[i:i + batch_size] - ends[i:i + batch_size] + ends[i], ends[i])
+        batch_time = time.perf_counter() - start_time
+        print(f"{name:<8} {single_time / num_segments * 1e6:>16.1f} {batch_time / num_segments * 1e6:>15.1f} "
+              f"{np.mean(free):>6.0%}")
+
+
+def bench_rrt_star_maps(map_files=None, grid_size=25, cell_size=4.0, n_iter=5000, num_seeds=5):
+    """
+    RRTStar trên các map có sẵn (mỗi ô rộng cell_size) qua num_seeds seed: tỉ lệ tìm được đường, chi phí
+    và thời gian tới lời giải đầu tiên.
+    """
+    from lab_rrt import ObstacleMap, RRTStar
+    print(f"RRT* on maps ({num_seeds} seeds, max {n_iter} iterations, cell size {cell_size})")
+    print(f"{'map':<22} {'success':>8} {'cost':>8} {'time (s)':>9}")
+    for map_file in map_files or sorted(glob.glob("map/*.json")):
+        obstacles = ObstacleMap.from_json(map_file, cell_size)
+        free = np.flatnonzero(obstacles.occupancy[:grid_size, :grid_size].reshape(-1) == 0)
+        start = (np.array(divmod(int(free[0]), grid_size)) + 0.5) * cell_size
+        goal = (np.array(divmod(int(free[-1]), grid_size)) + 0.5) * cell_size
+        costs, times = [], []
+        for seed in range(num_seeds):
+            np.random.seed(seed)
+            rrt_star = RRTStar(tuple(start), tuple(goal), [0, grid_size * cell_size, 0, grid_size * cell_size],
+                               n_iter=n_iter, step_size=cell_size / 2, radius=2.5 * cell_size, obstacles=obstacles)
+            start_time = time.perf_counter()
+            path = rrt_star.run(animate=False)
+            if path is not None:
+                times.append(time.perf_counter() - start_time)
+                costs.append(rrt_star.cost[rrt_star.goal_index])
+        if not costs:
+            print(f"{map_file:<22} {0:>8.0%}")
+            continue
+        print(f"{map_file:<22} {len(costs) / num_seeds:>8.0%} {np.mean(costs):>8.1f} {np.mean(times):>9.3f}")
+
+
+def bench_aco_colonies(colony_counts=(1, 2, 4, 8), map_file="map/aStar.json", grid_size=25, num_ants=50,
+                       num_iterations=50, migration_interval=10, seed=0):
+    """
+    Weak scaling của GraphACO.aco_multi_colony: mỗi process một đàn, đo thời gian theo số đàn.
+    Hiệu suất = T(1 đàn) / T(k đàn) (1.0 là lý tưởng khi có đủ core); mọi số đàn, kể cả 1, đều chạy qua Pool
+    để T(1 đàn) cũng tính chi phí dựng process và gửi pheromone.
+    """
+    import os
+    from aco_bm import GraphACO
+    graph = GraphACO(grid_size, json_file=map_file)
+    graph.set_start(5, 8)
+    graph.set_goal(1, 23)
+    print(f"ACO colonies on {map_file} ({num_ants} ants x {num_iterations} iterations/colony, {os.cpu_count()} CPUs)")
+    print(f"{'colonies':>8} {'best cost':>10} {'time (s)':>10} {'efficiency':>11}")
+    base_time = None
+    for num_colonies in colony_counts:
+        start_time = time.perf_counter()
+        best_path, best_cost, colony_best_costs = graph.aco_multi_colony(
+            num_colonies=num_colonies, num_iterations=num_iterations, migration_interval=migration_interval,
+            processes=num_colonies, use_pool=True, seed=seed, num_ants=num_ants, evaporation_rate=0.4, alpha=1, beta=3)
+        elapsed = time.perf_counter() - start_time
+        base_time = base_time or elapsed
+        print(f"{num_colonies:>8} {best_cost:>10.2f} {elapsed:>10.3f} {base_time / elapsed:>11.2f}")
+
+
+def main():
+    bench_graph_build()
+    bench_a_star()
+    bench_bfs_dfs()
+    bench_frontier_log()
+    bench_repeated_queries()
+    bench_batch_paths()
+    bench_distance_cache()
+    bench_aco()
+    bench_aco_variants()
+    bench_aco_construction()
+    bench_smoothing()
+    bench_jps()
+    bench_bidirectional()
+    bench_hpa()
+    bench_replan()
+    bench_rrt()
+    bench_rrt_variants()
+    bench_collision_checks()
+    bench_rrt_step_size()
+    bench_rrt_star()
+    bench_rrt_star_radius()
+    bench_obstacle_checks()
+    bench_rrt_star_maps()
+    bench_aco_colonies()
+    bench_pheromone_evaporation()
+
+
+if __name__ == "__main__":
+    main()
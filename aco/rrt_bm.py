@@ -1,10 +1,9 @@
 import random
 import pygame
-import json
-import os
-from heapq import heappush, heappop
 import time
 import math
+import numpy as np
+from bench_mark import Graph, FrontierLog, DIRECTIONS, STRAIGHT_COST, DIAGONAL_COST
 
 # Hàm tạo màu dựa trên cost
 def get_cost_color(cost, max_cost):
@@ -16,166 +15,299 @@ def get_cost_color(cost, max_cost):
     b = 0
     return (r, g, b)
 
-class Node:
-    def __init__(self, x, y, is_obstacle=False, cost=1):
-        self.x = x
-        self.y = y
-        self.is_obstacle = is_obstacle
-        self.neighbors = []
-        self.cost = float('inf') if is_obstacle else cost  # Cost mặc định
-        self.g_score = float('inf')  # Dùng cho A* hoặc các thuật toán khác
-        self.h_score = float('inf')  # heuristic
-        self.f_score = float('inf')  # Dùng cho A*
-        self.parent = None
-
-    def add_neighbor(self, neighbor):
-        self.neighbors.append(neighbor)
-
-class Graph:
-    def __init__(self, grid_size, use_random=False, obstacle_ratio=0.3, json_file=None):
-        self.grid_size = grid_size
-        self.nodes = {}
-        self.start = None
-        self.goal = None
-        self.path_log = []
-        self.max_cost = grid_size * 2
-
-        if json_file and os.path.exists(json_file):
-            self.load_from_json(json_file)
-        else:
-            for x in range(grid_size):
-                for y in range(grid_size):
-                    cost = 1  # Mặc định cost là 1
-                    self.nodes[(x, y)] = Node(x, y, is_obstacle=False, cost=cost)
-            self.set_start(0, 0)
-            self.goal = self.get_random_free_cell()
-            while self.goal == self.start:
-                self.goal = self.get_random_free_cell()
-
-        for x in range(grid_size):
-            for y in range(grid_size):
-                current_node = self.nodes[(x, y)]
-                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1),
-                               (-1, -1), (-1, 1), (1, -1), (1, 1)]:
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < grid_size and 0 <= ny < grid_size:
-                        current_node.add_neighbor(self.nodes[(nx, ny)])
-        if not self.goal:
-            self.goal = self.get_random_free_cell()
-
-    def load_from_json(self, json_file):
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-            maze_data = data.get("data")
-            for x in range(self.grid_size):
-                for y in range(self.grid_size):
-                    is_obstacle = (maze_data[x][y] == 1)
-                    cost = float('inf') if is_obstacle else 1
-                    self.nodes[(x, y)] = Node(x, y, is_obstacle, cost)
-
-    def get_node(self, x, y):
-        return self.nodes.get((x, y))
-
-    def get_random_free_cell(self):
-        while True:
-            x = random.randint(0, self.grid_size - 1)
-            y = random.randint(0, self.grid_size - 1)
-            if not self.nodes[(x, y)].is_obstacle:
-                return self.nodes[(x, y)]
-
-    def set_start(self, x, y):
-        self.start = self.nodes[(x, y)]
-
-    def set_goal(self, x, y):
-        self.goal = self.nodes[(x, y)]
-        self.goal.g_score = 0
-
-# Lớp GraphRRT kế thừa từ Graph, tích hợp thuật toán RRT và hàm save_image
+# Số điểm mới (chưa vào cKDTree) tối thiểu trước khi dựng lại cây, xem NearestTree. Dưới ngưỡng này
+# quét numpy nhanh hơn chi phí cố định của mỗi lần cKDTree.query
+KDTREE_REBUILD_MIN = 4096
+
+
+class NearestTree:
+    """
+    Tìm nút gần nhất (Euclid) trong tập điểm chỉ thêm vào của cây RRT.
+    Điểm lưu trong mảng numpy tăng gấp đôi khi đầy. Nếu có scipy, phần lớn điểm nằm trong một
+    scipy.spatial.cKDTree, các điểm thêm sau lần dựng gần nhất được quét bằng numpy; cây được dựng lại
+    khi phần chưa vào cây vượt 1/8 số điểm (tổng chi phí dựng lại tuyến tính theo số điểm).
+    Không có scipy thì quét numpy toàn bộ.
+    """
+    def __init__(self, capacity=1024):
+        self.points = np.empty((capacity, 2), dtype=np.float64)
+        self.size = 0
+        self._kdtree = None
+        self._indexed = 0  # Số điểm đầu tiên đã nằm trong _kdtree
+        try:
+            from scipy.spatial import cKDTree
+            self._kdtree_class = cKDTree
+        except ImportError:
+            self._kdtree_class = None
+
+    def add(self, x, y):
+        """Thêm điểm, trả về vị trí của nó (thứ tự thêm vào)."""
+        if self.size == len(self.points):
+            grown = np.empty((2 * len(self.points), 2), dtype=np.float64)
+            grown[:self.size] = self.points[:self.size]
+            self.points = grown
+        self.points[self.size] = (x, y)
+        self.size += 1
+        pending = self.size - self._indexed
+        if self._kdtree_class is not None and pending > max(KDTREE_REBUILD_MIN, self._indexed // 8):
+            self._kdtree = self._kdtree_class(self.points[:self.size].copy())
+            self._indexed = self.size
+        return self.size - 1
+
+    def nearest(self, x, y):
+        """Vị trí (thứ tự thêm vào) của điểm gần (x, y) nhất."""
+        best, best_distance = -1, float('inf')
+        if self._kdtree is not None:
+            best_distance, best = self._kdtree.query((x, y))
+            best_distance *= best_distance
+        if self.size > self._indexed:
+            pending = self.points[self._indexed:self.size]
+            distances = (pending[:, 0] - x) ** 2 + (pending[:, 1] - y) ** 2
+            i = int(distances.argmin())
+            if distances[i] < best_distance:
+                best = self._indexed + i
+        return int(best)
+
+
+# Lớp GraphRRT kế thừa từ Graph (bench_mark.py), tích hợp thuật toán RRT và hàm save_image
 class GraphRRT(Graph):
-    def rrt(self, max_iterations=1000, step_size=1):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.run_stats = None  # Thống kê của lần rrt gần nhất, xem rrt
+
+    def _sample(self, goal_bias, target, best_cost):
+        """Điểm lấy mẫu (x, y): target với xác suất goal_bias, trong ellipse informed nếu best_cost hữu hạn,
+        ngược lại đều trên toàn grid."""
+        if goal_bias and random.random() < goal_bias:
+            return target
+        if best_cost < float('inf'):
+            return self._informed_sample(best_cost)
+        return random.randint(0, self.grid_size - 1), random.randint(0, self.grid_size - 1)
+
+    def _informed_sample(self, best_cost):
+        """
+        Lấy mẫu đều trong ellipse tiêu điểm start, goal, trục lớn best_cost: mọi đường ngắn hơn best_cost
+        nằm trong ellipse. Bước chéo có chi phí 1.41 < sqrt(2) nên trục lớn được nới theo tỉ lệ sqrt(2) / 1.41.
+        """
+        start_x, start_y, goal_x, goal_y = self.start.x, self.start.y, self.goal.x, self.goal.y
+        c_min = math.hypot(goal_x - start_x, goal_y - start_y)
+        c_best = max(best_cost * math.sqrt(2) / DIAGONAL_COST, c_min)
+        a = c_best / 2
+        b = math.sqrt(c_best ** 2 - c_min ** 2) / 2
+        r = math.sqrt(random.random())
+        theta = 2 * math.pi * random.random()
+        u, v = a * r * math.cos(theta), b * r * math.sin(theta)
+        angle = math.atan2(goal_y - start_y, goal_x - start_x)
+        x = (start_x + goal_x) / 2 + u * math.cos(angle) - v * math.sin(angle)
+        y = (start_y + goal_y) / 2 + u * math.sin(angle) + v * math.cos(angle)
+        return (max(0, min(self.grid_size - 1, int(round(x)))),
+                max(0, min(self.grid_size - 1, int(round(y)))))
+
+    def _steer(self, nearest, to_x, to_y, step_size):
+        """Bước dài step_size (không vượt quá (to_x, to_y)) từ ô nearest về phía (to_x, to_y).
+        Trả về (ô mới, chi phí bước), hoặc None nếu trùng ô, vào vật cản hay đoạn thẳng chạm vật cản.
+        Bước một ô dùng mask moves (chi phí 1 / 1.41, luật "cutting corners"); bước dài hơn kiểm tra mọi ô
+        đoạn thẳng đi qua bằng Graph.line_of_sight (supercover, cùng luật góc) và có chi phí Euclid."""
+        n = self.grid_size
+        nearest_x, nearest_y = divmod(nearest, n)
+        dx = to_x - nearest_x
+        dy = to_y - nearest_y
+        dist = math.sqrt(dx**2 + dy**2)
+        if dist == 0:
+            return None
+        # Không bước quá đích: điểm đích gần hơn step_size thì bước cuối dừng đúng tại đó
+        step = min(step_size, dist)
+        new_x = max(0, min(n - 1, nearest_x + int(round((dx / dist) * step))))
+        new_y = max(0, min(n - 1, nearest_y + int(round((dy / dist) * step))))
+        step_dx, step_dy = new_x - nearest_x, new_y - nearest_y
+        if (step_dx == 0 and step_dy == 0) or self._occupancy_flat[new_x * n + new_y]:
+            return None
+        if abs(step_dx) <= 1 and abs(step_dy) <= 1:
+            # Bit của hướng trong moves đã chứa luật "cutting corners"
+            if not self._moves_flat[nearest] >> DIRECTIONS.index((step_dx, step_dy)) & 1:
+                return None
+            return new_x * n + new_y, DIAGONAL_COST if step_dx and step_dy else STRAIGHT_COST
+        if not self.line_of_sight((nearest_x, nearest_y), (new_x, new_y)):
+            return None
+        return new_x * n + new_y, math.hypot(step_dx, step_dy)
+
+    def rrt(self, max_iterations=1000, step_size=1, record_frontier=False, goal_bias=0.0, connect=False,
+            informed=False):
         """
         Thuật toán RRT (Rapidly-exploring Random Tree) trên không gian grid.
+          - step_size: độ dài mỗi bước (số ô); bước dài được kiểm tra va chạm trên cả đoạn thẳng (_steer),
+            path khi đó gồm các waypoint không kề nhau như theta_star
+          - goal_bias: xác suất lấy mẫu đúng goal thay vì điểm ngẫu nhiên (RRT-Connect: gốc của cây bên kia)
+          - connect: RRT-Connect, một cây từ start và một cây từ goal; mỗi iteration một cây mở thêm một bước
+            về phía điểm mẫu, cây kia bước liên tục về phía ô vừa thêm tới khi chạm hoặc bị chặn, rồi đổi vai
+          - informed: sau lời giải đầu tiên không dừng mà chạy hết max_iterations, lấy mẫu trong ellipse
+            (tiêu điểm start, goal) chứa mọi đường có thể ngắn hơn và giữ đường tốt nhất; ô mới chọn parent
+            rẻ nhất trong các ô kề đã thuộc cây (_best_parent) để các nhánh mới có thể ngắn hơn nhánh cũ
         Trả về: (path, log, frontier_log, total_explored, final_cost, iterations)
           - path: danh sách các điểm (x,y) từ start đến goal
           - log: danh sách các điểm được thêm vào cây theo thứ tự
-          - frontier_log: danh sách snapshot của cây (các điểm hiện có trong cây tại mỗi iteration)
-          - total_explored: số lượng node trong cây
+          - frontier_log: snapshot của cây (các điểm hiện có trong cây) tại mỗi iteration, lưu dạng delta
+            (FrontierLog); chỉ ghi khi record_frontier, ngược lại là None
+          - total_explored: số lượng node trong cây (cả hai cây với RRT-Connect)
           - final_cost: tổng chi phí đường đi (tích lũy move_cost)
           - iterations: số vòng lặp đã chạy
+          Nút gần nhất tìm qua NearestTree; ô đã thuộc cây tra O(1) bằng dấu seen của SearchState.
+        self.run_stats: first_solution (iteration có lời giải đầu tiên, None nếu không có), first_cost,
+        solutions (số lần tìm được đường tốt hơn).
         """
+        self.run_stats = {"first_solution": None, "first_cost": None, "solutions": 0}
+        if connect:
+            return self._rrt_connect(max_iterations, step_size, record_frontier, goal_bias, informed)
+
         def distance(p1, p2):
             return math.sqrt((p1[0]-p2[0])**2 + (p1[1]-p2[1])**2)
-        
-        def allowed_move(current, neighbor):
-            dx = neighbor.x - current.x
-            dy = neighbor.y - current.y
-            if abs(dx) == 1 and abs(dy) == 1:
-                node_horizontal = self.get_node(current.x + dx, current.y)
-                node_vertical = self.get_node(current.x, current.y + dy)
-                if node_horizontal.is_obstacle or node_vertical.is_obstacle:
-                    return False
-            return True
-
-        # Đặt g_score của nút xuất phát bằng 0
-        self.start.g_score = 0
-
-        tree = [self.start]  # Cây RRT chứa các Node đã được thêm vào
+
+        n = self.grid_size
+        start, goal = self.start.index, self.goal.index
+        goal_xy = (self.goal.x, self.goal.y)
+        # Cây lưu chỉ số phẳng của ô; parent/g_score nằm trong SearchState của Graph,
+        # seen[ô] == generation đánh dấu ô đã thuộc cây
+        state = self._new_search(start)
+        seen, generation = state.seen, state.generation
+
+        tree = [start]  # Cây RRT chứa các ô đã được thêm vào, cùng thứ tự với nearest_tree
+        nearest_tree = NearestTree()
+        nearest_tree.add(self.start.x, self.start.y)
         log = [(self.start.x, self.start.y)]
-        frontier_log = []
+        frontier_log = FrontierLog(n, (start,)) if record_frontier else None
         iterations = 0
+        best_cost = float('inf')  # Chi phí đường tốt nhất tới goal
+        goal_linked = False  # goal được nối vào cây (không qua nearest_tree) từ một ô đủ gần
 
         while iterations < max_iterations:
             iterations += 1
             # Lưu snapshot của cây
-            frontier_log.append([(node.x, node.y) for node in tree])
-            # Sinh điểm ngẫu nhiên trong không gian grid
-            rand_x = random.randint(0, self.grid_size - 1)
-            rand_y = random.randint(0, self.grid_size - 1)
-            random_point = (rand_x, rand_y)
-            # Tìm nút trong cây có khoảng cách gần nhất đến random_point
-            nearest = min(tree, key=lambda node: distance((node.x, node.y), random_point))
-            dx = rand_x - nearest.x
-            dy = rand_y - nearest.y
-            dist = math.sqrt(dx**2 + dy**2)
-            if dist == 0:
-                continue
-            step_dx = int(round((dx / dist) * step_size))
-            step_dy = int(round((dy / dist) * step_size))
-            new_x = nearest.x + step_dx
-            new_y = nearest.y + step_dy
-            new_x = max(0, min(self.grid_size - 1, new_x))
-            new_y = max(0, min(self.grid_size - 1, new_y))
-            new_node = self.get_node(new_x, new_y)
-            if new_node.is_obstacle:
+            if frontier_log is not None:
+                frontier_log.step()
+            # Sinh điểm ngẫu nhiên trong không gian grid (hoặc goal / ellipse informed)
+            rand_x, rand_y = self._sample(goal_bias, goal_xy, best_cost if informed else float('inf'))
+            # Tìm nút trong cây có khoảng cách gần nhất đến điểm ngẫu nhiên
+            nearest = tree[nearest_tree.nearest(rand_x, rand_y)]
+            step = self._steer(nearest, rand_x, rand_y, step_size)
+            if step is None:
                 continue
-            if abs(step_dx) == 1 and abs(step_dy) == 1:
-                if not allowed_move(nearest, new_node):
-                    continue
-            if (new_node.x, new_node.y) in [(node.x, node.y) for node in tree]:
+            new_node, move_cost = step
+            if seen[new_node] == generation:
                 continue
-            new_node.parent = nearest
+            new_x, new_y = divmod(new_node, n)
             tree.append(new_node)
-            log.append((new_node.x, new_node.y))
-            move_cost = 1.41 if (abs(step_dx) == 1 and abs(step_dy) == 1) else 1
-            new_node.g_score = nearest.g_score + move_cost
-            # Kiểm tra nếu new_node đủ gần goal
-            if distance((new_node.x, new_node.y), (self.goal.x, self.goal.y)) <= step_size:
-                self.goal.parent = new_node
-                dist_to_goal = distance((new_node.x, new_node.y), (self.goal.x, self.goal.y))
-                self.goal.g_score = new_node.g_score + dist_to_goal
-                final_cost = self.goal.g_score
-                log.append((self.goal.x, self.goal.y))
-                tree.append(self.goal)
-                frontier_log.append([(node.x, node.y) for node in tree])
-                # Xây dựng path từ goal ngược về start
-                path = []
-                current = self.goal
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
-                return path[::-1], log, frontier_log, len(tree), final_cost, iterations
-
-        return [], log, frontier_log, len(tree), 0, iterations
+            nearest_tree.add(new_x, new_y)
+            if frontier_log is not None:
+                frontier_log.add(new_node)
+            log.append((new_x, new_y))
+            parent, g_score = nearest, state.g_score[nearest] + move_cost
+            if informed:
+                parent, g_score = self._best_parent(state, new_node, parent, g_score)
+            state.visit(new_node, g_score, parent)
+            # Kiểm tra nếu new_node đủ gần goal và nối thẳng tới goal được
+            dist_to_goal = distance((new_x, new_y), goal_xy)
+            if dist_to_goal <= step_size and self.line_of_sight((new_x, new_y), goal_xy):
+                cost = state.g_score[new_node] + dist_to_goal
+                if cost < best_cost:
+                    if new_node != goal:
+                        state.visit(goal, cost, new_node)
+                        if not goal_linked:
+                            goal_linked = True
+                            log.append(goal_xy)
+                            if frontier_log is not None:
+                                frontier_log.add(goal)
+                    best_cost = cost
+                    self._record_solution(iterations, cost)
+                if not informed:
+                    break
+
+        total_explored = len(tree) + goal_linked
+        if best_cost == float('inf'):
+            return [], log, frontier_log, total_explored, 0, iterations
+        if frontier_log is not None:
+            frontier_log.step()
+        # Xây dựng path từ goal ngược về start
+        return self._reconstruct_path(goal), log, frontier_log, total_explored, state.g_score[goal], iterations
+
+    def _best_parent(self, state, new_node, parent, g_score):
+        """Ô kề (theo moves) đã thuộc cây cho chi phí tới new_node nhỏ nhất: (parent, g_score) tốt nhất."""
+        generation, seen, tree_g = state.generation, state.seen, state.g_score
+        for offset, move_cost in self._move_table[self._moves_flat[new_node]]:
+            neighbor = new_node + offset
+            if seen[neighbor] == generation and tree_g[neighbor] + move_cost < g_score:
+                parent, g_score = neighbor, tree_g[neighbor] + move_cost
+        return parent, g_score
+
+    def _record_solution(self, iteration, cost):
+        stats = self.run_stats
+        stats["solutions"] += 1
+        if stats["first_solution"] is None:
+            stats["first_solution"], stats["first_cost"] = iteration, cost
+
+    def _rrt_connect(self, max_iterations, step_size, record_frontier, goal_bias, informed):
+        """RRT-Connect cho rrt(connect=True). Cây goal dùng SearchState của nửa tìm từ goal
+        (như bidirectional_bfs), hai cây gặp nhau ở ô thuộc cả hai cây và path nối bằng _join_paths."""
+        n = self.grid_size
+        start, goal = self.start.index, self.goal.index
+        states = (self._new_search(start), self._new_backward_search(goal))
+        trees = ([start], [goal])
+        nearest_trees = (NearestTree(), NearestTree())
+        nearest_trees[0].add(self.start.x, self.start.y)
+        nearest_trees[1].add(self.goal.x, self.goal.y)
+        log = [(self.start.x, self.start.y), (self.goal.x, self.goal.y)]
+        frontier_log = FrontierLog(n, (start, goal)) if record_frontier else None
+        iterations = 0
+        best = [float('inf'), start if start == goal else -1]  # Chi phí tốt nhất và ô gặp nhau
+
+        def extend(side, nearest, to_x, to_y):
+            """Thêm vào cây side một bước từ nearest về phía (to_x, to_y); trả về ô mới hoặc -1."""
+            state, other = states[side], states[1 - side]
+            step = self._steer(nearest, to_x, to_y, step_size)
+            if step is None or state.seen[step[0]] == state.generation:
+                return -1
+            new_node, move_cost = step
+            trees[side].append(new_node)
+            nearest_trees[side].add(*divmod(new_node, n))
+            if frontier_log is not None:
+                frontier_log.add(new_node)
+            log.append(divmod(new_node, n))
+            parent, g_score = nearest, state.g_score[nearest] + move_cost
+            if informed:
+                parent, g_score = self._best_parent(state, new_node, parent, g_score)
+            state.visit(new_node, g_score, parent)
+            if other.seen[new_node] == other.generation:
+                cost = state.g_score[new_node] + other.g_score[new_node]
+                if cost < best[0]:
+                    best[:] = cost, new_node
+                    self._record_solution(iterations, cost)
+            return new_node
+
+        side = 0
+        if start == goal:
+            best[0] = 0
+        while iterations < max_iterations and (best[1] < 0 or informed):
+            iterations += 1
+            if frontier_log is not None:
+                frontier_log.step()
+            other_side = 1 - side
+            rand_x, rand_y = self._sample(goal_bias, divmod(trees[other_side][0], n),
+                                          best[0] if informed else float('inf'))
+            new_node = extend(side, trees[side][nearest_trees[side].nearest(rand_x, rand_y)], rand_x, rand_y)
+            if new_node >= 0 and states[other_side].seen[new_node] != states[other_side].generation:
+                # Connect: cây kia bước liên tục về phía new_node tới khi chạm cây này hoặc bị chặn
+                # (_steer không bước quá đích nên bước cuối dừng đúng tại new_node với mọi step_size)
+                new_x, new_y = divmod(new_node, n)
+                current = trees[other_side][nearest_trees[other_side].nearest(new_x, new_y)]
+                while current >= 0 and states[side].seen[current] != states[side].generation:
+                    current = extend(other_side, current, new_x, new_y)
+            side = other_side
+
+        total_explored = len(trees[0]) + len(trees[1])
+        if best[1] < 0:
+            return [], log, frontier_log, total_explored, 0, iterations
+        if frontier_log is not None:
+            frontier_log.step()
+        path = self._join_paths(best[1], states[1], best[0])
+        return path, log, frontier_log, total_explored, best[0], iterations
 
     def save_image(self, screen, filename):
         pygame.image.save(screen, filename)
@@ -252,7 +384,7 @@ def main():
     graph.set_goal(1, 23)
 
     start_time = time.time()
-    path, log, frontier_log, total_explored, final_cost, iterations = graph.rrt(max_iterations=3000, step_size=1)
+    path, log, frontier_log, total_explored, final_cost, iterations = graph.rrt(max_iterations=3000, step_size=1, record_frontier=True)
     comp_time = time.time() - start_time
     graph.path_log = log
 